@@ -9,8 +9,11 @@ https://docs.djangoproject.com/en/2.2/topics/settings/
 For the full list of settings and their values, see
 https://docs.djangoproject.com/en/2.2/ref/settings/
 """
+
 import logging
 import os
+import sys
+import tempfile
 
 from decouple import config, UndefinedValueError
 
@@ -168,7 +171,7 @@ REST_FRAMEWORK = {
     # For more info, seee https://security.stackexchange.com/questions/81756/session-authentication-vs-token-authentication
     'DEFAULT_AUTHENTICATION_CLASSES': (
         'rest_framework.authentication.SessionAuthentication',  # allows to put used within the browser
-        'rest_framework.authentication.TokenAuthentication',
+        'ifbcat_api.authentication.CachedTokenAuthentication',
     ),
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.LimitOffsetPagination',
     'PAGE_SIZE': 20,
@@ -179,10 +182,39 @@ REST_FRAMEWORK = {
     ),
     'DEFAULT_RENDERER_CLASSES': [
         'rest_framework.renderers.JSONRenderer',
-        'rest_framework.renderers.BrowsableAPIRenderer',
+        'ifbcat_api.renderers.LightBrowsableAPIRenderer',
         'ifbcat_api.renderers.JsonLDSchemaRenderer',
     ],
 }
+
+################################################################################
+# Cache
+################################################################################
+# The local memory of each process by default. A backend shared among the processes, e.g.
+# django.core.cache.backends.filebased.FileBasedCache with a folder as location, lets them see the invalidations made
+# by the others, and benefit from the caches warmed by another one, cf WARM_CACHES_URLS. The features relying on it
+# are disabled without one: the catalog snapshot, the cached responses, the cached users and tokens, and the warming
+# of the caches when huey starts.
+# Without one, the controlled vocabularies kept by each process are also read again every VOCABULARIES_LOCAL_MAX_AGE
+# seconds, to see the ones written by the other processes, cf ifbcat_api/vocabularies.py
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default=''),
+    }
+}
+VOCABULARIES_LOCAL_MAX_AGE = config('VOCABULARIES_LOCAL_MAX_AGE', default=60, cast=int)
+
+################################################################################
+# Authentication
+################################################################################
+# The user of a session or a token is kept in the cache for AUTHENTICATION_CACHE_TTL seconds, it is forgotten as soon
+# as the user is saved, updated or deleted, and the token deleted. They are only kept in a cache shared by the
+# processes, cf CACHES, so all of them forget it.
+AUTHENTICATION_CACHE_TTL = config('AUTHENTICATION_CACHE_TTL', default=60, cast=int)
+AUTHENTICATION_BACKENDS = ['ifbcat_api.authentication.CachedModelBackend']
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+
 # From https://gist.github.com/davewongillies/6897161#gistcomment-3017261
 SECURE_PROXY_SSL_HEADER = ('HTTP_X_FORWARDED_PROTO', 'https')
 
@@ -369,6 +401,86 @@ if config('USE_IFB_THEME', True, cast=bool):
 # INNER settings
 ################################################################################
 MAX_CHOICES_COUNT_IN_SCHEMA = 30
+# seconds during which the values used by the instances are kept for the filters of the browsable api
+AUTO_SUBSET_CACHE_TTL = config('AUTO_SUBSET_CACHE_TTL', default=300, cast=int)
+# seconds during which the openapi schema is kept, it is also generated again when the values used change
+OPENAPI_SCHEMA_CACHE_TTL = config('OPENAPI_SCHEMA_CACHE_TTL', default=3600, cast=int)
+# version of the code deployed, e.g. the git revision, the openapi schema being generated again for another one. A hash
+# of the python sources is used when empty
+CODE_VERSION = config('CODE_VERSION', default='')
+# serve the anonymous GET requests of the main viewsets from an in-process snapshot of the catalog, built again in a
+# background thread when the catalog changes or after CATALOG_SNAPSHOT_MAX_AGE seconds, cf ifbcat_api/snapshot.py. It
+# requires a cache shared by the processes, cf CACHES
+CATALOG_SNAPSHOT_ENABLED = config('CATALOG_SNAPSHOT_ENABLED', default=False, cast=bool)
+CATALOG_SNAPSHOT_IN_BACKGROUND = config('CATALOG_SNAPSHOT_IN_BACKGROUND', default=True, cast=bool)
+CATALOG_SNAPSHOT_MAX_AGE = config('CATALOG_SNAPSHOT_MAX_AGE', default=300, cast=int)
+# seconds the refresh of the team directory waits once queued by a write, so it is refreshed once for all the writes
+# meanwhile, e.g. by an import, cf ifbcat_api/model/teamDirectory.py
+TEAM_DIRECTORY_REFRESH_DELAY = config('TEAM_DIRECTORY_REFRESH_DELAY', default=10, cast=int)
+# seconds during which the cached responses of the -cnp lists and the sitemaps are fresh, and then can still be served
+# while one request computes them again, unless set per endpoint, cf ifbcat_api/response_cache.py. It requires a cache
+# shared by the processes, cf CACHES
+RESPONSE_CACHE_MAX_AGE = config('RESPONSE_CACHE_MAX_AGE', default=1800, cast=int)
+RESPONSE_CACHE_MAX_STALE = config('RESPONSE_CACHE_MAX_STALE', default=300, cast=int)
+# seconds after which the lock of a request computing a response is released if it did not finish
+RESPONSE_CACHE_LOCK_TIMEOUT = config('RESPONSE_CACHE_LOCK_TIMEOUT', default=60, cast=int)
+# urls requested by the warm_caches command, and by huey on startup, cf ifbcat_api/warm_caches.py. The most requested
+# ones of the access log are requested too, the requests are sent to WARM_CACHES_BASE_URL, the first allowed host
+# otherwise
+WARM_CACHES_URLS = [
+    '/api/event-cnp/?format=json',
+    '/api/field-cnp/?format=json',
+    '/api/keyword-cnp/?format=json',
+    '/api/organisation-cnp/?format=json',
+    '/api/team-cnp/?format=json',
+    '/api/tool-cnp/?format=json',
+    '/openapi?format=openapi-json',
+    '/sitemap.xml',
+    '/sitemap.tess.xml',
+]
+WARM_CACHES_ACCESS_LOG = config('WARM_CACHES_ACCESS_LOG', default='')
+WARM_CACHES_TOP = config('WARM_CACHES_TOP', default=20, cast=int)
+WARM_CACHES_BASE_URL = config('WARM_CACHES_BASE_URL', default='')
+WARM_CACHES_ON_STARTUP = config('WARM_CACHES_ON_STARTUP', default=True, cast=bool)
+# number of entries of bio.tools fetched at once when the tools are updated, cf ifbcat_api/tasks.py. The tools done are
+# kept in UPDATE_TOOLS_CHECKPOINT so an interrupted update is resumed, if it progressed in the last
+# UPDATE_TOOLS_CHECKPOINT_MAX_AGE seconds
+UPDATE_TOOLS_WORKERS = config('UPDATE_TOOLS_WORKERS', default=8, cast=int)
+UPDATE_TOOLS_CHECKPOINT = config('UPDATE_TOOLS_CHECKPOINT', default=os.path.join(BASE_DIR, 'update_tools.checkpoint'))
+UPDATE_TOOLS_CHECKPOINT_MAX_AGE = config('UPDATE_TOOLS_CHECKPOINT_MAX_AGE', default=7 * 24 * 3600, cast=int)
+# folder of the on-disk cache of the responses of the external web services, cf ifbcat_api/http_cache.py, disabled if
+# empty. The entries are fresh for HTTP_CACHE_TTL seconds, and the least recently used are evicted above
+# HTTP_CACHE_MAX_SIZE bytes
+HTTP_CACHE_DIR = config('CACHE_DIR', default='')
+HTTP_CACHE_TTL = config('HTTP_CACHE_TTL', default=30 * 24 * 3600, cast=int)
+HTTP_CACHE_MAX_SIZE = config('HTTP_CACHE_MAX_SIZE', default=1024 * 1024 * 1024, cast=int)
+# key of the NCBI E-utilities, raising their limit from 3 to 10 requests per second, cf
+# https://support.nlm.nih.gov/kbArticle/?pn=KA-05317. The PMIDs and PMCIDs are resolved to DOIs by PUBMED_BATCH_SIZE
+# per request, cf ifbcat_api/pubmed.py
+NCBI_API_KEY = config('NCBI_API_KEY', default='')
+PUBMED_BATCH_SIZE = config('PUBMED_BATCH_SIZE', default=200, cast=int)
+# requests to the external web services at once and per second, per host and its subdomains, cf
+# ifbcat_api/http_client.py. The limits apply to each process, NCBI allows 3 requests per second without api key.
+HTTP_CLIENT_HOSTS = {
+    'bio.tools': dict(concurrency=8, rate=10),
+    'doi.org': dict(concurrency=4, rate=10),
+    'ebi.ac.uk': dict(concurrency=4, rate=10),
+    'ncbi.nlm.nih.gov': dict(concurrency=3, rate=10 if NCBI_API_KEY else 3),
+}
+HTTP_CLIENT_DEFAULT_CONCURRENCY = config('HTTP_CLIENT_DEFAULT_CONCURRENCY', default=8, cast=int)
+# connections kept alive per host, at least the concurrency of each host
+HTTP_CLIENT_POOL_SIZE = config('HTTP_CLIENT_POOL_SIZE', default=10, cast=int)
+HTTP_CLIENT_TIMEOUT = config('HTTP_CLIENT_TIMEOUT', default=60, cast=int)
+# a failed request is retried after HTTP_CLIENT_BACKOFF_FACTOR seconds, then twice as much, ...
+HTTP_CLIENT_RETRIES = config('HTTP_CLIENT_RETRIES', default=3, cast=int)
+HTTP_CLIENT_BACKOFF_FACTOR = config('HTTP_CLIENT_BACKOFF_FACTOR', default=0.5, cast=float)
+# index of the topics of the EDAM ontology written by the load_edam command, cf ifbcat_api/edam.py. The topics are
+# filled and validated with it, EBI OLS is requested for the topics missing in it, or when there is no index
+EDAM_INDEX = config('EDAM_INDEX', default=os.path.join(BASE_DIR, 'edam_index.json'))
+# number of DOIs fetched at once from doi.org when their metadata is refreshed, cf the refresh_dois command. The DOIs
+# are refreshed once older than DOI_REFRESH_MAX_AGE seconds
+DOI_REFRESH_WORKERS = config('DOI_REFRESH_WORKERS', default=8, cast=int)
+DOI_REFRESH_MAX_AGE = config('DOI_REFRESH_MAX_AGE', default=180 * 24 * 3600, cast=int)
 
 ################################################################################
 # EMAIL
@@ -381,10 +493,17 @@ DEFAULT_FROM_EMAIL = config('DEFAULT_FROM_EMAIL', default='contact@france-bioinf
 ################################################################################
 # HUEY
 ################################################################################
+# The tasks are stored in a sqlite file, so the ones queued by the web processes, e.g. the enrichment of the new
+# instances, are run by the consumer started by docker-entrypoint.sh. HUEY_FILENAME should be on a persistent volume,
+# the tasks queued in the temporary directory being lost with it.
+# With HUEY_IMMEDIATE, the default while debugging and testing, they are run when queued, without any consumer nor file.
+HUEY_FILENAME = config('HUEY_FILENAME', default=os.path.join(tempfile.gettempdir(), 'ifbcat-huey.sqlite3'))
+HUEY_IMMEDIATE = config('HUEY_IMMEDIATE', default=DEBUG or sys.argv[1:2] == ['test'], cast=bool)
 HUEY = {
     'name': DATABASES['default']['NAME'],
-    'huey_class': 'huey.MemoryHuey',
-    'immediate': False,
+    'huey_class': config('HUEY_CLASS', default='huey.SqliteHuey'),
+    'filename': HUEY_FILENAME,
+    'immediate': HUEY_IMMEDIATE,
     'consumer': {
         'blocking': True,
         'loglevel': logging.DEBUG,
@@ -20,11 +20,16 @@ from django.contrib import admin
 from django.contrib.auth import views as auth_views
 from django.contrib.sitemaps.views import sitemap
 from django.urls import path, include
+from django.views.decorators.http import etag
 from django.views.generic import RedirectView
 from django.views.generic import TemplateView
+from rest_framework.renderers import OpenAPIRenderer, JSONOpenAPIRenderer
 from rest_framework.schemas import get_schema_view
 
+from ifbcat_api import schemas as ifbcat_schemas
 from ifbcat_api import sitemap as ifbcat_sitemap
+from ifbcat_api.response_cache import cache_response
+from ifbcat_api.renderers import LightBrowsableAPIRenderer
 
 urlpatterns = [
     path('', include('ifbcat_vanilla_front.urls')),
@@ -63,13 +68,17 @@ urlpatterns = [
     ),
     path(
         'openapi',
-        get_schema_view(
-            title="IFB Catalog",
-            description="A catalog of bioinformatics resources such as software, database, organisation, training, ...",
-            version="1.0.0b",
+        etag(ifbcat_schemas.get_schema_etag)(
+            get_schema_view(
+                title="IFB Catalog",
+                description="A catalog of bioinformatics resources such as software, database, organisation, training, ...",
+                version="1.0.0b",
+                generator_class=ifbcat_schemas.CachedSchemaGenerator,
+                renderer_classes=[OpenAPIRenderer, JSONOpenAPIRenderer, LightBrowsableAPIRenderer],
+            )
         ),
         name='openapi-schema',
     ),
-    path('sitemap.xml', sitemap, {'sitemaps': ifbcat_sitemap.general}, name='sitemap-general'),
-    path('sitemap.tess.xml', sitemap, {'sitemaps': ifbcat_sitemap.tess}, name='sitemap-tess'),
+    path('sitemap.xml', cache_response()(sitemap), {'sitemaps': ifbcat_sitemap.general}, name='sitemap-general'),
+    path('sitemap.tess.xml', cache_response()(sitemap), {'sitemaps': ifbcat_sitemap.tess}, name='sitemap-tess'),
 ]
@@ -13,7 +13,7 @@ from django.contrib.auth.models import Group
 from django.contrib.contenttypes.models import ContentType
 from django.contrib.postgres.lookups import Unaccent
 from django.core.exceptions import ValidationError
-from django.db.models import Count, Q, When, Value, BooleanField, Case, CharField, F, Exists, OuterRef
+from django.db.models import Q, When, Value, BooleanField, Case, CharField, F, Exists, OuterRef
 from django.db.models.functions import Upper, Length
 from django.forms import modelform_factory
 from django.http import HttpResponseRedirect
@@ -25,8 +25,8 @@ from django.utils.translation import gettext, ngettext
 from django_better_admin_arrayfield.admin.mixins import DynamicArrayMixin
 from rest_framework.authtoken.models import Token
 
-from ifbcat_api import models, business_logic, misc
-from ifbcat_api.misc import BibliographicalEntryNotFound, get_usage_in_related_field
+from ifbcat_api import models, business_logic, edam, misc, permissions
+from ifbcat_api.misc import get_usage_in_related_field
 from ifbcat_api.model.event import Event
 from ifbcat_api.permissions import simple_override_method
 
@@ -45,6 +45,25 @@ class PermissionInClassModelAdmin(admin.ModelAdmin):
     class Meta:
         abstract = True
 
+    def get_queryset(self, request):
+        qs = super().get_queryset(request)
+        basic_permission_classes = permissions.get_basic_permission_classes(
+            business_logic.get_permission_classes(self.model)
+        )
+        if any(
+            issubclass(perm, (permissions.UserCanEditAndDeleteIfNotUsed, permissions.UserCanDeleteIfNotStaffAndNotUsed))
+            for perm in basic_permission_classes
+        ):
+            # the "is used" check of the permission is done for all instances at once
+            qs = permissions.annotate_is_used(qs)
+        if business_logic.is_request_upgraded(request):
+            return business_logic.annotate_permissions(qs, request)
+        with business_logic.RequestUpgrade(
+            request=request,
+            from_admin=True,
+        ):
+            return business_logic.annotate_permissions(qs, request)
+
     def has_view_permission(self, request, obj=None):
         with business_logic.RequestUpgrade(
             request=request,
@@ -56,6 +75,8 @@ class PermissionInClassModelAdmin(admin.ModelAdmin):
             if obj is None:
                 return from_super
 
+            if hasattr(obj, "can_view"):
+                return obj.can_view
             return business_logic.has_view_permission(model=self.model, request=request, obj=obj)
 
     def has_add_permission(self, request):
@@ -80,6 +101,8 @@ class PermissionInClassModelAdmin(admin.ModelAdmin):
             if obj is None:
                 return from_super
 
+            if hasattr(obj, "can_change"):
+                return obj.can_change
             return business_logic.has_change_permission(model=self.model, request=request, obj=obj)
 
     def has_delete_permission(self, request, obj=None):
@@ -92,6 +115,8 @@ class PermissionInClassModelAdmin(admin.ModelAdmin):
                 return False
             if obj is None:
                 return from_super
+            if hasattr(obj, "can_delete"):
+                return obj.can_delete
             return business_logic.has_delete_permission(model=self.model, request=request, obj=obj)
 
 
@@ -863,17 +888,26 @@ class TopicAdmin(
     list_display = (
         'label',
         'uri_browser',
+        'usage_count',
     )
     readonly_fields = ('label', 'description', 'synonyms')
 
     actions = [
-        'update_information_from_ebi_ols',
+        'update_information_from_edam',
         # 'update_information_from_ebi_ols_when_needed',
     ]
 
-    def update_information_from_ebi_ols(self, request, queryset):
-        for o in queryset:
+    def update_information_from_edam(self, request, queryset):
+        updated, missing = edam.update_topics(queryset)
+        for o in missing:
             o.update_information_from_ebi_ols()
+        self.message_user(
+            request,
+            f"{len(updated)} topics updated from the EDAM index, {len(missing)} from EBI OLS",
+            messages.SUCCESS,
+        )
+
+    update_information_from_edam.short_description = "Update information from EDAM"
 
     def uri_browser(self, obj):
         return format_html(f'<center><a href="{obj.edam_browser_url}" target="_blank">{obj.uri}</a></center>')
@@ -1115,14 +1149,14 @@ class DoiAdmin(
     readonly_fields = ('title', 'journal_name', 'authors_list', 'biblio_year')
 
     def update_information(self, request, queryset):
-        for o in queryset:
-            try:
-                o.fill_from_doi()
-                o.save()
-            except BibliographicalEntryNotFound:
-                self.message_user(request, f"Not found: {o.doi}", messages.INFO)
-            except requests.HTTPError as he:
-                self.message_user(request, f"HTTPError: {o.doi} : {str(he)}", messages.ERROR)
+        from ifbcat_api import tasks
+
+        report = tasks.refresh_dois(queryset, progress=False)
+        self.message_user(request, f"{len(report['refreshed'])} DOIs updated", messages.SUCCESS)
+        for doi in report['not_found']:
+            self.message_user(request, f"Not found: {doi}", messages.INFO)
+        for doi in report['failed']:
+            self.message_user(request, f"Could not update {doi}, cf the logs", messages.ERROR)
 
 
 @admin.register(models.Project)
@@ -1323,6 +1357,7 @@ class TeamAdmin(
     list_display = (
         'name',
         'logo',
+        'members_count',
         'updated_at',
     )
     list_filter = (
@@ -1495,6 +1530,60 @@ class TeamAdmin(
         return r
 
 
+@admin.register(models.TeamDirectory)
+class TeamDirectoryAdmin(
+    PermissionInClassModelAdmin,
+):
+    """Overview of the teams read from the directory, the teams are edited with TeamAdmin"""
+
+    search_fields = ('name', 'city')
+    list_display = (
+        'team',
+        'city',
+        'platforms_names',
+        'keywords',
+        'expertise',
+        'leaders_count',
+    )
+    list_filter = (
+        IsActiveListFilter,
+        'ifbMembership',
+    )
+
+    def get_queryset(self, request):
+        return models.Team.annotate_is_active(super().get_queryset(request))
+
+    def team(self, obj):
+        return format_html('<a href="{}">{}</a>', reverse('admin:ifbcat_api_team_change', args=[obj.pk]), obj.name)
+
+    team.admin_order_field = 'name'
+
+    def platforms_names(self, obj):
+        return ", ".join(platform['name'] for platform in obj.platforms)
+
+    platforms_names.short_description = "Platforms"
+
+    def leaders_count(self, obj):
+        return len(obj.leaders)
+
+
+@admin.register(models.RegistryOrganisation)
+class RegistryOrganisationAdmin(
+    PermissionInClassModelAdmin,
+):
+    """Organisations of the Research Organization Registry, loaded with the load_ror command"""
+
+    search_fields = ('ror_id', 'name', 'grid_ids', 'names')
+    list_display = (
+        'ror_id',
+        'name',
+        'city',
+        'country',
+        'status',
+    )
+    list_filter = ('status',)
+
+
 class AbstractControlledVocabularyAdmin(
     PermissionInClassModelAdmin,
     AllFieldInAutocompleteModelAdmin,
@@ -1722,17 +1811,29 @@ class GroupAdmin(
         business_logic.init_business_logic()
 
     def get_queryset(self, request):
-        return super().get_queryset(request).annotate(Count('permissions', distinct=True), Count('user', distinct=True))
+        # counted in subqueries rather than by joining both relations, which multiplies the rows to aggregate
+        return (
+            super()
+            .get_queryset(request)
+            .annotate(
+                permissions_count=misc.SubqueryCount(
+                    Group.permissions.through.objects.filter(group=OuterRef('pk')).values('pk')
+                ),
+                users_count=misc.SubqueryCount(
+                    get_user_model().groups.through.objects.filter(group=OuterRef('pk')).values('pk')
+                ),
+            )
+        )
 
     def permissions_count(self, obj):
-        return obj.permissions__count
+        return obj.permissions_count
 
-    permissions_count.admin_order_field = 'permissions__count'
+    permissions_count.admin_order_field = 'permissions_count'
 
     def users_count(self, obj):
-        return obj.user__count
+        return obj.users_count
 
-    users_count.admin_order_field = 'user__count'
+    users_count.admin_order_field = 'users_count'
 
     def has_delete_permission(self, request, obj=None):
         return super().has_delete_permission(request=request, obj=obj) and (
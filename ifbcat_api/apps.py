@@ -3,3 +3,22 @@ from django.apps import AppConfig
 
 class IfbcatsandboxApiConfig(AppConfig):
     name = 'ifbcat_api'
+
+    def ready(self):
+        # connect the receivers invalidating the cached users and tokens, the values used in filters, the catalog
+        # snapshot, the controlled vocabularies and the cached responses, and the ones maintaining the counters and the
+        # team directory, only to the models they are about so the others are still deleted in bulk
+        from ifbcat_api import authentication  # noqa: F401
+        from ifbcat_api import counters
+        from ifbcat_api import filters
+        from ifbcat_api import response_cache
+        from ifbcat_api import snapshot
+        from ifbcat_api import vocabularies
+        from ifbcat_api.model import teamDirectory
+
+        counters.connect_receivers()
+        filters.connect_receivers()
+        response_cache.connect_receivers()
+        snapshot.connect_receivers()
+        vocabularies.connect_receivers()
+        teamDirectory.connect_receivers()
@@ -0,0 +1,86 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+from ifbcat_api.misc import is_cache_shared
+
+
+def _get_user_cache_key(user_id):
+    return f"authentication-user-{user_id}"
+
+
+def _get_token_cache_key(key):
+    return f"authentication-token-{key}"
+
+
+def get_user(user_id):
+    """
+    Get the user from the cache, or from the database and then keep it in the cache for AUTHENTICATION_CACHE_TTL
+    seconds. It is only kept in a cache shared by the processes, otherwise the other processes would not forget it
+    once the user is deactivated or deleted.
+
+    :param user_id: pk of the user
+    :return: the user, or None when it does not exist
+    """
+    if not is_cache_shared():
+        return get_user_model()._default_manager.filter(pk=user_id).first()
+    cache_key = _get_user_cache_key(user_id)
+    user = cache.get(cache_key)
+    if user is None:
+        user = get_user_model()._default_manager.filter(pk=user_id).first()
+        if user is None:
+            return None
+        cache.set(cache_key, user, settings.AUTHENTICATION_CACHE_TTL)
+    return user
+
+
+class CachedModelBackend(ModelBackend):
+    """ModelBackend loading the user of the session from the cache"""
+
+    def get_user(self, user_id):
+        user = get_user(user_id)
+        return user if self.user_can_authenticate(user) else None
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """TokenAuthentication resolving the token and its user from the cache, when it is shared by the processes"""
+
+    def authenticate_credentials(self, key):
+        cache_key = _get_token_cache_key(key)
+        token = cache.get(cache_key) if is_cache_shared() else None
+        if token is None:
+            try:
+                token = Token.objects.get(key=key)
+            except Token.DoesNotExist:
+                raise exceptions.AuthenticationFailed(_('Invalid token.'))
+            if is_cache_shared():
+                cache.set(cache_key, token, settings.AUTHENTICATION_CACHE_TTL)
+
+        user = get_user(token.user_id)
+        if user is None or not user.is_active:
+            raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+        token.user = user
+
+        return (user, token)
+
+
+def forget_cached_users(user_ids):
+    cache.delete_many([_get_user_cache_key(user_id) for user_id in user_ids])
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def forget_cached_user(instance, **kwargs):
+    forget_cached_users([instance.pk])
+
+
+@receiver(post_delete, sender=Token)
+def forget_cached_token(instance, **kwargs):
+    cache.delete(_get_token_cache_key(instance.key))
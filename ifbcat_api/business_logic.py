@@ -1,9 +1,12 @@
 import logging
+import weakref
 
 from django.apps import apps
 from django.contrib.auth import get_permission_codename, get_user_model
 from django.contrib.auth.models import Group, Permission
 from django.contrib.contenttypes.models import ContentType
+from django.core.exceptions import FieldError
+from django.db.models import Q, Value, BooleanField, ExpressionWrapper
 from rest_framework.authtoken.models import Token
 
 from ifbcat_api import models
@@ -153,12 +156,53 @@ def _do_grants(group_name, models_concerned, actions):
             )
 
 
+###############################################################################
+# Group membership
+###############################################################################
+__GROUP_NAMES_ATTR = "_ifbcat_group_names"
+
+# the user instances keeping their group names in this process, by id(), so they can be found from the pks of the
+# users when the groups are changed from the group, e.g. group.user_set.add(...)
+__users_with_group_names = weakref.WeakValueDictionary()
+
+
+def get_group_names(user):
+    """
+    Get the names of the groups of the user. They are fetched once and kept on the user instance, so for the
+    request.user they are shared by all the checks done while processing the request.
+
+    :param user: the user
+    :return: a frozenset of group names
+    """
+    names = getattr(user, __GROUP_NAMES_ATTR, None)
+    if names is None:
+        if user.pk is None:
+            names = frozenset()
+        else:
+            names = frozenset(user.groups.values_list("name", flat=True))
+            __users_with_group_names[id(user)] = user
+        setattr(user, __GROUP_NAMES_ATTR, names)
+    return names
+
+
+def forget_group_names(user):
+    """Drop the group names kept on the user instance, next call to get_group_names will fetch them again"""
+    user.__dict__.pop(__GROUP_NAMES_ATTR, None)
+
+
+def forget_group_names_of_users(pks=None):
+    """Drop the group names kept on all the instances of the users of pks, of all the users when pks is None"""
+    for user in list(__users_with_group_names.values()):
+        if pks is None or user.pk in pks:
+            forget_group_names(user)
+
+
 ###############################################################################
 # User manager
 ###############################################################################
 def is_user_manager(user, request=None):
     user = user or request.user
-    return user.groups.filter(name=__USER_MANAGER_GRP_NAME).exists()
+    return __USER_MANAGER_GRP_NAME in get_group_names(user)
 
 
 def get_user_manager_group_name():
@@ -184,7 +228,7 @@ def can_edit_user(acting_user, edited_user):
 # No restriction on catalog's models
 ###############################################################################
 def has_no_restriction_on_catalog_models(user, request=None):
-    return user.groups.filter(name=__NO_RESTRICTION).exists()
+    return __NO_RESTRICTION in get_group_names(user)
 
 
 def get_no_restriction_on_catalog_models_name():
@@ -203,7 +247,7 @@ def set_no_restriction_on_catalog_models(user, status: bool):
 ###############################################################################
 def is_super_editor(user, request=None):
     user = user or request.user
-    return user.is_superuser and user.groups.filter(name=__SUPER_EDITOR_GRP_NAME).exists()
+    return user.is_superuser and __SUPER_EDITOR_GRP_NAME in get_group_names(user)
 
 
 ###############################################################################
@@ -211,7 +255,7 @@ def is_super_editor(user, request=None):
 ###############################################################################
 def is_curator(user, request=None):
     user = user or request.user
-    return user.is_staff and user.groups.filter(name=__CURATOR_GRP_NAME).exists()
+    return user.is_staff and __CURATOR_GRP_NAME in get_group_names(user)
 
 
 ###############################################################################
@@ -255,6 +299,46 @@ def __has_permission_for_methods(*, model, request, methods: list, obj=None):
     return True
 
 
+def __get_permission_q_for_methods(*, model, request, methods: list):
+    # similar to __has_permission_for_methods, but for all instances of the model at once
+    q = True
+    for perm in get_permission_classes(model):
+        for method in methods:
+            with permissions.simple_override_method(request=request, method=method) as request:
+                q = permissions.q_and(q, permissions.get_object_permission_q(perm(), request, None, model))
+    return q
+
+
+def annotate_permissions(queryset, request):
+    """
+    Annotate can_view, can_change and can_delete on the instances of the queryset, all computed in the same query as
+    the instances. An annotation is left out when the permission classes of the model cannot be translated to SQL.
+
+    :param queryset: the queryset to annotate
+    :param request: the request of the user the permissions are computed for
+    :return: the annotated queryset
+    """
+    annotations = dict()
+    for name, methods in [
+        ("can_view", ["GET"]),
+        ("can_change", ["POST", "PUT"]),
+        ("can_delete", ["DELETE"]),
+    ]:
+        try:
+            q = __get_permission_q_for_methods(model=queryset.model, request=request, methods=methods)
+            if isinstance(q, bool):
+                annotations[name] = Value(q, output_field=BooleanField())
+            else:
+                # in a sub-query so joins done to reach the targets do not duplicate the rows of the queryset
+                granted = queryset.model._default_manager.filter(q).values("pk")
+                annotations[name] = ExpressionWrapper(Q(pk__in=granted), output_field=BooleanField())
+        except permissions.NotTranslatableToQ as e:
+            logger.debug(f'Cannot annotate {name} on "{queryset.model.__name__}" as {e} has no get_object_permission_q')
+        except FieldError as e:
+            logger.warning(f'Cannot annotate {name} on "{queryset.model.__name__}": {e}')
+    return queryset.annotate(**annotations)
+
+
 def has_view_permission(model, request, obj=None):
     return __has_permission_for_methods(model=model, request=request, obj=obj, methods=["GET"])
 
@@ -301,6 +385,25 @@ def is_from_admin(request):
     return getattr(request, "upgrade_attributes", dict()).get("from_admin", False)
 
 
+###############################################################################
+# Request cache
+###############################################################################
+def get_request_cache(request, name):
+    """
+    Get a dict living as long as the request, used to memoize what is computed again and again while processing it.
+
+    :param request: a django HttpRequest, or a rest_framework Request (the cache is then shared with the HttpRequest)
+    :param name: namespace of the cache, so different kind of results do not collide
+    :return: the dict dedicated to name
+    """
+    request = getattr(request, "_request", request)
+    caches = getattr(request, "request_cache", None)
+    if caches is None:
+        caches = dict()
+        setattr(request, "request_cache", caches)
+    return caches.setdefault(name, dict())
+
+
 ###############################################################################
 # Permission classes
 ###############################################################################
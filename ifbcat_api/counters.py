@@ -0,0 +1,146 @@
+"""
+Denormalized counters, stored in columns so lists and permission checks do not aggregate the relations on demand:
+
+- Team.members_count: number of distinct users being member, leader or deputy of the team,
+- Keyword.usage_count, Topic.usage_count and Field.usage_count: number of references from any other model.
+
+They are refreshed in the transaction changing the relations, by the m2m_changed and pre/post_delete receivers below,
+and can be rebuilt from scratch with the rebuild_counters command. The delete receivers are only connected to the models
+referencing a counted one, connect_receivers() being called once the app is ready, so the other models are still
+deleted in bulk.
+"""
+
+import functools
+import operator
+
+from django.apps import apps as django_apps
+from django.db.models import OuterRef, Q, Value
+from django.db.models.signals import m2m_changed, pre_delete, post_delete
+from django.dispatch import receiver
+
+from ifbcat_api.misc import SubqueryCount
+from ifbcat_api.permissions import get_referencing_querysets
+
+MEMBERS_FIELDS = ('members', 'leaders', 'scientificLeaders', 'technicalLeaders', 'deputies')
+USAGE_COUNTED_MODELS = ('Keyword', 'Topic', 'Field')
+
+
+def get_members_count_expression(team_model):
+    user_model = team_model._meta.get_field(MEMBERS_FIELDS[0]).related_model
+    is_member = functools.reduce(
+        operator.or_,
+        [Q(**{team_model._meta.get_field(name).related_query_name(): OuterRef('pk')}) for name in MEMBERS_FIELDS],
+    )
+    return SubqueryCount(user_model._default_manager.filter(is_member).order_by().values('pk').distinct())
+
+
+def get_usage_count_expression(model):
+    return functools.reduce(
+        operator.add,
+        [SubqueryCount(referencing.order_by().values('pk')) for referencing in get_referencing_querysets(model)],
+        Value(0),
+    )
+
+
+def refresh_members_count(team_model, pks=None):
+    queryset = team_model._default_manager.all()
+    if pks is not None:
+        queryset = queryset.filter(pk__in=pks)
+    return queryset.update(members_count=get_members_count_expression(team_model))
+
+
+def refresh_usage_count(model, pks=None):
+    queryset = model._default_manager.all()
+    if pks is not None:
+        queryset = queryset.filter(pk__in=pks)
+    return queryset.update(usage_count=get_usage_count_expression(model))
+
+
+def rebuild_counters(apps=django_apps):
+    """Compute again all the counters, apps can be the historical apps of a migration"""
+    refresh_members_count(apps.get_model('ifbcat_api', 'Team'))
+    for name in USAGE_COUNTED_MODELS:
+        refresh_usage_count(apps.get_model('ifbcat_api', name))
+
+
+@functools.lru_cache(maxsize=None)
+def get_tracked_through_models():
+    """
+    The through models the counters depend on, associated to the model having the counter, the name of the FK to it
+    in the through model, the name of the other FK, the model it targets, and the function refreshing the counter.
+    """
+    tracked = dict()
+    team_model = django_apps.get_model('ifbcat_api', 'Team')
+    for name in MEMBERS_FIELDS:
+        field = team_model._meta.get_field(name)
+        tracked[field.remote_field.through] = (
+            team_model,
+            field.m2m_field_name(),
+            field.m2m_reverse_field_name(),
+            field.related_model,
+            refresh_members_count,
+        )
+    for name in USAGE_COUNTED_MODELS:
+        model = django_apps.get_model('ifbcat_api', name)
+        for relation in model._meta.related_objects:
+            if relation.many_to_many:
+                tracked[relation.through] = (
+                    model,
+                    relation.field.m2m_reverse_field_name(),
+                    relation.field.m2m_field_name(),
+                    relation.related_model,
+                    refresh_usage_count,
+                )
+    return tracked
+
+
+@receiver(m2m_changed)
+def update_counters_on_m2m_changed(sender, instance, action, model, pk_set, **kwargs):
+    tracked = get_tracked_through_models().get(sender)
+    if tracked is None:
+        return
+    counted_model, counted_field, other_field, other_model, refresh = tracked
+    if model is not counted_model:
+        # the instance has the counter, e.g.: team.members.add(...) or keyword.event_set.remove(...)
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            refresh(counted_model, [instance.pk])
+    elif action == 'pre_clear':
+        # pk_set is not provided when clearing, the instances losing a reference are fetched before
+        instance._counters_cleared = list(
+            sender._default_manager.filter(**{other_field: instance.pk}).values_list(counted_field, flat=True)
+        )
+    elif action == 'post_clear':
+        refresh(counted_model, instance.__dict__.pop('_counters_cleared', []))
+    elif action in ('post_add', 'post_remove') and pk_set:
+        refresh(counted_model, pk_set)
+
+
+def collect_counters_on_delete(sender, instance, **kwargs):
+    """The through rows are deleted in cascade without m2m_changed, collect the instances they reference beforehand"""
+    to_refresh = []
+    for through, tracked in get_tracked_through_models().items():
+        counted_model, counted_field, other_field, other_model, refresh = tracked
+        if sender is other_model and sender is not counted_model:
+            referenced = through._default_manager.filter(**{other_field: instance.pk})
+            pks = list(referenced.values_list(counted_field, flat=True))
+            if pks:
+                to_refresh.append((refresh, counted_model, pks))
+    if to_refresh:
+        instance._counters_to_refresh = to_refresh
+
+
+def update_counters_on_delete(sender, instance, **kwargs):
+    for refresh, counted_model, pks in instance.__dict__.pop('_counters_to_refresh', []):
+        refresh(counted_model, pks)
+
+
+def connect_receivers():
+    """Connect the delete receivers to the models referencing a counted one through a tracked relation"""
+    senders = {
+        other_model
+        for counted_model, _, _, other_model, _ in get_tracked_through_models().values()
+        if other_model is not counted_model
+    }
+    for sender in senders:
+        pre_delete.connect(collect_counters_on_delete, sender=sender, dispatch_uid=f'counters-{sender._meta.label}')
+        post_delete.connect(update_counters_on_delete, sender=sender, dispatch_uid=f'counters-{sender._meta.label}')
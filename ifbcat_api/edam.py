@@ -0,0 +1,275 @@
+"""
+Local index of the topics of the EDAM ontology, so the topics are filled and validated without requesting EBI OLS.
+
+The load_edam command ingests an EDAM release (EDAM.owl, EDAM.tsv, EDAM.csv, or a JSON list of topics like the
+Topic.json of preload_catalog) into EDAM_INDEX, a JSON file giving the label, definition, synonyms, parents and
+obsolescence of each topic. Each process keeps it in memory, and reads it again once it is replaced.
+
+The parents are also stored in TopicClosure, giving all the ancestors of each topic, to filter by a topic and its
+subtopics.
+"""
+
+import collections
+import csv
+import json
+import logging
+import os
+import xml.etree.ElementTree as ET
+
+from django.apps import apps as django_apps
+from django.conf import settings
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+TOPIC_PREFIX = 'http://edamontology.org/topic_'
+
+RDF = '{http://www.w3.org/1999/02/22-rdf-syntax-ns#}'
+RDFS = '{http://www.w3.org/2000/01/rdf-schema#}'
+OWL = '{http://www.w3.org/2002/07/owl#}'
+OBO = '{http://www.geneontology.org/formats/oboInOwl#}'
+
+Term = collections.namedtuple('Term', ['uri', 'label', 'definition', 'synonyms', 'parents', 'obsolete'])
+
+# path, modification time, version and terms of the index loaded
+__index = None
+
+
+def parse_owl(f):
+    """The topics of the EDAM release in OWL (RDF/XML), and its version"""
+    terms, version = [], None
+    for _, element in ET.iterparse(f):
+        if element.tag == f'{OWL}versionInfo' and version is None:
+            version = element.text
+        if element.tag != f'{OWL}Class':
+            continue
+        uri = element.get(f'{RDF}about', '')
+        if uri.startswith(TOPIC_PREFIX):
+            terms.append(
+                Term(
+                    uri=uri,
+                    label=element.findtext(f'{RDFS}label', ''),
+                    definition=element.findtext(f'{OBO}hasDefinition', ''),
+                    synonyms=[e.text for e in element.findall(f'{OBO}hasExactSynonym') if e.text],
+                    parents=[
+                        e.get(f'{RDF}resource')
+                        for e in element.findall(f'{RDFS}subClassOf')
+                        if e.get(f'{RDF}resource', '').startswith(TOPIC_PREFIX)
+                    ],
+                    obsolete=element.findtext(f'{OWL}deprecated') == 'true',
+                )
+            )
+        element.clear()
+    return terms, version
+
+
+def parse_table(f, delimiter):
+    """The topics of the EDAM release in TSV or CSV, the multiple values of a column being separated by |"""
+
+    def split(value):
+        return [v for v in (value or '').split('|') if v]
+
+    terms = []
+    for row in csv.DictReader(f, delimiter=delimiter):
+        if row['Class ID'].startswith(TOPIC_PREFIX):
+            terms.append(
+                Term(
+                    uri=row['Class ID'],
+                    label=row['Preferred Label'],
+                    definition=split(row['Definitions'])[0] if split(row['Definitions']) else '',
+                    synonyms=split(row['Synonyms']),
+                    parents=[parent for parent in split(row['Parents']) if parent.startswith(TOPIC_PREFIX)],
+                    obsolete=row['Obsolete'].strip().upper() == 'TRUE',
+                )
+            )
+    return terms, None
+
+
+def parse_json(f):
+    """The topics of an index, or of a list of topics with their uri, label, description and synonyms"""
+    data = json.load(f)
+    if isinstance(data, dict):
+        return [Term(uri, *values) for uri, values in data['topics'].items()], data['version']
+    return [
+        Term(
+            uri=item['uri'],
+            label=item.get('label') or '',
+            definition=item.get('description') or '',
+            synonyms=item.get('synonyms') or [],
+            parents=item.get('parents') or [],
+            obsolete=item.get('obsolete', False),
+        )
+        for item in data
+    ], None
+
+
+def read_release(path):
+    """The topics of the EDAM release in path, by uri, and its version, according to the extension of the file"""
+    extension = os.path.splitext(path)[1].lower()
+    if extension in ('.owl', '.xml'):
+        with open(path, 'rb') as f:
+            terms, version = parse_owl(f)
+    elif extension in ('.tsv', '.csv'):
+        with open(path, newline='') as f:
+            terms, version = parse_table(f, '\t' if extension == '.tsv' else ',')
+    elif extension == '.json':
+        with open(path) as f:
+            terms, version = parse_json(f)
+    else:
+        raise ValueError(f"Unknown format of EDAM release {path}, expected .owl, .tsv, .csv or .json")
+    return {term.uri: term for term in terms}, version or os.path.basename(path)
+
+
+def write_index(terms, version, path=None):
+    """Write the index atomically, so the processes reading it never see it partially written"""
+    path = path or settings.EDAM_INDEX
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(f'{path}.tmp', 'w') as f:
+        json.dump(dict(version=version, topics={uri: list(term[1:]) for uri, term in terms.items()}), f)
+    os.replace(f'{path}.tmp', path)
+
+
+def get_index():
+    """The version of the index and its topics by uri, None if there is no index"""
+    global __index
+    path = settings.EDAM_INDEX
+    try:
+        mtime = os.stat(path).st_mtime
+    except (OSError, TypeError):
+        return None
+    if __index is None or __index[:2] != (path, mtime):
+        with open(path) as f:
+            terms, version = parse_json(f)
+        __index = (path, mtime, version, {term.uri: term for term in terms})
+    return __index[2:]
+
+
+def get_term(uri):
+    """The term of the topic in the index, None if missing or if there is no index"""
+    index = get_index()
+    if index is None:
+        return None
+    return index[1].get(uri)
+
+
+def set_topic_fields(topic, term):
+    """Set the fields of topic from its term, and return whether they changed"""
+    values = dict(label=term.label, description=term.definition, synonyms=term.synonyms)
+    changed = any(getattr(topic, name) != value for name, value in values.items())
+    for name, value in values.items():
+        setattr(topic, name, value)
+    return changed
+
+
+def update_topics(topics=None):
+    """
+    Update in bulk the topics from the index, all of them by default
+
+    :return: the topics updated, and the ones missing in the index
+    """
+    from ifbcat_api import misc, models
+
+    topics = models.Topic.objects.all() if topics is None else topics
+    updated, missing = [], []
+    for topic in topics:
+        term = get_term(topic.uri)
+        if term is None:
+            missing.append(topic)
+        elif set_topic_fields(topic, term):
+            updated.append(topic)
+    fields = ['label', 'description', 'synonyms']
+    models.Topic.objects.bulk_update(updated, fields)
+    misc.send_post_save(models.Topic, updated, created=False, update_fields=fields)
+    return updated, missing
+
+
+def get_ancestors(uri, terms):
+    """The depth of each ancestor of the topic in terms, by uri, the topic itself included at depth 0"""
+    return get_depths(uri, lambda current: terms[current].parents if current in terms else [])
+
+
+def get_depths(uri, get_next):
+    """The depth of each topic reached from uri through get_next, by uri, at the depth of the shortest path"""
+    depths = {uri: 0}
+    queue = collections.deque([uri])
+    while queue:
+        current = queue.popleft()
+        for following in get_next(current):
+            if following not in depths:
+                depths[following] = depths[current] + 1
+                queue.append(following)
+    return depths
+
+
+def update_closure(apps=django_apps):
+    """
+    Rebuild the closure of the topics from the parents in the index, the topics missing in the index only being their
+    own ancestor. The ancestors missing in the database are skipped, not the relations through them. apps can be the
+    historical apps of a migration. It is run once the index is loaded, the topics created later being added by
+    add_to_closure().
+
+    :return: the number of ancestor/descendant pairs
+    """
+    Topic = apps.get_model('ifbcat_api', 'Topic')
+    TopicClosure = apps.get_model('ifbcat_api', 'TopicClosure')
+    index = get_index()
+    terms = index[1] if index is not None else dict()
+    pks = dict(Topic.objects.values_list('uri', 'pk'))
+    closure = [
+        TopicClosure(ancestor_id=pks[ancestor], descendant_id=pk, depth=depth)
+        for uri, pk in pks.items()
+        for ancestor, depth in get_ancestors(uri, terms).items()
+        if ancestor in pks
+    ]
+    with transaction.atomic():
+        TopicClosure.objects.all().delete()
+        TopicClosure.objects.bulk_create(closure, batch_size=1000)
+        forget_filtered_topics(Topic)
+    return len(closure)
+
+
+def add_to_closure(uris, apps=django_apps):
+    """
+    Add the topics of uris, created since the closure was built, to it: the pairs with their ancestors and with the
+    topics they are an ancestor of, the other pairs being the same whether they are in the database or not.
+
+    :return: the number of ancestor/descendant pairs added
+    """
+    Topic = apps.get_model('ifbcat_api', 'Topic')
+    TopicClosure = apps.get_model('ifbcat_api', 'TopicClosure')
+    index = get_index()
+    terms = index[1] if index is not None else dict()
+    children = collections.defaultdict(list)
+    for term in terms.values():
+        for parent in term.parents:
+            children[parent].append(term.uri)
+    depths = dict()
+    for uri in uris:
+        depths.update({(ancestor, uri): depth for ancestor, depth in get_ancestors(uri, terms).items()})
+        depths.update(
+            {
+                (uri, descendant): depth
+                for descendant, depth in get_depths(uri, lambda current: children.get(current, [])).items()
+            }
+        )
+    pks = dict(Topic.objects.filter(uri__in={uri for pair in depths for uri in pair}).values_list('uri', 'pk'))
+    closure = [
+        TopicClosure(ancestor_id=pks[ancestor], descendant_id=pks[descendant], depth=depth)
+        for (ancestor, descendant), depth in depths.items()
+        if ancestor in pks and descendant in pks
+    ]
+    with transaction.atomic():
+        TopicClosure.objects.bulk_create(closure, batch_size=1000, ignore_conflicts=True)
+        forget_filtered_topics(Topic)
+    return len(closure)
+
+
+def forget_filtered_topics(topic_model):
+    """
+    Forget the catalog snapshot and the cached responses, filtered on the topics through the closure which is not
+    connected to their receivers, being a derived table
+    """
+    from ifbcat_api import response_cache, snapshot
+
+    snapshot.forget_catalog_version_on_write(topic_model)
+    response_cache.invalidate_responses_on_write(topic_model)
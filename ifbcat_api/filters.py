@@ -9,15 +9,24 @@
 # "IsAuthenticatedOrReadOnly" is used to ensure that a ViewSet is read-only if the user is not autheticated.
 # "IsAuthenticated" is used to block access to an entire ViewSet endpoint unless a user is autheticated
 
+import uuid
 import warnings
 
+from django import forms
 from django.conf import settings
-from django.core.exceptions import FieldDoesNotExist
+from django.core.cache import cache
+from django.core.exceptions import FieldDoesNotExist, ValidationError
 from django.db.models import Q, ManyToManyField, ManyToOneRel, ManyToManyRel, Exists, OuterRef
-from django.urls import reverse, NoReverseMatch
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.template import loader
+from django.urls import reverse, resolve, NoReverseMatch, get_script_prefix
 from django_filters import rest_framework as django_filters
-from django_filters.fields import ModelMultipleChoiceField
+from django_filters.fields import ModelChoiceField, ModelMultipleChoiceField
 from django_filters.rest_framework import DjangoFilterBackend
+from rest_framework.filters import SearchFilter
+
+from ifbcat_api import vocabularies
+from ifbcat_api.misc import connect_to_catalog
 
 
 def filter_not_used(filter_field, model_field):
@@ -37,21 +46,140 @@ def filter_not_used(filter_field, model_field):
     return None, False
 
 
-class AutoSubsetFilterSet(django_filters.FilterSet):
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
+__USED_VALUES_VERSION_KEY = "auto-subset-used-values-version"
+
+
+def get_used_values_version():
+    version = cache.get(__USED_VALUES_VERSION_KEY)
+    if version is None:
+        version = uuid.uuid4().hex
+        cache.add(__USED_VALUES_VERSION_KEY, version, None)
+    return version
+
+
+def forget_used_values(sender, update_fields=None, **kwargs):
+    if update_fields is not None and set(update_fields) <= {'last_login'}:
+        # a user logging in does not change the values used
+        return
+    cache.delete(__USED_VALUES_VERSION_KEY)
+
+
+def connect_receivers():
+    connect_to_catalog(forget_used_values, post_save, post_delete, m2m_changed)
+
+
+def get_used_choices(model, field_name, filter_field, model_field):
+    """
+    Get the choices, as (pk, label), of the values of the filter that are actually used by the instances of model. They
+    are kept in the cache for AUTO_SUBSET_CACHE_TTL seconds, and forgotten as soon as an instance of the catalog is
+    saved or deleted.
+
+    :return: the list of choices, or None if the values of this filter are not restricted to the used ones
+    """
+    queryset, check_qs = filter_not_used(filter_field, model_field)
+    if not check_qs:
+        return None
+    key = f"auto-subset-used-choices-{get_used_values_version()}-{model._meta.label}-{field_name}"
+    choices = cache.get(key)
+    if choices is None:
+        field = filter_field.field
+        # once each, in the order of the queryset
+        choices = list({instance.pk: field.label_from_instance(instance) for instance in queryset}.items())
+        cache.set(key, choices, settings.AUTO_SUBSET_CACHE_TTL)
+    return choices
+
+
+class VocabularyChoiceField(ModelChoiceField):
+    """ModelChoiceField reading the instance from the cached controlled vocabulary when the queryset is one"""
+
+    def to_python(self, value):
+        vocabulary = vocabularies.get_vocabulary(self.queryset, self.to_field_name or 'pk')
+        if vocabulary is None or not isinstance(value, (str, int)) or value in self.empty_values:
+            return super().to_python(value)
+        if self.null_label is not None and value == self.null_value:
+            return value
+        instance = vocabulary.get(self.to_field_name or 'pk', value)
+        if instance is None:
+            raise ValidationError(self.error_messages['invalid_choice'], code='invalid_choice', params={'value': value})
+        return instance
+
+
+class VocabularyMultipleChoiceField(ModelMultipleChoiceField):
+    """ModelMultipleChoiceField reading the instances from the cached controlled vocabulary when the queryset is one"""
+
+    def _check_values(self, value):
+        vocabulary = vocabularies.get_vocabulary(self.queryset, self.to_field_name or 'pk')
+        if vocabulary is None or self.null_label is not None:
+            return super()._check_values(value)
+        instances = []
+        for v in dict.fromkeys(value):
+            instance = vocabulary.get(self.to_field_name or 'pk', v) if isinstance(v, (str, int)) else None
+            if instance is None:
+                raise ValidationError(self.error_messages['invalid_choice'], code='invalid_choice', params={'value': v})
+            instances.append(instance)
+        return instances
+
+
+class VocabularyChoiceFilter(django_filters.ModelChoiceFilter):
+    field_class = VocabularyChoiceField
+
+
+class VocabularyMultipleChoiceFilter(django_filters.ModelMultipleChoiceFilter):
+    field_class = VocabularyMultipleChoiceField
+
+
+class VocabularyFilterSet(django_filters.FilterSet):
+    @classmethod
+    def filter_for_lookup(cls, field, lookup_type):
+        """Filter the relations to the controlled vocabularies without querying them"""
+        filter_class, params = super().filter_for_lookup(field, lookup_type)
+        if field.is_relation and vocabularies.get_slug_field(field.related_model) is not None:
+            if filter_class is django_filters.ModelChoiceFilter:
+                filter_class = VocabularyChoiceFilter
+            elif filter_class is django_filters.ModelMultipleChoiceFilter:
+                filter_class = VocabularyMultipleChoiceFilter
+        return filter_class, params
+
+
+class TopicDescendantFilter(django_filters.ModelChoiceFilter):
+    """
+    Filter on the relation field_name to topics by a topic and its subtopics, with a single join of the closure of the
+    topics instead of listing the subtopics
+    """
+
+    def __init__(self, field_name, *args, **kwargs):
+        from ifbcat_api.models import Topic
+
+        kwargs.setdefault('queryset', Topic.objects.all())
+        kwargs.setdefault('distinct', True)
+        super().__init__(f'{field_name}__ancestor_links__ancestor', *args, **kwargs)
+
+
+class AutoSubsetFilterSet(VocabularyFilterSet):
+    def restrict_to_used_values(self):
+        """
+        Restrict the choices of the filters to the values actually used, and disable the filters without any. It is
+        only needed to render the form, so it is not done when the filterset is only used to filter. The choices are
+        read from the cache, so the form is rendered without querying the values.
+
+        :return: the names of the filters restricted
+        """
+        restricted = []
         for field_name in self.get_auto_subset_fields() or []:
-            check_qs = False
             try:
                 model_field = self._meta.model._meta.get_field(field_name)
             except FieldDoesNotExist:
                 # additional filter field cannot be found in class
                 continue
-            queryset, check_qs = filter_not_used(self.filters[field_name], model_field)
-            if check_qs:
-                self.filters[field_name].queryset = queryset
-                if not queryset.exists():
-                    self.filters[field_name].field.widget.attrs["disabled"] = True
+            filter_ = self.filters[field_name]
+            choices = get_used_choices(self._meta.model, field_name, filter_, model_field)
+            if choices is not None:
+                filter_.queryset = filter_.queryset.filter(pk__in=[pk for pk, _ in choices])
+                set_choices(filter_.field, choices)
+                if len(choices) == 0:
+                    filter_.field.widget.attrs["disabled"] = True
+                restricted.append(field_name)
+        return restricted
 
     def get_auto_subset_fields(self):
         return self._meta.fields
@@ -59,8 +187,22 @@ class AutoSubsetFilterSet(django_filters.FilterSet):
 
 class DjangoFilterAutoSubsetBackend(DjangoFilterBackend):
     # filterset_base = AutoSubsetFilterSet
+    filterset_base = VocabularyFilterSet
     raise_exception = True
 
+    def to_html(self, request, queryset, view):
+        filterset = self.get_filterset(request, queryset, view)
+        if filterset is None:
+            return None
+        restricted = filterset.restrict_to_used_values() if isinstance(filterset, AutoSubsetFilterSet) else []
+        for name, filter_ in filterset.filters.items():
+            if name not in restricted:
+                render_without_query(filter_)
+
+        template = loader.get_template(self.template)
+        context = {"filter": filterset}
+        return template.render(context, request)
+
     def get_schema_operation_parameters(self, view):
         try:
             queryset = view.get_queryset()
@@ -86,7 +228,7 @@ class DjangoFilterAutoSubsetBackend(DjangoFilterBackend):
             }
             if field.extra and 'choices' in field.extra:
                 parameter['schema']['enum'] = [c[0] for c in field.extra['choices']]
-            if field.field_class == ModelMultipleChoiceField:
+            if issubclass(field.field_class, ModelMultipleChoiceField):
                 field_queryset, changed = filter_not_used(field, queryset.model._meta.get_field(field_name))
                 try:
                     parameter['schema']['endpoint'] = reverse(get_list_view_name(field_queryset.model))
@@ -102,6 +244,79 @@ class DjangoFilterAutoSubsetBackend(DjangoFilterBackend):
         return parameters
 
 
+class AutocompleteWidget(forms.Widget):
+    """Input autocompleted with the search of a list endpoint, instead of a select listing all the instances"""
+
+    template_name = "rest_framework/filters/autocomplete.html"
+
+    def __init__(self, url, value_key, multiple, attrs=None):
+        super().__init__(attrs)
+        self.url = url
+        self.value_key = value_key
+        self.multiple = multiple
+
+    def format_value(self, value):
+        if value is None:
+            return []
+        values = value if isinstance(value, (list, tuple)) else [value]
+        return [str(v) for v in values if v not in ('', None)]
+
+    def get_context(self, name, value, attrs):
+        context = super().get_context(name, value, attrs)
+        context['widget'].update(url=self.url, value_key=self.value_key, multiple=self.multiple)
+        return context
+
+    def value_from_datadict(self, data, files, name):
+        if self.multiple and hasattr(data, 'getlist'):
+            return data.getlist(name)
+        return data.get(name)
+
+
+def set_choices(field, choices):
+    """Set the choices, as (pk, label), of the ModelChoiceField or ModelMultipleChoiceField so they are not queried"""
+    empty_choices = [] if field.empty_label is None else [("", field.empty_label)]
+    # set as for a ChoiceField, the setter of django_filters expecting the choices of a ChoiceIterator
+    forms.ChoiceField.choices.fset(field, empty_choices + list(choices))
+
+
+def render_without_query(filter_):
+    """
+    Render the filter on a relation without querying its values: with an input autocompleted by the list endpoint of
+    its model when it is searchable, or with the choices of the cached vocabulary when it is a controlled vocabulary.
+    Otherwise, it is left to a select listing the instances.
+    """
+    if not isinstance(filter_, (django_filters.ModelChoiceFilter, django_filters.ModelMultipleChoiceFilter)):
+        return
+    field = filter_.field
+    url = get_search_url(field.queryset.model)
+    if url is not None:
+        multiple = isinstance(field, ModelMultipleChoiceField)
+        field.widget = AutocompleteWidget(url, field.to_field_name or "id", multiple)
+        return
+    vocabulary = vocabularies.get_vocabulary(field.queryset, field.to_field_name or 'pk')
+    if vocabulary is not None:
+        key = field.to_field_name or 'pk'
+        set_choices(field, [(getattr(i, key), field.label_from_instance(i)) for i in vocabulary.instances])
+
+
+def get_search_url(model):
+    """
+    Get the url of the list endpoint of model when it searches the instances with ?search=, e.g. to autocomplete them.
+
+    :return: the url, or None when there is no such endpoint, or it does not declare search_fields
+    """
+    try:
+        url = reverse(get_list_view_name(model))
+    except NoReverseMatch:
+        return None
+    viewset = getattr(resolve(url[len(get_script_prefix()) - 1 :]).func, 'cls', None)
+    if not getattr(viewset, 'search_fields', None):
+        return None
+    if not any(issubclass(backend, SearchFilter) for backend in viewset.filter_backends):
+        return None
+    return url
+
+
 def get_list_view_name(model):
     """
     Given a model class, return the view name to use for URL relationships
@@ -0,0 +1,398 @@
+"""
+On-disk cache of the responses of the external web services (bio.tools, doi.org, EBI OLS, PubMed, grid.ac, ...), and
+of the functions calling them, in a SQLite database of HTTP_CACHE_DIR.
+
+- Each entry is kept HTTP_CACHE_TTL seconds unless set per call. Once expired, a response having an ETag or a
+  Last-Modified header is revalidated with a conditional request, and still served if the service is unreachable.
+- The entries used least recently are evicted when the database exceeds HTTP_CACHE_MAX_SIZE bytes, their total size
+  being kept up to date by triggers rather than summed on each write.
+- The hits are not written one by one but in batches, cf PENDING_HITS_MAX, so the order of the least recently used
+  entries is approximate, by PENDING_HITS_MAX_AGE seconds at most.
+- The writes are transactions, so a crash never leaves a truncated entry, and the WAL journal lets the gunicorn and
+  huey processes read and write it concurrently.
+- The hits, misses, revalidations, ... are counted per namespace, cf the http_cache command.
+
+The JSON files written in the same folder by the previous cache are still read, and copied in the database.
+"""
+
+import atexit
+import collections
+import contextlib
+import functools
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+import requests
+from django.conf import settings
+
+from ifbcat_api import http_client
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    namespace TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    etag TEXT,
+    last_modified TEXT,
+    expires_at REAL NOT NULL,
+    accessed_at REAL NOT NULL,
+    size INTEGER NOT NULL,
+    PRIMARY KEY (namespace, key)
+);
+CREATE INDEX IF NOT EXISTS entries_accessed_at ON entries (accessed_at);
+CREATE TABLE IF NOT EXISTS stats (
+    namespace TEXT NOT NULL,
+    event TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (namespace, event)
+);
+CREATE TABLE IF NOT EXISTS total (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    size INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO total VALUES (0, (SELECT COALESCE(SUM(size), 0) FROM entries));
+CREATE TRIGGER IF NOT EXISTS entries_inserted AFTER INSERT ON entries BEGIN
+    UPDATE total SET size = size + new.size;
+END;
+CREATE TRIGGER IF NOT EXISTS entries_updated AFTER UPDATE OF size ON entries BEGIN
+    UPDATE total SET size = size + new.size - old.size;
+END;
+CREATE TRIGGER IF NOT EXISTS entries_deleted AFTER DELETE ON entries BEGIN
+    UPDATE total SET size = size - old.size;
+END;
+"""
+
+# once evicting, the least recently used entries are deleted until the database is down to this share of its limit
+EVICTION_TARGET = 0.9
+# the hits pending are written once there are this many, or once the first one is pending since this many seconds, and
+# with any other write
+PENDING_HITS_MAX = 100
+PENDING_HITS_MAX_AGE = 10
+
+__local = threading.local()
+
+
+def get_path():
+    if not settings.HTTP_CACHE_DIR:
+        return None
+    return os.path.join(settings.HTTP_CACHE_DIR, 'http_cache.sqlite3')
+
+
+def get_connection():
+    """The connection of the current thread to the database, None if the cache is disabled"""
+    path = get_path()
+    if path is None:
+        return None
+    # not shared with the processes forked, nor the other threads
+    key = (os.getpid(), path)
+    connections = __local.__dict__.setdefault('connections', dict())
+    if key not in connections:
+        os.makedirs(settings.HTTP_CACHE_DIR, exist_ok=True)
+        connection = sqlite3.connect(path, timeout=30, isolation_level=None)
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('PRAGMA synchronous=NORMAL')
+        connection.executescript(SCHEMA)
+        connections[key] = connection
+    return connections[key]
+
+
+class PendingHits:
+    """The hits not written yet: when each entry was last accessed, and the count of the events"""
+
+    def __init__(self):
+        self.accessed_at = dict()
+        self.counts = collections.Counter()
+        self.since = None
+
+    def __len__(self):
+        return sum(self.counts.values())
+
+
+def get_pending_hits():
+    """The hits of the current thread not written yet in the database"""
+    key = (os.getpid(), get_path())
+    pending = __local.__dict__.setdefault('pending_hits', dict())
+    if key not in pending:
+        pending[key] = PendingHits()
+        if threading.current_thread() is threading.main_thread():
+            # the ones of the management commands
+            atexit.register(write_hits)
+    return pending[key]
+
+
+@contextlib.contextmanager
+def write(connection):
+    """Write in a transaction, with the hits pending"""
+    connection.execute('BEGIN IMMEDIATE')
+    try:
+        flush(connection)
+        yield connection
+    except BaseException:
+        connection.execute('ROLLBACK')
+        raise
+    connection.execute('COMMIT')
+
+
+def flush(connection):
+    pending = get_pending_hits()
+    if pending.since is None:
+        return
+    connection.executemany(
+        'UPDATE entries SET accessed_at = MAX(accessed_at, ?) WHERE namespace = ? AND key = ?',
+        [(accessed_at, namespace, key) for (namespace, key), accessed_at in pending.accessed_at.items()],
+    )
+    connection.executemany(
+        'INSERT INTO stats VALUES (?, ?, ?) ON CONFLICT (namespace, event) DO UPDATE SET count = count + excluded.count',
+        [(namespace, event, n) for (namespace, event), n in pending.counts.items()],
+    )
+    pending.__init__()
+
+
+def count(connection, namespace, event, n=1):
+    connection.execute(
+        'INSERT INTO stats VALUES (?, ?, ?) ON CONFLICT (namespace, event) DO UPDATE SET count = count + excluded.count',
+        (namespace, event, n),
+    )
+
+
+def record(namespace, event):
+    with write(get_connection()) as connection:
+        count(connection, namespace, event)
+
+
+class Entry:
+    def __init__(self, value, etag=None, last_modified=None, expires_at=0.0):
+        self.value = value
+        self.etag = etag
+        self.last_modified = last_modified
+        self.expires_at = expires_at
+
+    @property
+    def is_fresh(self):
+        return self.expires_at > time.time()
+
+
+def lookup(namespace, key):
+    """The entry of key, fresh or not, None if missing"""
+    row = (
+        get_connection()
+        .execute(
+            'SELECT value, etag, last_modified, expires_at FROM entries WHERE namespace = ? AND key = ?',
+            (namespace, key),
+        )
+        .fetchone()
+    )
+    if row is None:
+        return None
+    return Entry(json.loads(row[0]), *row[1:])
+
+
+def hit(namespace, key, event='hit'):
+    """Record the access to key, written with the next hits or the next write, cf PENDING_HITS_MAX"""
+    pending = get_pending_hits()
+    pending.accessed_at[(namespace, key)] = time.time()
+    pending.counts[(namespace, event)] += 1
+    if pending.since is None:
+        pending.since = time.monotonic()
+    if len(pending) >= PENDING_HITS_MAX or time.monotonic() - pending.since >= PENDING_HITS_MAX_AGE:
+        write_hits()
+
+
+def write_hits():
+    """Write the hits pending, as done by any write"""
+    connection = get_connection()
+    if connection is not None and get_pending_hits().since is not None:
+        with write(connection):
+            pass
+
+
+def store(namespace, key, entry, ttl=None, event='miss'):
+    """Store the entry of key, fresh for ttl seconds, HTTP_CACHE_TTL by default"""
+    now = time.time()
+    entry.expires_at = now + (settings.HTTP_CACHE_TTL if ttl is None else ttl)
+    value = json.dumps(entry.value)
+    with write(get_connection()) as connection:
+        # not INSERT OR REPLACE, the replaced entry would not be deleted by a trigger
+        connection.execute(
+            'INSERT INTO entries VALUES (?, ?, ?, ?, ?, ?, ?, ?) ON CONFLICT (namespace, key) DO UPDATE SET '
+            'value = excluded.value, etag = excluded.etag, last_modified = excluded.last_modified, '
+            'expires_at = excluded.expires_at, accessed_at = excluded.accessed_at, size = excluded.size',
+            (namespace, key, value, entry.etag, entry.last_modified, entry.expires_at, now, len(value)),
+        )
+        count(connection, namespace, event)
+        evict(connection)
+
+
+def evict(connection):
+    """Delete the least recently used entries if the database exceeds HTTP_CACHE_MAX_SIZE"""
+    (size,) = connection.execute('SELECT size FROM total').fetchone()
+    if size <= settings.HTTP_CACHE_MAX_SIZE:
+        return
+    evicted = []
+    # read through the index until enough are found, not all of them
+    cursor = connection.execute('SELECT namespace, key, size FROM entries ORDER BY accessed_at')
+    for namespace, key, entry_size in cursor:
+        if size <= settings.HTTP_CACHE_MAX_SIZE * EVICTION_TARGET:
+            break
+        evicted.append((namespace, key))
+        size -= entry_size
+    cursor.close()
+    connection.executemany('DELETE FROM entries WHERE namespace = ? AND key = ?', evicted)
+    for namespace, _ in evicted:
+        count(connection, namespace, 'eviction')
+
+
+def read_legacy_file(legacy_path):
+    """The value stored by the previous cache in legacy_path, relative to HTTP_CACHE_DIR, None if missing or invalid"""
+    try:
+        with open(os.path.join(settings.HTTP_CACHE_DIR, legacy_path)) as f:
+            return Entry(json.load(f))
+    except (OSError, ValueError):
+        return None
+
+
+def get_json(url, namespace, key=None, headers=None, ttl=None, legacy_path=None):
+    """
+    GET the JSON of url, from the cache while fresh. The responses other than 200 are returned but not cached.
+
+    :param namespace: the kind of response, e.g. the service requested, for the statistics
+    :param key: the key of the response in the namespace, url by default
+    :param ttl: seconds during which the response is fresh, HTTP_CACHE_TTL by default
+    :param legacy_path: the file where the previous cache stored the response, relative to HTTP_CACHE_DIR
+    """
+    if get_connection() is None:
+        return http_client.get(url, headers=headers).json()
+    key = key or url
+    entry = lookup(namespace, key)
+    if entry is None and legacy_path is not None:
+        entry = read_legacy_file(legacy_path)
+        if entry is not None:
+            store(namespace, key, entry, ttl, event='legacy')
+            return entry.value
+    if entry is not None and entry.is_fresh:
+        hit(namespace, key)
+        return entry.value
+
+    headers = dict(headers or {})
+    if entry is not None and entry.etag:
+        headers['If-None-Match'] = entry.etag
+    if entry is not None and entry.last_modified:
+        headers['If-Modified-Since'] = entry.last_modified
+    try:
+        response = http_client.get(url, headers=headers)
+    except requests.RequestException as e:
+        if entry is None:
+            raise
+        logger.warning(f"Serving the expired response of {url}: {e}")
+        hit(namespace, key, event='stale')
+        return entry.value
+    if response.status_code == 304 and entry is not None:
+        entry.etag = response.headers.get('ETag', entry.etag)
+        entry.last_modified = response.headers.get('Last-Modified', entry.last_modified)
+        store(namespace, key, entry, ttl, event='revalidation')
+        return entry.value
+    value = response.json()
+    if response.status_code == 200:
+        entry = Entry(value, response.headers.get('ETag'), response.headers.get('Last-Modified'))
+        store(namespace, key, entry, ttl)
+    else:
+        record(namespace, 'miss')
+    return value
+
+
+def get_disk_cache_path(func, args, kwargs):
+    """The file where the previous cache stored the value returned by func"""
+    arg_str = "_".join(repr(arg) for arg in args)
+    kwarg_str = "_".join(f"{k}={repr(v)}" for k, v in sorted(kwargs.items()))
+    key = f"{arg_str}_{kwarg_str}"
+    key = "".join(c if c.isalnum() or (c in "-_.") else "_" for c in key)
+    return os.path.join(func.__name__, f"{key.strip('_')}.json")
+
+
+def memoize(namespace=None, ttl=None, legacy_path=get_disk_cache_path):
+    """
+    Cache the JSON serializable values returned by the decorated function, per arguments, the class of a class method
+    being ignored. The exceptions raised are not cached. The function has a refresh() attribute calling it regardless of
+    the cache, e.g. to update the values on purpose.
+
+    :param namespace: the name of the function by default
+    :param ttl: seconds during which a value is fresh, HTTP_CACHE_TTL by default
+    :param legacy_path: the function giving the file where the previous cache stored a value, from the function and its
+        arguments
+    """
+
+    def decorator(func):
+        name = namespace or func.__name__
+
+        def get_key(args, kwargs):
+            """The arguments the value depends on, and its key"""
+            key_args = args[1:] if args and isinstance(args[0], type) else args
+            return key_args, json.dumps([key_args, kwargs], sort_keys=True, default=str)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if get_connection() is None:
+                return func(*args, **kwargs)
+            key_args, key = get_key(args, kwargs)
+            entry = lookup(name, key)
+            if entry is None and legacy_path is not None:
+                entry = read_legacy_file(legacy_path(func, key_args, kwargs))
+                if entry is not None:
+                    store(name, key, entry, ttl, event='legacy')
+                    return entry.value
+            if entry is not None and entry.is_fresh:
+                hit(name, key)
+                return entry.value
+            value = func(*args, **kwargs)
+            store(name, key, Entry(value), ttl)
+            return value
+
+        def refresh(*args, **kwargs):
+            """Call the function even if its value is fresh in the cache, and cache the value returned"""
+            value = func(*args, **kwargs)
+            if get_connection() is not None:
+                store(name, get_key(args, kwargs)[1], Entry(value), ttl, event='refresh')
+            return value
+
+        wrapper.refresh = refresh
+        return wrapper
+
+    return decorator
+
+
+def get_stats():
+    """The count of each event, of the entries and their size in bytes, per namespace"""
+    connection = get_connection()
+    stats = dict()
+    if connection is None:
+        return stats
+    write_hits()
+    for namespace, event, n in connection.execute('SELECT namespace, event, count FROM stats'):
+        stats.setdefault(namespace, dict())[event] = n
+    for namespace, entries, size in connection.execute(
+        'SELECT namespace, COUNT(*), SUM(size) FROM entries GROUP BY namespace'
+    ):
+        stats.setdefault(namespace, dict()).update(entries=entries, size=size)
+    return stats
+
+
+def purge_expired():
+    """Delete the expired entries which cannot be revalidated, and return how many were"""
+    with write(get_connection()) as connection:
+        return connection.execute(
+            'DELETE FROM entries WHERE expires_at <= ? AND etag IS NULL AND last_modified IS NULL',
+            (time.time(),),
+        ).rowcount
+
+
+def clear():
+    get_pending_hits().__init__()
+    with write(get_connection()) as connection:
+        connection.execute('DELETE FROM entries')
+        connection.execute('DELETE FROM stats')
@@ -0,0 +1,131 @@
+"""
+The client of the external web services (bio.tools, doi.org, EBI OLS, NCBI, OpenCage, ...): a requests session shared
+by the threads of the process, keeping the connections alive in a pool per host.
+
+- The requests to a host are limited to a number at once and per second, cf HTTP_CLIENT_HOSTS.
+- They time out after HTTP_CLIENT_TIMEOUT seconds, and are retried HTTP_CLIENT_RETRIES times with an exponential
+  backoff when the connection fails or the host answers 429 or 5xx.
+- The number of requests, of errors and their latency are measured per host, cf get_metrics().
+"""
+
+import contextlib
+import logging
+import os
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+__lock = threading.Lock()
+__clients = dict()
+__limits = dict()
+__metrics = dict()
+
+
+class HostLimit:
+    """The requests to a host at once, and per second"""
+
+    def __init__(self, concurrency, rate=None):
+        self.semaphore = threading.BoundedSemaphore(concurrency)
+        self.interval = 1 / rate if rate else 0
+        self.lock = threading.Lock()
+        self.next_at = 0
+
+    @contextlib.contextmanager
+    def acquire(self):
+        with self.semaphore:
+            if self.interval:
+                with self.lock:
+                    now = time.monotonic()
+                    wait = self.next_at - now
+                    self.next_at = max(now, self.next_at) + self.interval
+                if wait > 0:
+                    time.sleep(wait)
+            yield
+
+
+def get_host_settings(host):
+    """The limits of host in HTTP_CLIENT_HOSTS, which also apply to its subdomains"""
+    for name, host_settings in settings.HTTP_CLIENT_HOSTS.items():
+        if host == name or host.endswith(f'.{name}'):
+            return name, host_settings
+    return host, dict(concurrency=settings.HTTP_CLIENT_DEFAULT_CONCURRENCY)
+
+
+def get_limit(host):
+    name, host_settings = get_host_settings(host)
+    with __lock:
+        if name not in __limits:
+            __limits[name] = HostLimit(**host_settings)
+        return __limits[name]
+
+
+def record(host, seconds, error):
+    with __lock:
+        metrics = __metrics.setdefault(host, dict(requests=0, errors=0, seconds=0.0, max_seconds=0.0))
+        metrics['requests'] += 1
+        metrics['errors'] += error
+        metrics['seconds'] += seconds
+        metrics['max_seconds'] = max(metrics['max_seconds'], seconds)
+
+
+def get_metrics():
+    """The number of requests, of errors, the total and max seconds they took per host, since the process started"""
+    with __lock:
+        return {host: dict(metrics) for host, metrics in __metrics.items()}
+
+
+def log_metrics():
+    for host, metrics in sorted(get_metrics().items()):
+        logger.info(
+            f"{host}: {metrics['requests']} requests, {metrics['errors']} errors, "
+            f"{metrics['seconds'] / metrics['requests']:.3f}s on average, {metrics['max_seconds']:.3f}s at most"
+        )
+
+
+class Client(requests.Session):
+    def __init__(self):
+        super().__init__()
+        retry = Retry(
+            total=settings.HTTP_CLIENT_RETRIES,
+            backoff_factor=settings.HTTP_CLIENT_BACKOFF_FACTOR,
+            status_forcelist=(429, 500, 502, 503, 504),
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_maxsize=settings.HTTP_CLIENT_POOL_SIZE, max_retries=retry)
+        self.mount('http://', adapter)
+        self.mount('https://', adapter)
+
+    def request(self, method, url, *args, **kwargs):
+        kwargs.setdefault('timeout', settings.HTTP_CLIENT_TIMEOUT)
+        host = urlsplit(url).hostname or ''
+        start = time.perf_counter()
+        try:
+            with get_limit(host).acquire():
+                response = super().request(method, url, *args, **kwargs)
+        except requests.RequestException:
+            record(host, time.perf_counter() - start, error=True)
+            raise
+        record(host, time.perf_counter() - start, error=response.status_code >= 500)
+        return response
+
+
+def get_client():
+    """The client of the current process"""
+    pid = os.getpid()
+    with __lock:
+        if pid not in __clients:
+            __clients.clear()
+            __clients[pid] = Client()
+        return __clients[pid]
+
+
+def get(url, **kwargs):
+    return get_client().get(url, **kwargs)
@@ -8,5 +8,23 @@ logger = logging.getLogger(__name__)
 
 
 class Command(BaseCommand):
-    def handle(self, *args, **options):
-        update_tools()
+    help = "Update the tools from bio.tools, resuming the previous update if it was interrupted"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Also update the tools whose entry did not change in bio.tools since their last update',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            help='Number of entries fetched at once, UPDATE_TOOLS_WORKERS by default',
+        )
+
+    def handle(self, *args, force=False, workers=None, **options):
+        report = update_tools(force=force, workers=workers)
+        for outcome, biotools_ids in report.items():
+            self.stdout.write(f"{len(biotools_ids)} tools {outcome}")
+        if report['failed']:
+            self.stdout.write(self.style.WARNING(f"Could not update the tools {', '.join(report['failed'])}"))
@@ -0,0 +1,30 @@
+from django.core.management import BaseCommand
+
+from ifbcat_api import http_cache
+
+
+class Command(BaseCommand):
+    help = "Report the statistics of the cache of the external web services, and purge or clear it"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--purge',
+            action='store_true',
+            help='Delete the expired entries which cannot be revalidated',
+        )
+        parser.add_argument(
+            '--clear',
+            action='store_true',
+            help='Delete all the entries and the statistics',
+        )
+
+    def handle(self, *args, purge=False, clear=False, **options):
+        if http_cache.get_path() is None:
+            self.stdout.write(self.style.WARNING("The cache is disabled, cf CACHE_DIR"))
+            return
+        if clear:
+            http_cache.clear()
+        elif purge:
+            self.stdout.write(f"{http_cache.purge_expired()} expired entries deleted")
+        for namespace, stats in sorted(http_cache.get_stats().items()):
+            self.stdout.write(f"{namespace}: {', '.join(f'{n} {event}' for event, n in sorted(stats.items()))}")
@@ -1,20 +1,185 @@
-import json
 import logging
 import os
+import queue
+import threading
 from json.decoder import JSONDecodeError
 
-import urllib3
+import requests
 from django.core.management import BaseCommand
+from django.db import transaction
 from tqdm import tqdm
 
+from ifbcat_api import edam, http_cache, http_client, pubmed
+from ifbcat_api.misc import send_post_save
+from ifbcat_api.counters import refresh_usage_count
+from ifbcat_api.model.misc import Doi, Topic
+from ifbcat_api.model.tool.collection import Collection
+from ifbcat_api.model.tool.operatingSystem import OperatingSystem
 from ifbcat_api.model.tool.tool import Tool
+from ifbcat_api.model.tool.toolCredit import ToolCredit, TypeRole
+from ifbcat_api.model.tool.toolType import ToolType
 
 logger = logging.getLogger(__name__)
 
+# pages of bio.tools fetched in advance while the previous ones are imported
+PREFETCHED_PAGES = 2
 
-class Command(BaseCommand):
-    http = None
+# fields of a tool set from its entry in bio.tools
+TOOL_FIELDS = [
+    'name',
+    'description',
+    'homepage',
+    'biotoolsID',
+    'source_repository',
+    'biotoolsCURIE',
+    'documentation',
+    'maturity',
+    'cost',
+    'last_update',
+]
+
+# fields of a tool credit, in the order of Tool.get_credit_fields_from_json
+CREDIT_FIELDS = ['name', 'email', 'url', 'orcidid', 'gridid', 'typeEntity', 'note']
+
+
+class ToolImporter:
+    """
+    Import the new tools of bio.tools a page at a time: the tools and the instances they are related to are kept in
+    memory, the missing ones are created with bulk_create, and the relations with a bulk insert in the through tables,
+    so a page takes a handful of queries. As save() is not called, post_save is sent for the instances created.
+    """
+
+    def __init__(self):
+        self.tools_by_biotools_id = dict()
+        self.tools_by_name = dict()
+        self.names = set()
+        for tool in Tool.objects.only('name', 'biotoolsID'):
+            self.add_tool(tool)
+        # for each model, the pk of its instances by the values of their fields
+        self.pks = dict()
+
+    def add_tool(self, tool):
+        self.tools_by_name.setdefault(tool.name.lower(), tool)
+        if tool.biotoolsID:
+            self.tools_by_biotools_id.setdefault(tool.biotoolsID.lower(), tool)
+        self.names.add(tool.name)
+
+    def is_imported(self, entry):
+        """Whether the entry is a new tool, or an existing one without biotoolsID and with the same name"""
+        if entry['biotoolsID'].lower() in self.tools_by_biotools_id:
+            return False
+        tool = self.tools_by_name.get(entry['name'].lower())
+        return tool is None or not tool.biotoolsID
+
+    def get_pks(self, model, fields, keys):
+        """The pks of the instances of model by the values of fields in keys, the missing ones being created"""
+        known = self.pks.get(model)
+        if known is None:
+            known = self.pks[model] = dict()
+            for values in model.objects.order_by('-pk').values_list(*fields, 'pk'):
+                known[values[:-1]] = values[-1]
+        missing = list(dict.fromkeys(key for key in keys if key not in known))
+        if missing:
+            self.create(model, fields, missing)
+        return {key: known[key] for key in keys}
+
+    def create(self, model, fields, keys):
+        instances = [model(**dict(zip(fields, key))) for key in keys]
+        if model is Topic:
+            # pre_save is not sent by bulk_create, the topics are filled from the EDAM index as by fill_from_edam_index
+            for topic in instances:
+                term = edam.get_term(topic.uri)
+                if term is not None:
+                    edam.set_topic_fields(topic, term)
+        if len(fields) == 1 and model._meta.get_field(fields[0]).unique:
+            # the pks are not set when ignoring the conflicts
+            model.objects.bulk_create(instances, ignore_conflicts=True)
+            instances = model.objects.filter(**{f'{fields[0]}__in': [key[0] for key in keys]})
+        else:
+            instances = model.objects.bulk_create(instances)
+        for instance in instances:
+            self.pks[model][tuple(getattr(instance, field) for field in fields)] = instance.pk
+        send_post_save(model, instances, created=True)
+
+    def add_relations(self, model, field_name, pairs):
+        """Insert the relations of the field of model between the pks in pairs, the existing ones being ignored"""
+        field = model._meta.get_field(field_name)
+        through = field.remote_field.through
+        source, target = f'{field.m2m_field_name()}_id', f'{field.m2m_reverse_field_name()}_id'
+        through.objects.bulk_create(
+            [through(**{source: a, target: b}) for a, b in dict.fromkeys(pairs)],
+            ignore_conflicts=True,
+        )
+
+    def import_page(self, entries, primary_dois):
+        """
+        Import the entries of a page of bio.tools
+
+        :param primary_dois: the DOIs of the primary publications of the entries, by biotoolsID
+        :return: the tools created or updated
+        """
+        created_tools, updated_tools, imported = [], [], []
+        for entry in entries:
+            if not self.is_imported(entry):
+                continue
+            tool = self.tools_by_name.get(entry['name'].lower())
+            if tool is None:
+                tool = Tool()
+                created_tools.append(tool)
+            else:
+                updated_tools.append(tool)
+            previous_name = tool.name
+            tool.set_information_from_json(entry)
+            if tool.name != previous_name and tool.name in self.names:
+                tool.name = entry['biotoolsID']
+            # enriched here, not by a task
+            tool.json_from_biotool = None
+            self.add_tool(tool)
+            imported.append((tool, entry))
+        if not imported:
+            return []
 
+        Tool.objects.bulk_create(created_tools)
+        Tool.objects.bulk_update(updated_tools, TOOL_FIELDS)
+        send_post_save(Tool, created_tools, created=True)
+        send_post_save(Tool, updated_tools, created=False, update_fields=TOOL_FIELDS)
+
+        for field_name, model, key in [
+            ('tool_type', ToolType, 'toolType'),
+            ('operating_system', OperatingSystem, 'operatingSystem'),
+            ('collection', Collection, 'collectionID'),
+        ]:
+            names = [(t.pk, name) for t, entry in imported for name in entry[key]]
+            pks = self.get_pks(model, ['name'], [(name,) for _, name in names])
+            self.add_relations(Tool, field_name, [(pk, pks[(name,)]) for pk, name in names])
+
+        publications = [(t.pk, doi) for t, _ in imported for doi in primary_dois.get(t.biotoolsID, [])]
+        dois = self.get_pks(Doi, ['doi'], [(doi,) for _, doi in publications])
+        self.add_relations(Tool, 'primary_publication', [(pk, dois[(doi,)]) for pk, doi in publications])
+
+        topic_uris = [(t.pk, uri) for t, entry in imported for uri in Tool.get_topic_uris_from_json(entry)]
+        topics = self.get_pks(Topic, ['uri'], [(uri,) for _, uri in topic_uris])
+        self.add_relations(Tool, 'scientific_topics', [(pk, topics[(uri,)]) for pk, uri in topic_uris])
+        # the relations are not added with add(), so the counters are not refreshed by m2m_changed
+        refresh_usage_count(Topic, set(topics.values()))
+
+        credits = [
+            (t.pk, tuple(Tool.get_credit_fields_from_json(credit).values()), credit['typeRole'])
+            for t, entry in imported
+            for credit in entry['credit']
+        ]
+        credit_pks = self.get_pks(ToolCredit, CREDIT_FIELDS, [key for _, key, _ in credits])
+        self.add_relations(Tool, 'tool_credit', [(pk, credit_pks[key]) for pk, key, _ in credits])
+        type_roles = self.get_pks(TypeRole, ['name'], [(name,) for _, _, names in credits for name in names])
+        self.add_relations(
+            ToolCredit,
+            'type_role',
+            [(credit_pks[key], type_roles[(name,)]) for _, key, names in credits for name in names],
+        )
+        return [tool for tool, _ in imported]
+
+
+class Command(BaseCommand):
     def crawl_tools(self, limit, collection_id):
         # clean tool table
         # Tool.objects.all().delete()
@@ -23,69 +188,65 @@ class Command(BaseCommand):
         # ToolCredit.objects.all().delete()
         # Collection.objects.all().delete()
 
+        importer = ToolImporter()
+        pages = queue.Queue(maxsize=PREFETCHED_PAGES)
+        threading.Thread(
+            target=self.fetch_pages,
+            args=(collection_id, limit, pages, importer.is_imported),
+            daemon=True,
+        ).start()
+        progress_bar = None
+        while (page := pages.get()) is not None:
+            if isinstance(page, requests.RequestException):
+                logger.error("Connection error")
+                logger.error(page)
+                continue
+            if isinstance(page, Exception):
+                logger.error("Could not fetch the tools from bio.tools", exc_info=page)
+                continue
+            entry, primary_dois = page
+            if progress_bar is None:
+                print(f"{entry['count']} available BioTools entries for collection {collection_id}")
+                progress_bar = tqdm()
+            entries = entry['list'] if limit == -1 else entry['list'][: limit - progress_bar.n]
+            with transaction.atomic():
+                importer.import_page(entries, primary_dois)
+            progress_bar.update(len(entries))
+        http_client.log_metrics()
+
+    def fetch_pages(self, collection_id, limit, pages, is_imported):
+        """
+        Put in pages the pages of the collection with the DOIs of the primary publications of the tools imported, as
+        resolving the PMIDs is slow too, and then None. The next page is fetched while the previous ones are imported.
+        """
         try:
-            resp = self.get_from_biotools(collection_id=collection_id, page=1)
-            count = int(resp['count'])
-            print(f"{count} available BioTools entries for collection {collection_id}")
-
-            page = 1
-            has_next_page = True
-            progress_bar = tqdm()
-            while has_next_page and (limit == -1 or progress_bar.n < limit):
+            page, fetched = 1, 0
+            while limit == -1 or fetched < limit:
                 try:
                     entry = self.get_from_biotools(collection_id=collection_id, page=page)
                 except JSONDecodeError as e:
                     logging.error("Json decode error")
                     break
-
-                has_next_page = entry['next'] is not None
-                for tool in entry['list']:
-                    logger.debug("https://bio.tools/api/" + tool['biotoolsID'] + "?format=jsonld ")
-                    tool_entry = Tool.objects.filter(biotoolsID__iexact=tool['biotoolsID']).first()
-                    if tool_entry is None:
-                        tool_entry = Tool.objects.filter(name__iexact=tool['name']).first()
-                        if tool_entry is not None and (tool_entry.biotoolsID is None or tool_entry.biotoolsID == ""):
-                            tool_entry.biotoolsID = tool['biotoolsID']
-                            tool_entry.save()
-                            tool_entry.update_information_from_json(tool)
-                    if tool_entry is None:
-                        tool_entry = Tool.objects.create(
-                            name=tool['biotoolsID'],
-                        )
-                        tool_entry.biotoolsID = tool['biotoolsID']
-                        tool_entry.update_information_from_json(tool)
-
-                    progress_bar.update()
+                imported = [tool for tool in entry['list'] if is_imported(tool)]
+                # the PMIDs and PMCIDs of the page are resolved at once
+                dois = pubmed.get_dois(i for tool in imported for i in Tool.get_pubmed_ids_from_json(tool))
+                primary_dois = {tool['biotoolsID']: Tool.get_primary_dois_from_json(tool, dois) for tool in imported}
+                pages.put((entry, primary_dois))
+                fetched += len(entry['list'])
+                if entry['next'] is None:
+                    break
                 page += 1
-        except urllib3.exceptions.HTTPError as e:
-            logger.error("Connection error")
-            logger.error(e)
+        except Exception as e:
+            pages.put(e)
+        finally:
+            pages.put(None)
 
     def get_from_biotools(self, collection_id, page):
-        key = None
-        cache_dir = os.environ.get('CACHE_DIR', None)
-        if cache_dir is not None:
-            os.makedirs(cache_dir, exist_ok=True)
-            cache_dir = os.path.join(cache_dir, 'biotools')
-            key = f'{collection_id}.{page}.json'
-            try:
-                with open(os.path.join(cache_dir, key)) as f:
-                    response = json.load(f)
-                return response
-            except FileNotFoundError:
-                pass
-
-        if self.http is None:
-            self.http = urllib3.PoolManager()
-        req = self.http.request(
-            'GET', f'https://bio.tools/api/tool/?collectionID={collection_id}&page={page}&format=json'
+        return http_cache.get_json(
+            f'https://bio.tools/api/tool/?collectionID={collection_id}&page={page}&format=json',
+            namespace='biotools',
+            legacy_path=os.path.join('biotools', f'{collection_id}.{page}.json'),
         )
-        response = json.loads(req.data.decode('utf-8'))
-
-        if key is not None:
-            with open(os.path.join(cache_dir, key), 'w') as f:
-                json.dump(response, f)
-        return response
 
     def add_arguments(self, parser):
         """
@@ -24,6 +24,7 @@ class Command(BaseCommand):
         # call_command('load_infrastructure')
         # call_command('load_services')
         call_command('cleanup_catalog')
+        call_command('warm_caches')
 
     def handle(self, *args, **options):
         """
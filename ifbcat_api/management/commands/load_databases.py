@@ -1,16 +1,15 @@
 import csv
 import datetime
-import json
 import os
 
 import pytz
 import unidecode
-import urllib3
 from django.core.management import BaseCommand
 from django.db.transaction import atomic
 from django.utils.timezone import make_aware
 from tqdm import tqdm
 
+from ifbcat_api import http_cache
 from ifbcat_api.models import Keyword
 from ifbcat_api.models import Team
 from ifbcat_api.models import Tool
@@ -18,8 +17,6 @@ from ifbcat_api.models import ToolType
 
 
 class Command(BaseCommand):
-    http = None
-
     def add_arguments(self, parser):
         parser.add_argument("file", type=str, help="Path to the CSV source file")
 
@@ -134,25 +131,8 @@ class Command(BaseCommand):
                 database.save()
 
     def get_from_biotools(self, biotoolsID):
-        key = None
-        cache_dir = os.environ.get('CACHE_DIR', None)
-        if cache_dir is not None:
-            cache_dir = os.path.join(cache_dir, 'biotools')
-            os.makedirs(cache_dir, exist_ok=True)
-            key = f'{biotoolsID}.json'
-            try:
-                with open(os.path.join(cache_dir, key)) as f:
-                    response = json.load(f)
-                return response
-            except FileNotFoundError:
-                pass
-
-        if self.http is None:
-            self.http = urllib3.PoolManager()
-        req = self.http.request('GET', f'https://bio.tools/api/{biotoolsID}?format=json')
-        response = json.loads(req.data.decode('utf-8'))
-
-        if key is not None:
-            with open(os.path.join(cache_dir, key), 'w') as f:
-                json.dump(response, f)
-        return response
+        return http_cache.get_json(
+            f'https://bio.tools/api/{biotoolsID}?format=json',
+            namespace='biotools',
+            legacy_path=os.path.join('biotools', f'{biotoolsID}.json'),
+        )
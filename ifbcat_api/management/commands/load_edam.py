@@ -0,0 +1,39 @@
+from django.core.management import BaseCommand
+from django.db import transaction
+
+from ifbcat_api import edam
+
+
+class Command(BaseCommand):
+    help = "Index the topics of an EDAM release, and update the topics and their hierarchy from it"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'file',
+            type=str,
+            help='EDAM release, e.g. EDAM.owl, EDAM.tsv or EDAM.csv from https://edamontology.org/, or a JSON list of '
+            'topics',
+        )
+        parser.add_argument(
+            '--edam-version',
+            type=str,
+            help='Version of the release, read from the OWL file, or its name otherwise',
+        )
+        parser.add_argument(
+            '--no-update',
+            action='store_true',
+            help='Only write the index, without updating the topics nor their hierarchy',
+        )
+
+    def handle(self, *args, file, edam_version=None, no_update=False, **options):
+        terms, version = edam.read_release(file)
+        edam.write_index(terms, edam_version or version)
+        self.stdout.write(f"{len(terms)} topics of EDAM {edam_version or version} indexed")
+        if not no_update:
+            with transaction.atomic():
+                updated, missing = edam.update_topics()
+                closure = edam.update_closure()
+            self.stdout.write(f"{len(updated)} topics updated, {len(missing)} missing in EDAM")
+            self.stdout.write(f"{closure} ancestor/descendant pairs of topics")
+            for topic in missing:
+                self.stdout.write(self.style.WARNING(f"Not in EDAM: {topic.uri}"))
@@ -0,0 +1,18 @@
+from django.core.management import BaseCommand
+
+from ifbcat_api import ror
+
+
+class Command(BaseCommand):
+    help = "Load the organisations of a ROR data dump in the local registry, replacing the ones loaded before"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'file',
+            type=str,
+            help='ROR data dump from https://doi.org/10.5281/zenodo.6347574, the zip file or the JSON file it contains',
+        )
+
+    def handle(self, *args, file, **options):
+        count = ror.load(ror.read_dump(file))
+        self.stdout.write(f"{count} organisations of the Research Organization Registry loaded")
@@ -1,13 +1,12 @@
 import csv
-import json
 import logging
 import os
 from typing import Optional
 
 import pylev
-import urllib3
 from django.core.management import BaseCommand
 
+from ifbcat_api import http_cache
 from ifbcat_api.models import Keyword
 from ifbcat_api.models import Team
 from ifbcat_api.models import Tool
@@ -17,8 +16,6 @@ logger = logging.getLogger(__name__)
 
 
 class Command(BaseCommand):
-    http = None
-
     def add_arguments(self, parser):
         parser.add_argument("file", type=str, help="Path to the CSV source file")
 
@@ -128,28 +125,13 @@ class Command(BaseCommand):
         logger.warning("No match:\n\t\t" + '\n\t\t'.join(no_match))
 
     def get_from_biotools(self, tool_name):
-        key = None
-        cache_dir = os.environ.get('CACHE_DIR', None)
-        if cache_dir is not None:
-            cache_dir = os.path.join(cache_dir, 'biotools')
-            os.makedirs(cache_dir, exist_ok=True)
-            key = f'q.{tool_name.replace(" ", "").replace("/", "").replace(":", "")}.json'
-            try:
-                with open(os.path.join(cache_dir, key)) as f:
-                    response = json.load(f)
-                return response
-            except FileNotFoundError:
-                pass
-
-        if self.http is None:
-            self.http = urllib3.PoolManager()
-        req = self.http.request('GET', f'https://bio.tools/api/tool/?page=1&q={tool_name}&sort=score&format=json')
-        response = json.loads(req.data.decode('utf-8'))
-
-        if key is not None:
-            with open(os.path.join(cache_dir, key), 'w') as f:
-                json.dump(response, f)
-        return response
+        return http_cache.get_json(
+            f'https://bio.tools/api/tool/?page=1&q={tool_name}&sort=score&format=json',
+            namespace='biotools',
+            legacy_path=os.path.join(
+                'biotools', f'q.{tool_name.replace(" ", "").replace("/", "").replace(":", "")}.json'
+            ),
+        )
 
     @staticmethod
     def normalize(string: str):
@@ -0,0 +1,12 @@
+from django.core.management import BaseCommand
+from django.db import transaction
+
+from ifbcat_api import counters
+
+
+class Command(BaseCommand):
+    help = "Compute again the members count of the teams and the usage count of the keywords, topics and fields"
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            counters.rebuild_counters()
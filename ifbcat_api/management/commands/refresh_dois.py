@@ -0,0 +1,33 @@
+from django.core.management import BaseCommand
+
+from ifbcat_api import models
+from ifbcat_api.tasks import get_stale_dois, refresh_dois
+
+
+class Command(BaseCommand):
+    help = "Refresh the metadata of the DOIs from doi.org, the stale ones by default"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Refresh all the DOIs, not only the ones never refreshed or refreshed long ago',
+        )
+        parser.add_argument(
+            '--max-age',
+            type=int,
+            help='Seconds after which a DOI is stale, DOI_REFRESH_MAX_AGE by default',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            help='Number of DOIs fetched at once, DOI_REFRESH_WORKERS by default',
+        )
+
+    def handle(self, *args, all=False, max_age=None, workers=None, **options):
+        dois = models.Doi.objects.all() if all else get_stale_dois(max_age)
+        report = refresh_dois(dois, workers=workers)
+        for outcome, refreshed in report.items():
+            self.stdout.write(f"{len(refreshed)} DOIs {outcome.replace('_', ' ')}")
+        if report['failed']:
+            self.stdout.write(self.style.WARNING(f"Could not refresh the DOIs {', '.join(report['failed'])}"))
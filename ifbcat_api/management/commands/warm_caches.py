@@ -0,0 +1,38 @@
+from django.core.management import BaseCommand
+
+from ifbcat_api import misc, warm_caches
+
+
+class Command(BaseCommand):
+    help = "Request the hot urls to fill the caches, and report the time each one took"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--url',
+            action='append',
+            dest='urls',
+            help='Url to request, can be repeated, WARM_CACHES_URLS by default',
+        )
+        parser.add_argument(
+            '--access-log',
+            type=str,
+            help='Access log in the combined format whose most requested urls are also requested, '
+            'WARM_CACHES_ACCESS_LOG by default',
+        )
+        parser.add_argument(
+            '--top',
+            type=int,
+            help='Number of urls of the access log to request, WARM_CACHES_TOP by default',
+        )
+
+    def handle(self, *args, urls=None, access_log=None, top=None, **options):
+        if not misc.is_cache_shared():
+            self.stderr.write(
+                self.style.WARNING("The cache is not shared by the processes, only the one of this command is warmed")
+            )
+        total = 0
+        for url, status, duration in warm_caches.warm_caches(urls=urls, access_log=access_log, top=top):
+            total += duration
+            style = self.style.SUCCESS if status == 200 else self.style.WARNING
+            self.stdout.write(style(f"{status} {duration:7.3f}s {url}"))
+        self.stdout.write(f"Caches warmed in {total:.3f}s")
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-19 11:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ifbcat_api', '0198_alter_team_affiliatedwith_alter_team_fundedby_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['is_draft', 'start_date', 'end_date'], name='ifbcat_api__is_draf_5525a2_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(
+                fields=['is_draft', 'registration_closing', 'registration_opening'],
+                name='ifbcat_api__is_draf_a169c0_idx',
+            ),
+        ),
+    ]
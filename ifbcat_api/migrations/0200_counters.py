@@ -0,0 +1,98 @@
+# Generated by Django 5.2.18 on 2026-10-19 11:26
+
+import functools
+import operator
+
+from django.db import migrations, models
+
+
+class SubqueryCount(models.Subquery):
+    template = "(SELECT COUNT(*) FROM (%(subquery)s) _count)"
+    output_field = models.PositiveIntegerField()
+
+
+def get_referencing_querysets(model):
+    for model_field in model._meta.get_fields():
+        if isinstance(model_field, models.ManyToManyRel):
+            yield model_field.through._default_manager.filter(
+                **{model_field.field.m2m_reverse_field_name(): models.OuterRef('pk')}
+            )
+        elif isinstance(model_field, models.ManyToOneRel):
+            yield model_field.related_model._default_manager.filter(
+                **{model_field.field.attname: models.OuterRef(model_field.field_name)}
+            )
+
+
+def rebuild_counters(apps, schema_editor):
+    """The counters of the existing rows, computed as ifbcat_api.counters did when the columns were added"""
+    Team = apps.get_model('ifbcat_api', 'Team')
+    UserProfile = apps.get_model('ifbcat_api', 'UserProfile')
+    is_member = functools.reduce(
+        operator.or_,
+        [
+            models.Q(**{Team._meta.get_field(name).related_query_name(): models.OuterRef('pk')})
+            for name in ('members', 'leaders', 'scientificLeaders', 'technicalLeaders', 'deputies')
+        ],
+    )
+    Team.objects.update(
+        members_count=SubqueryCount(UserProfile.objects.filter(is_member).order_by().values('pk').distinct())
+    )
+    for name in ('Keyword', 'Topic', 'Field'):
+        model = apps.get_model('ifbcat_api', name)
+        model.objects.update(
+            usage_count=functools.reduce(
+                operator.add,
+                [
+                    SubqueryCount(referencing.order_by().values('pk'))
+                    for referencing in get_referencing_querysets(model)
+                ],
+                models.Value(0),
+            )
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ifbcat_api', '0199_event_status_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='field',
+            name='usage_count',
+            field=models.PositiveIntegerField(
+                default=0,
+                editable=False,
+                help_text='Number of references to this field, maintained by ifbcat_api.counters.',
+            ),
+        ),
+        migrations.AddField(
+            model_name='keyword',
+            name='usage_count',
+            field=models.PositiveIntegerField(
+                default=0,
+                editable=False,
+                help_text='Number of references to this keyword, maintained by ifbcat_api.counters.',
+            ),
+        ),
+        migrations.AddField(
+            model_name='team',
+            name='members_count',
+            field=models.PositiveIntegerField(
+                default=0,
+                editable=False,
+                help_text='Number of distinct members, leaders and deputies, maintained by ifbcat_api.counters.',
+            ),
+        ),
+        migrations.AddField(
+            model_name='topic',
+            name='usage_count',
+            field=models.PositiveIntegerField(
+                default=0,
+                editable=False,
+                help_text='Number of references to this topic, maintained by ifbcat_api.counters.',
+            ),
+        ),
+        migrations.RunPython(rebuild_counters, migrations.RunPython.noop),
+    ]
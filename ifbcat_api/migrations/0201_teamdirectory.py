@@ -0,0 +1,160 @@
+# Generated by Django 5.2.18 on 2026-10-19 11:33
+
+import django.contrib.postgres.fields
+from django.db import migrations, models
+
+
+def array_of(through, fk, table, column, order_by=None):
+    return (
+        f'ARRAY(SELECT related."{column}" FROM "{through}" through '
+        f'JOIN "{table}" related ON related.id = through."{fk}" '
+        f'WHERE through.team_id = team.id ORDER BY {order_by or "related.id"})'
+    )
+
+
+def json_array_of(through, fk, table):
+    return (
+        f"COALESCE((SELECT jsonb_agg(jsonb_build_object('id', related.id, 'name', related.name) ORDER BY related.id) "
+        f'FROM "{through}" through JOIN "{table}" related ON related.id = through."{fk}" '
+        f"WHERE through.team_id = team.id), '[]'::jsonb)"
+    )
+
+
+def ids_of(through, fk):
+    return f'ARRAY(SELECT "{fk}" FROM "{through}" WHERE team_id = team.id ORDER BY "{fk}")'
+
+
+COLUMNS = [
+    'id',
+    'name',
+    'logo_url',
+    'description',
+    'expertise_description',
+    'linkCovid19',
+    'homepage',
+    'unitId',
+    'address',
+    'city',
+    'country',
+    'orgid',
+    'ifbMembership',
+    'closing_date',
+    'lat',
+    'lng',
+    'updated_at',
+]
+AGGREGATES = dict(
+    expertise=array_of('ifbcat_api_team_expertise', 'topic_id', 'ifbcat_api_topic', 'uri'),
+    communities=array_of('ifbcat_api_team_communities', 'community_id', 'ifbcat_api_community', 'name'),
+    projects=array_of('ifbcat_api_team_projects', 'project_id', 'ifbcat_api_project', 'name'),
+    publications=array_of('ifbcat_api_team_publications', 'doi_id', 'ifbcat_api_doi', 'doi'),
+    certifications=array_of('ifbcat_api_team_certifications', 'certification_id', 'ifbcat_api_certification', 'name'),
+    keywords=array_of('ifbcat_api_team_keywords', 'keyword_id', 'ifbcat_api_keyword', 'keyword'),
+    fields=array_of('ifbcat_api_team_fields', 'field_id', 'ifbcat_api_field', 'field'),
+    tools=array_of(
+        'ifbcat_api_team_tools', 'tool_id', 'ifbcat_api_tool', 'biotoolsID', 'related.name, related."biotoolsID"'
+    ),
+    services='ARRAY(SELECT id FROM ifbcat_api_service WHERE team_id = team.id ORDER BY id)',
+    leaders=ids_of('ifbcat_api_team_leaders', 'userprofile_id'),
+    deputies=ids_of('ifbcat_api_team_deputies', 'userprofile_id'),
+    scientificLeaders=ids_of('ifbcat_api_team_scientificLeaders', 'userprofile_id'),
+    technicalLeaders=ids_of('ifbcat_api_team_technicalLeaders', 'userprofile_id'),
+    members=ids_of('ifbcat_api_team_members', 'userprofile_id'),
+    maintainers=ids_of('ifbcat_api_team_maintainers', 'userprofile_id'),
+    affiliatedWith=json_array_of('ifbcat_api_team_affiliatedWith', 'organisation_id', 'ifbcat_api_organisation'),
+    fundedBy=json_array_of('ifbcat_api_team_fundedBy', 'organisation_id', 'ifbcat_api_organisation'),
+    platforms=json_array_of('ifbcat_api_team_platforms', 'elixirplatform_id', 'ifbcat_api_elixirplatform'),
+)
+CREATE_SQL = [
+    'CREATE MATERIALIZED VIEW ifbcat_api_teamdirectory AS SELECT '
+    + ', '.join([f'team."{column}"' for column in COLUMNS] + [f'{sql} AS "{name}"' for name, sql in AGGREGATES.items()])
+    + ' FROM ifbcat_api_team team',
+    # required to refresh it concurrently
+    'CREATE UNIQUE INDEX ifbcat_api_teamdirectory_id ON ifbcat_api_teamdirectory (id)',
+]
+DROP_SQL = 'DROP MATERIALIZED VIEW ifbcat_api_teamdirectory'
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ifbcat_api', '0200_counters'),
+    ]
+
+    operations = [
+        migrations.RunSQL(CREATE_SQL, DROP_SQL),
+        migrations.CreateModel(
+            name='TeamDirectory',
+            fields=[
+                ('id', models.IntegerField(primary_key=True, serialize=False)),
+                ('name', models.CharField(max_length=255)),
+                ('logo_url', models.URLField(max_length=512, null=True)),
+                ('description', models.TextField()),
+                ('expertise_description', models.TextField()),
+                ('linkCovid19', models.URLField(max_length=255)),
+                ('homepage', models.URLField(max_length=255)),
+                ('unitId', models.CharField(max_length=255)),
+                ('address', models.TextField()),
+                ('city', models.CharField(max_length=255)),
+                ('country', models.CharField(max_length=255)),
+                ('orgid', models.CharField(max_length=255, null=True)),
+                ('ifbMembership', models.CharField(max_length=255)),
+                ('closing_date', models.DateField(null=True)),
+                ('lat', models.DecimalField(decimal_places=6, max_digits=9, null=True)),
+                ('lng', models.DecimalField(decimal_places=6, max_digits=9, null=True)),
+                ('updated_at', models.DateTimeField()),
+                (
+                    'expertise',
+                    django.contrib.postgres.fields.ArrayField(base_field=models.CharField(max_length=255), size=None),
+                ),
+                (
+                    'communities',
+                    django.contrib.postgres.fields.ArrayField(base_field=models.CharField(max_length=255), size=None),
+                ),
+                (
+                    'projects',
+                    django.contrib.postgres.fields.ArrayField(base_field=models.CharField(max_length=255), size=None),
+                ),
+                (
+                    'publications',
+                    django.contrib.postgres.fields.ArrayField(base_field=models.CharField(max_length=255), size=None),
+                ),
+                (
+                    'certifications',
+                    django.contrib.postgres.fields.ArrayField(base_field=models.CharField(max_length=255), size=None),
+                ),
+                (
+                    'keywords',
+                    django.contrib.postgres.fields.ArrayField(base_field=models.CharField(max_length=255), size=None),
+                ),
+                (
+                    'fields',
+                    django.contrib.postgres.fields.ArrayField(base_field=models.CharField(max_length=255), size=None),
+                ),
+                (
+                    'tools',
+                    django.contrib.postgres.fields.ArrayField(base_field=models.CharField(max_length=255), size=None),
+                ),
+                ('services', django.contrib.postgres.fields.ArrayField(base_field=models.IntegerField(), size=None)),
+                ('leaders', django.contrib.postgres.fields.ArrayField(base_field=models.IntegerField(), size=None)),
+                ('deputies', django.contrib.postgres.fields.ArrayField(base_field=models.IntegerField(), size=None)),
+                (
+                    'scientificLeaders',
+                    django.contrib.postgres.fields.ArrayField(base_field=models.IntegerField(), size=None),
+                ),
+                (
+                    'technicalLeaders',
+                    django.contrib.postgres.fields.ArrayField(base_field=models.IntegerField(), size=None),
+                ),
+                ('members', django.contrib.postgres.fields.ArrayField(base_field=models.IntegerField(), size=None)),
+                ('maintainers', django.contrib.postgres.fields.ArrayField(base_field=models.IntegerField(), size=None)),
+                ('affiliatedWith', models.JSONField()),
+                ('fundedBy', models.JSONField()),
+                ('platforms', models.JSONField()),
+            ],
+            options={
+                'db_table': 'ifbcat_api_teamdirectory',
+                'managed': False,
+            },
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:37
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from ifbcat_api import edam
+
+
+def update_closure(apps, schema_editor):
+    edam.update_closure(apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ifbcat_api', '0201_teamdirectory'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TopicClosure',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('depth', models.PositiveSmallIntegerField(help_text='Number of parent relations between the topics')),
+                (
+                    'ancestor',
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name='descendant_links',
+                        to='ifbcat_api.topic',
+                    ),
+                ),
+                (
+                    'descendant',
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name='ancestor_links',
+                        to='ifbcat_api.topic',
+                    ),
+                ),
+            ],
+            options={
+                'indexes': [models.Index(fields=['descendant', 'ancestor'], name='ifbcat_api__descend_170bce_idx')],
+                'constraints': [
+                    models.UniqueConstraint(fields=('ancestor', 'descendant'), name='unique_topic_closure')
+                ],
+            },
+        ),
+        migrations.RunPython(update_closure, migrations.RunPython.noop),
+    ]
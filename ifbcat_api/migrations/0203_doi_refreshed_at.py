@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ifbcat_api', '0202_topicclosure'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='doi',
+            name='refreshed_at',
+            field=models.DateTimeField(
+                blank=True,
+                editable=False,
+                help_text='When the metadata was last fetched from doi.org, cf the refresh_dois command.',
+                null=True,
+            ),
+        ),
+    ]
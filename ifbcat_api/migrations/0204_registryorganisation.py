@@ -0,0 +1,53 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:52
+
+import django.contrib.postgres.fields
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ifbcat_api', '0203_doi_refreshed_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RegistryOrganisation',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ror_id', models.CharField(help_text='ROR ID, without https://ror.org/', max_length=9, unique=True)),
+                (
+                    'grid_ids',
+                    django.contrib.postgres.fields.ArrayField(
+                        base_field=models.CharField(max_length=32), blank=True, default=list, size=None
+                    ),
+                ),
+                ('name', models.CharField(max_length=512)),
+                (
+                    'acronyms',
+                    django.contrib.postgres.fields.ArrayField(
+                        base_field=models.CharField(max_length=255), blank=True, default=list, size=None
+                    ),
+                ),
+                (
+                    'names',
+                    django.contrib.postgres.fields.ArrayField(
+                        base_field=models.CharField(max_length=512), blank=True, default=list, size=None
+                    ),
+                ),
+                ('homepage', models.URLField(blank=True, max_length=512)),
+                ('city', models.CharField(blank=True, max_length=255)),
+                ('country', models.CharField(blank=True, max_length=255)),
+                ('status', models.CharField(blank=True, max_length=32)),
+            ],
+            options={
+                'indexes': [
+                    django.contrib.postgres.indexes.GinIndex(
+                        fields=['grid_ids'], name='ifbcat_api__grid_id_7a9982_gin'
+                    ),
+                    django.contrib.postgres.indexes.GinIndex(fields=['names'], name='ifbcat_api__names_0dcf73_gin'),
+                ],
+            },
+        ),
+    ]
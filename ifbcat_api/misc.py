@@ -1,55 +1,21 @@
-import json
+import functools
+import hashlib
 import os
 
 import pylev
 import requests
+from django.apps import apps as django_apps
 from django.conf import settings
-from django.db.models import ManyToManyRel, ManyToOneRel
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db.models import ManyToManyRel, ManyToOneRel, Subquery, PositiveIntegerField
+from django.db.models.signals import post_save, m2m_changed
 from opencage.geocoder import OpenCageGeocode
 from rest_framework import serializers
-import os
-import json
-import functools
-from typing import Any, Callable
-
-
-def disk_cache(func: Callable) -> Callable:
-    @functools.wraps(func)
-    def wrapper(*args, **kwargs) -> Any:
-        cache_base = os.environ.get('CACHE_DIR')
-        if not cache_base:
-            return func(*args, **kwargs)
-        cache_dir = os.path.join(cache_base, func.__name__)
-        os.makedirs(cache_dir, exist_ok=True)
-
-        a_args = args[1:] if args and isinstance(args[0], type) else args
-        arg_str = "_".join(repr(arg) for arg in a_args)
-        kwarg_str = "_".join(f"{k}={repr(v)}" for k, v in sorted(kwargs.items()))
-        key = f"{arg_str}_{kwarg_str}"
-        key = "".join(c if c.isalnum() or (c in "-_.") else "_" for c in key)
-        key = key.strip("_")
-        file_path = os.path.join(cache_dir, f"{key}.json")
-
-        # Try loading from cache
-        try:
-            with open(file_path, 'r') as f:
-                return json.load(f)
-        except FileNotFoundError:
-            pass
-
-        # Call the actual function
-        result = func(*args, **kwargs)
-
-        # Save result to cache
-        try:
-            with open(file_path, 'w') as f:
-                json.dump(result, f)
-        except Exception as e:
-            print(f"Failed to write cache {file_path}: {e}")
-
-        return result
 
-    return wrapper
+from ifbcat_api import http_cache, http_client
+from ifbcat_api.permissions import DERIVED_MODELS
 
 
 class BibliographicalEntryNotFound(Exception):
@@ -63,6 +29,9 @@ class BibliographicalEntryNotFound(Exception):
         super().__init__(msg)
 
 
+@http_cache.memoize(
+    namespace='doi', legacy_path=lambda func, args, kwargs: os.path.join('doi', f'{args[0].replace("/", "-")}.json')
+)
 def get_doi_info(doi: str) -> dict:
     """
     Retrieve information about a publication from DOI web services
@@ -74,19 +43,7 @@ def get_doi_info(doi: str) -> dict:
     :return: publication metadata (title, journal name, publication year, authors list).
     :rtype: dict
     """
-    cache_dir = os.environ.get('CACHE_DIR', None)
-    key = None
-    if cache_dir is not None:
-        cache_dir = os.path.join(cache_dir, 'doi')
-        os.makedirs(cache_dir, exist_ok=True)
-        key = f'{doi.replace("/", "-")}.json'
-        try:
-            with open(os.path.join(cache_dir, key)) as f:
-                response = json.load(f)
-            return response
-        except FileNotFoundError:
-            pass
-    resp = requests.get(
+    resp = http_client.get(
         "http://dx.doi.org/%s" % doi,
         headers={"Accept": "application/vnd.citationstyles.csl+json"},
     )
@@ -126,37 +83,20 @@ def get_doi_info(doi: str) -> dict:
             print(json_data)
             raise e
     authors = ", ".join(authors_list)
-    response = {
+    return {
         "title": title,
         "journal_name": journal_name,
         "biblio_year": biblio_year,
         "authors_list": authors,
     }
-    if key is not None:
-        with open(os.path.join(cache_dir, key), 'w') as f:
-            json.dump(response, f)
-    return response
 
 
 def get_edam_info_from_ols(uri):
-    cache_dir = os.environ.get('CACHE_DIR', None)
-    key = None
-    if cache_dir is not None:
-        cache_dir = os.path.join(cache_dir, 'edam_from_ebi_ols')
-        os.makedirs(cache_dir, exist_ok=True)
-        key = f'{uri.replace("/", "-").replace(":", "-")}.json'
-        try:
-            with open(os.path.join(cache_dir, key)) as f:
-                response = json.load(f)
-            return response
-        except FileNotFoundError:
-            pass
-    url = f'https://www.ebi.ac.uk/ols/api/ontologies/edam/terms?iri={uri}'
-    response = requests.get(url).json()
-    if key is not None:
-        with open(os.path.join(cache_dir, key), 'w') as f:
-            json.dump(response, f)
-    return response
+    return http_cache.get_json(
+        f'https://www.ebi.ac.uk/ols/api/ontologies/edam/terms?iri={uri}',
+        namespace='edam_from_ebi_ols',
+        legacy_path=os.path.join('edam_from_ebi_ols', f'{uri.replace("/", "-").replace(":", "-")}.json'),
+    )
 
 
 def get_usage_in_related_field(queryset):
@@ -169,6 +109,13 @@ def get_usage_in_related_field(queryset):
     return attrs
 
 
+class SubqueryCount(Subquery):
+    """Number of rows of a queryset, as a subquery that can be used in annotate() or update()"""
+
+    template = "(SELECT COUNT(*) FROM (%(subquery)s) _count)"
+    output_field = PositiveIntegerField()
+
+
 def inline_serializer_factory(klass, fields=None, lookup_field='pk', url=True):
     if fields is None:
         serialized_fields = ['id', 'name']
@@ -201,6 +148,7 @@ def inline_serializer_factory(klass, fields=None, lookup_field='pk', url=True):
 
 def guess_coordinate_from_address(address):
     geocoder = OpenCageGeocode(settings.OPEN_CAGE_GEO_CODE_KEY)
+    geocoder.session = http_client.get_client()
     results = geocoder.geocode(address)
     if len(results) == 0:
         return None
@@ -213,7 +161,73 @@ def get_file_size_from_url(url) -> int:
     """
     Return the size of a file in KB.
     """
-    response = requests.get(url)
+    response = http_client.get(url)
     response.raise_for_status()
     current_size = len(response.content) // 1024
     return current_size
+
+
+def send_post_save(model, instances, created, update_fields=None):
+    """Send post_save for the instances written without save(), e.g. with bulk_create, so the receivers are aware"""
+    for instance in instances:
+        post_save.send(
+            sender=model,
+            instance=instance,
+            created=created,
+            update_fields=update_fields,
+            raw=False,
+            using=instance._state.db,
+        )
+
+
+def get_catalog_models():
+    """The models of the catalog, but the tables derived from the others (cf DERIVED_MODELS) and the read models"""
+    return [
+        model
+        for model in django_apps.get_app_config('ifbcat_api').get_models()
+        if model._meta.managed and model._meta.label not in DERIVED_MODELS
+    ]
+
+
+def connect_to_catalog(receiver, *signals, models=None):
+    """
+    Connect receiver to the signals sent for each model of the catalog, or of models, m2m_changed being connected to the
+    through models of their M2M. A model without delete receiver is still deleted in bulk, unlike when a receiver is
+    connected without sender.
+    """
+    for model in get_catalog_models() if models is None else models:
+        for signal in signals:
+            if signal is m2m_changed:
+                for field in model._meta.many_to_many:
+                    signal.connect(receiver, sender=field.remote_field.through)
+            else:
+                signal.connect(receiver, sender=model)
+
+
+@functools.lru_cache(maxsize=None)
+def get_code_version():
+    """
+    Version of the code deployed: CODE_VERSION when set, e.g. the git revision, otherwise a hash of the python sources of
+    the project, computed once per process
+    """
+    if settings.CODE_VERSION:
+        return settings.CODE_VERSION
+    digest = hashlib.sha256()
+    for package in ('ifbcat', 'ifbcat_api'):
+        for root, dirs, files in os.walk(os.path.join(settings.BASE_DIR, package)):
+            dirs.sort()
+            for name in sorted(files):
+                if name.endswith('.py'):
+                    path = os.path.join(root, name)
+                    digest.update(os.path.relpath(path, settings.BASE_DIR).encode())
+                    with open(path, 'rb') as f:
+                        digest.update(f.read())
+    return digest.hexdigest()
+
+
+def is_cache_shared(alias='default'):
+    """
+    Whether the cache is shared by the processes (web workers, huey consumer, management commands), so the keys written
+    by one are read by the others: neither the local memory of each process nor a dummy cache
+    """
+    return not isinstance(caches[alias], (LocMemCache, DummyCache))
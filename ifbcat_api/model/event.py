@@ -397,6 +397,13 @@ class Event(AbstractEvent):
         help_text="Publish it in tess? Auto use training status for training sessions, or Yes otherwise for",
     )
 
+    class Meta:
+        indexes = [
+            # the statuses are filtered with range predicates on these dates, see get_*_status_q
+            models.Index(fields=['is_draft', 'start_date', 'end_date']),
+            models.Index(fields=['is_draft', 'registration_closing', 'registration_opening']),
+        ]
+
     @property
     def location(self):
         if self.country:
@@ -422,37 +429,53 @@ class Event(AbstractEvent):
             )
         )
 
+    @classmethod
+    def get_realisation_status_q(cls, status):
+        """Q matching the events having this realisation_status, as plain predicates on the dates"""
+        now = timezone.now()
+        future = Q(start_date__gt=now)
+        past = Q(start_date__lt=now) & (Q(end_date__isnull=True) | Q(end_date__lt=now))
+        return dict(
+            future=future,
+            past=past,
+            ongoing=~future & ~past,
+        )[status]
+
+    @classmethod
+    def get_registration_status_q(cls, status):
+        """Q matching the events having this registration_status, as plain predicates on the dates"""
+        now = timezone.now()
+        future = Q(registration_opening__gt=now)
+        opened = (
+            (Q(registration_opening__isnull=False) | Q(registration_closing__isnull=False))
+            & (Q(registration_opening__isnull=True) | Q(registration_opening__lt=now))
+            & (Q(registration_closing__isnull=True) | Q(registration_closing__gt=now))
+        )
+        unknown = Q(registration_opening__isnull=True) & Q(registration_closing__isnull=True)
+        return dict(
+            future=future,
+            open=opened,
+            unknown=unknown,
+            closed=~future & ~opened & ~unknown,
+        )[status]
+
     @classmethod
     def annotate_registration_realisation_status(cls, qs=None):
         if qs is None:
             qs = cls.objects
         qs = qs.annotate(
             realisation_status=Case(
-                When(Q(start_date__gt=timezone.now()), then=Value('future')),
-                When(
-                    Q(start_date__lt=timezone.now()) & (Q(end_date__isnull=True) | Q(end_date__lt=timezone.now())),
-                    then=Value('past'),
-                ),
+                When(cls.get_realisation_status_q('future'), then=Value('future')),
+                When(cls.get_realisation_status_q('past'), then=Value('past')),
                 default=Value('ongoing'),
                 output_field=CharField(),
             )
         )
         qs = qs.annotate(
             registration_status=Case(
-                When(
-                    Q(registration_opening__gt=timezone.now()),
-                    then=Value('future'),
-                ),
-                When(
-                    (Q(registration_opening__isnull=False) | Q(registration_closing__isnull=False))
-                    & (Q(registration_opening__isnull=True) | Q(registration_opening__lt=timezone.now()))
-                    & (Q(registration_closing__isnull=True) | Q(registration_closing__gt=timezone.now())),
-                    then=Value('open'),
-                ),
-                When(
-                    Q(registration_opening__isnull=True) & Q(registration_closing__isnull=True),
-                    then=Value('unknown'),
-                ),
+                When(cls.get_registration_status_q('future'), then=Value('future')),
+                When(cls.get_registration_status_q('open'), then=Value('open')),
+                When(cls.get_registration_status_q('unknown'), then=Value('unknown')),
                 default=Value('closed'),
                 output_field=CharField(),
             )
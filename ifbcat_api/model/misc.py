@@ -1,19 +1,17 @@
 import json
 import logging
 
-import requests
-from Bio import Entrez
 from django.core.exceptions import ValidationError
-from django.db import models, DataError
+from django.db import models, DataError, transaction
 from django.db.models import Q
 from django.db.models.signals import post_save, pre_save
 from django.dispatch import receiver
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from django_better_admin_arrayfield.models.fields import ArrayField
 from rest_framework.permissions import IsAuthenticatedOrReadOnly
 
-from ifbcat_api import permissions, misc
-from ifbcat_api.misc import BibliographicalEntryNotFound
+from ifbcat_api import edam, permissions, misc, http_cache, pubmed
 from ifbcat_api.validators import validate_edam_topic, validate_can_be_looked_up, validate_doi
 from ifbcat_api.validators import validate_grid_or_ror_id
 
@@ -79,6 +77,12 @@ class Topic(models.Model):
         null=True,
     )
 
+    usage_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        help_text="Number of references to this topic, maintained by ifbcat_api.counters.",
+    )
+
     @property
     def edam_id(self):
         return self.uri[24:]
@@ -106,9 +110,20 @@ class Topic(models.Model):
         return f'https://www.ebi.ac.uk/ols4/api/ontologies/edam/terms?iri={uri}'
 
     @classmethod
-    @misc.disk_cache
     def get_edam_from_ebi_ols(cls, uri):
-        return requests.get(cls.get_edam_info_ebi_ols_url(uri)).json()
+        return http_cache.get_json(
+            cls.get_edam_info_ebi_ols_url(uri),
+            namespace='get_edam_from_ebi_ols',
+            legacy_path=http_cache.get_disk_cache_path(cls.get_edam_from_ebi_ols, (uri,), {}),
+        )
+
+    def update_information_from_edam(self):
+        """Update the topic from the local EDAM index, or from EBI OLS if it is missing in the index"""
+        term = edam.get_term(self.uri)
+        if term is None:
+            self.update_information_from_ebi_ols()
+        elif edam.set_topic_fields(self, term):
+            self.save()
 
     def update_information_from_ebi_ols(self):
         response = misc.get_edam_info_from_ols(self.uri)
@@ -152,10 +167,79 @@ class Topic(models.Model):
         #     json.dump(topics, f)
 
 
+class TopicClosure(models.Model):
+    """
+    Ancestor/descendant pairs of the topics, from the parents of the topics in the EDAM index, each topic being its
+    own ancestor at depth 0, so a topic with its subtopics is matched through a single join. It is rebuilt by
+    edam.update_closure() once the index is loaded, the topics created later being added by edam.add_to_closure().
+    """
+
+    ancestor = models.ForeignKey(Topic, related_name='descendant_links', on_delete=models.CASCADE)
+    descendant = models.ForeignKey(Topic, related_name='ancestor_links', on_delete=models.CASCADE)
+    depth = models.PositiveSmallIntegerField(help_text="Number of parent relations between the topics")
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['ancestor', 'descendant'], name='unique_topic_closure'),
+        ]
+        indexes = [
+            models.Index(fields=['descendant', 'ancestor']),
+        ]
+
+    def __str__(self):
+        return f'{self.ancestor_id} > {self.descendant_id} ({self.depth})'
+
+    @classmethod
+    def get_permission_classes(cls):
+        return (permissions.ReadOnly,)
+
+
+class PendingTopicClosure:
+    """The topics created by a transaction, added to the closure at once when it is committed"""
+
+    def __init__(self, callbacks):
+        # the callbacks of the transaction, replaced by a new list once it is committed or rolled back
+        self.callbacks = callbacks
+        self.uris = set()
+
+    def __call__(self):
+        edam.add_to_closure(self.uris)
+
+
+def schedule_topic_closure_update(uri):
+    """Add the topic to the closure once the current transaction is committed, with the others created meanwhile"""
+    current = transaction.get_connection()
+    pending = getattr(current, 'topic_closure_pending', None)
+    if current.in_atomic_block and pending is not None and pending.callbacks is current.run_on_commit:
+        pending.uris.add(uri)
+        return
+    pending = PendingTopicClosure(current.run_on_commit)
+    pending.uris.add(uri)
+    if current.in_atomic_block:
+        current.topic_closure_pending = pending
+    transaction.on_commit(pending, robust=True)
+
+
+@receiver(pre_save, sender=Topic)
+def fill_from_edam_index(sender, instance, **kwargs):
+    if instance.pk is None and not instance.label:
+        term = edam.get_term(instance.uri)
+        if term is not None:
+            edam.set_topic_fields(instance, term)
+
+
 @receiver(post_save, sender=Topic)
 def update_information_from_ebi_ols(sender, instance, created, **kwargs):
     if created and (instance.label is None or instance.label == ""):
-        instance.update_information_from_ebi_ols()
+        from ifbcat_api import tasks
+
+        tasks.schedule_enrichment(tasks.enrich_topics_task, instance.uri)
+
+
+@receiver(post_save, sender=Topic)
+def update_topic_closure(sender, instance, created, **kwargs):
+    if created:
+        schedule_topic_closure_update(instance.uri)
 
 
 class Keyword(models.Model):
@@ -170,6 +254,12 @@ class Keyword(models.Model):
         ],
     )
 
+    usage_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        help_text="Number of references to this keyword, maintained by ifbcat_api.counters.",
+    )
+
     def __str__(self):
         """Return the Keyword model as a string."""
         return self.keyword
@@ -264,6 +354,12 @@ class Field(models.Model):
         help_text="A broad field that the organisation or bioinformatics serves.",
     )
 
+    usage_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        help_text="Number of references to this field, maintained by ifbcat_api.counters.",
+    )
+
     def __str__(self):
         """Return the Field model as a string."""
         return self.field
@@ -291,17 +387,27 @@ class Doi(models.Model):
     journal_name = models.TextField("Journal name", null=True, blank=True)
     authors_list = models.TextField("Authors list", null=True, blank=True)
     biblio_year = models.PositiveSmallIntegerField("Year", null=True, blank=True)
+    refreshed_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        editable=False,
+        help_text="When the metadata was last fetched from doi.org, cf the refresh_dois command.",
+    )
 
     def __str__(self):
         """Return the Doi model as a string."""
         return f'{self.title} - {self.authors_list} ({self.doi})'
 
     def fill_from_doi(self):
-        info = misc.get_doi_info(str(self.doi))
+        self.set_info(misc.get_doi_info(str(self.doi)))
+
+    def set_info(self, info):
+        """Set the metadata from the info returned by misc.get_doi_info()"""
         self.title = info["title"]
         self.journal_name = info["journal_name"]
         self.authors_list = info["authors_list"]
         self.biblio_year = info["biblio_year"]
+        self.refreshed_at = timezone.now()
 
     @classmethod
     def get_permission_classes(cls):
@@ -315,24 +421,17 @@ class Doi(models.Model):
         )
 
     @classmethod
-    @misc.disk_cache
     def get_doi_from_pmid(cls, pmid):
-        with Entrez.efetch(db="pubmed", id=str(pmid), rettype="xml", retmode="text") as handle:
-            d = Entrez.read(handle)
-            for article_id in d["PubmedArticle"][0]["PubmedData"]["ArticleIdList"]:
-                if article_id[:2] == "10":
-                    return article_id
+        """The DOI of a PMID or PMCID, None if it has none, cf pubmed.get_dois() to resolve many at once"""
+        return pubmed.get_dois([pmid]).get(str(pmid).strip())
 
 
-@receiver(pre_save, sender=Doi)
-def fetch_info_from_doi(sender, instance, **kwargs):
-    if instance.pk is None and instance.doi is not None and instance.doi != "":
-        try:
-            instance.fill_from_doi()
-        except BibliographicalEntryNotFound:
-            pass
-        except requests.HTTPError:
-            logger.warning(f"Error while fetching {instance.doi}")
+@receiver(post_save, sender=Doi)
+def fetch_info_from_doi(sender, instance, created, **kwargs):
+    if created and instance.doi is not None and instance.doi != "" and not instance.title:
+        from ifbcat_api import tasks
+
+        tasks.schedule_enrichment(tasks.enrich_dois_task, instance.doi)
 
 
 class WithGridIdOrRORId(models.Model):
@@ -0,0 +1,36 @@
+from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.indexes import GinIndex
+from django.db import models
+
+from ifbcat_api import permissions
+
+
+class RegistryOrganisation(models.Model):
+    """
+    Organisation of the Research Organization Registry (ROR), loaded from its data dump by the load_ror command, so the
+    organisations are resolved from their ROR id, GRID id or name without requesting the registry, cf ifbcat_api.ror.
+    """
+
+    ror_id = models.CharField(max_length=9, unique=True, help_text="ROR ID, without https://ror.org/")
+    grid_ids = ArrayField(models.CharField(max_length=32), blank=True, default=list)
+    name = models.CharField(max_length=512)
+    acronyms = ArrayField(models.CharField(max_length=255), blank=True, default=list)
+    # normalized name, aliases, acronyms and labels, cf ror.normalize_name()
+    names = ArrayField(models.CharField(max_length=512), blank=True, default=list)
+    homepage = models.URLField(max_length=512, blank=True)
+    city = models.CharField(max_length=255, blank=True)
+    country = models.CharField(max_length=255, blank=True)
+    status = models.CharField(max_length=32, blank=True)
+
+    class Meta:
+        indexes = [
+            GinIndex(fields=['grid_ids']),
+            GinIndex(fields=['names']),
+        ]
+
+    def __str__(self):
+        return f'{self.name} ({self.ror_id})'
+
+    @classmethod
+    def get_permission_classes(cls):
+        return (permissions.ReadOnly,)
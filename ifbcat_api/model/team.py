@@ -228,20 +228,11 @@ class Team(WithGridIdOrRORId, models.Model):
         help_text="When was its the last modification",
         auto_now=True,
     )
-
-    @property
-    def members_count(self):
-        return (
-            UserProfile.objects.filter(
-                Q(teamsMembers=self)
-                | Q(teamsLeaders=self)
-                | Q(teamsScientificLeaders=self)
-                | Q(teamsTechnicalLeaders=self)
-                | Q(teamsDeputies=self)
-            )
-            .distinct()
-            .count()
-        )
+    members_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        help_text="Number of distinct members, leaders and deputies, maintained by ifbcat_api.counters.",
+    )
 
     @property
     def address_one_line(self):
@@ -0,0 +1,170 @@
+from django.contrib.postgres.fields import ArrayField
+from django.db import models, connection, transaction
+from django.db.models.signals import pre_save, post_save, post_delete, m2m_changed
+from django.apps import apps
+
+from ifbcat_api import permissions
+from ifbcat_api.misc import connect_to_catalog, get_catalog_models
+from ifbcat_api.model.team import Team
+
+
+class TeamDirectory(models.Model):
+    """
+    Read model of the team directory: one row per team, holding its display fields and its relations aggregated in
+    arrays, so listing the teams does not join Team with each of its relations. It is a PostgreSQL materialized view
+    (cf migration 0201_teamdirectory) refreshed concurrently by a huey task, queued once the transactions writing the
+    values it shows are committed and run TEAM_DIRECTORY_REFRESH_DELAY seconds later, once for all the writes meanwhile.
+    """
+
+    class Meta:
+        managed = False
+        db_table = 'ifbcat_api_teamdirectory'
+
+    id = models.IntegerField(primary_key=True)
+    name = models.CharField(max_length=255)
+    logo_url = models.URLField(max_length=512, null=True)
+    description = models.TextField()
+    expertise_description = models.TextField()
+    linkCovid19 = models.URLField(max_length=255)
+    homepage = models.URLField(max_length=255)
+    unitId = models.CharField(max_length=255)
+    address = models.TextField()
+    city = models.CharField(max_length=255)
+    country = models.CharField(max_length=255)
+    orgid = models.CharField(max_length=255, null=True)
+    ifbMembership = models.CharField(max_length=255)
+    closing_date = models.DateField(null=True)
+    lat = models.DecimalField(max_digits=9, decimal_places=6, null=True)
+    lng = models.DecimalField(max_digits=9, decimal_places=6, null=True)
+    updated_at = models.DateTimeField()
+    # lookup values of the related instances
+    expertise = ArrayField(models.CharField(max_length=255))
+    communities = ArrayField(models.CharField(max_length=255))
+    projects = ArrayField(models.CharField(max_length=255))
+    publications = ArrayField(models.CharField(max_length=255))
+    certifications = ArrayField(models.CharField(max_length=255))
+    keywords = ArrayField(models.CharField(max_length=255))
+    fields = ArrayField(models.CharField(max_length=255))
+    tools = ArrayField(models.CharField(max_length=255))
+    services = ArrayField(models.IntegerField())
+    leaders = ArrayField(models.IntegerField())
+    deputies = ArrayField(models.IntegerField())
+    scientificLeaders = ArrayField(models.IntegerField())
+    technicalLeaders = ArrayField(models.IntegerField())
+    members = ArrayField(models.IntegerField())
+    maintainers = ArrayField(models.IntegerField())
+    # id and name of the related instances
+    affiliatedWith = models.JSONField()
+    fundedBy = models.JSONField()
+    platforms = models.JSONField()
+
+    def __str__(self):
+        return self.name
+
+    def get_osm_link(self):
+        return f'https://www.openstreetmap.org/?mlat={self.lat}&mlon={self.lng}#map=12/{self.lat}/{self.lng}'
+
+    @classmethod
+    def get_permission_classes(cls):
+        return (permissions.ReadOnly,)
+
+
+# Models whose fields are displayed in the directory, with these fields, UserProfile only matters when deleted as only
+# ids are kept
+TEAM_DIRECTORY_SOURCES = {
+    'team': (
+        'name',
+        'logo_url',
+        'description',
+        'expertise_description',
+        'linkCovid19',
+        'homepage',
+        'unitId',
+        'address',
+        'city',
+        'country',
+        'orgid',
+        'ifbMembership',
+        'closing_date',
+        'lat',
+        'lng',
+        'updated_at',
+    ),
+    'topic': ('uri',),
+    'community': ('name',),
+    'project': ('name',),
+    'doi': ('doi',),
+    'certification': ('name',),
+    'keyword': ('keyword',),
+    'field': ('field',),
+    'tool': ('name', 'biotoolsID'),
+    'service': ('team',),
+    'organisation': ('name',),
+    'elixirplatform': ('name',),
+}
+
+
+def refresh_team_directory():
+    with connection.cursor() as cursor:
+        cursor.execute(f'REFRESH MATERIALIZED VIEW CONCURRENTLY {TeamDirectory._meta.db_table}')
+
+
+def schedule_team_directory_refresh():
+    """
+    Queue the refresh of the directory once the current transaction is committed, only once whatever the number of
+    writes, cf tasks.queue_team_directory_refresh()
+    """
+    from ifbcat_api import tasks
+
+    current = transaction.get_connection()
+    # the callbacks of a transaction are replaced by a new list once it is committed or rolled back
+    if current.in_atomic_block and getattr(current, 'team_directory_refresh_of', None) is current.run_on_commit:
+        return
+    transaction.on_commit(tasks.queue_team_directory_refresh, robust=True)
+    if current.in_atomic_block:
+        current.team_directory_refresh_of = current.run_on_commit
+
+
+def get_shown_values(sender, instance):
+    names = TEAM_DIRECTORY_SOURCES[sender._meta.model_name]
+    return tuple(getattr(instance, sender._meta.get_field(name).attname) for name in names)
+
+
+def collect_team_directory_changes(sender, instance, update_fields=None, **kwargs):
+    """Tell whether an instance saved without update_fields changes the values shown in the directory"""
+    if sender is Team or update_fields is not None or instance._state.adding:
+        return
+    names = [sender._meta.get_field(name).attname for name in TEAM_DIRECTORY_SOURCES[sender._meta.model_name]]
+    stored = sender._default_manager.filter(pk=instance.pk).values_list(*names).first()
+    instance._team_directory_changed = stored != get_shown_values(sender, instance)
+
+
+def refresh_team_directory_on_save(sender, instance, created, update_fields=None, **kwargs):
+    if created:
+        # the other instances are not related to a team yet
+        changed = sender is Team or sender._meta.model_name == 'service'
+    elif update_fields is not None:
+        changed = not set(update_fields).isdisjoint(TEAM_DIRECTORY_SOURCES[sender._meta.model_name])
+    else:
+        changed = instance.__dict__.pop('_team_directory_changed', True)
+    if changed:
+        schedule_team_directory_refresh()
+
+
+def refresh_team_directory_on_delete(sender, **kwargs):
+    schedule_team_directory_refresh()
+
+
+def refresh_team_directory_on_m2m_changed(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        schedule_team_directory_refresh()
+
+
+def connect_receivers():
+    sources = [model for model in get_catalog_models() if model._meta.model_name in TEAM_DIRECTORY_SOURCES]
+    connect_to_catalog(collect_team_directory_changes, pre_save, models=sources)
+    connect_to_catalog(refresh_team_directory_on_save, post_save, models=sources)
+    connect_to_catalog(
+        refresh_team_directory_on_delete, post_delete, models=sources + [apps.get_model('ifbcat_api', 'UserProfile')]
+    )
+    connect_to_catalog(refresh_team_directory_on_m2m_changed, m2m_changed, models=[Team])
@@ -1,15 +1,13 @@
-import json
 import logging
 from json.decoder import JSONDecodeError
 
-import urllib3
+import requests
 from django.db import models
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, pre_save
 from django.dispatch import receiver
 from rest_framework.permissions import IsAuthenticatedOrReadOnly
-from urllib3.exceptions import MaxRetryError
 
-from ifbcat_api import permissions
+from ifbcat_api import http_client, permissions, pubmed
 from ifbcat_api.model.misc import Topic, Doi, Keyword, Licence
 from ifbcat_api.model.tool.collection import Collection
 from ifbcat_api.model.tool.operatingSystem import OperatingSystem
@@ -128,13 +126,20 @@ class Tool(models.Model):
         self.update_information_from_json(self.fetch_json_from_biotool())
 
     def fetch_json_from_biotool(self):
+        return self.check_json_from_biotool(self.request_json_from_biotool())
+
+    def request_json_from_biotool(self):
+        """The entry of the tool in bio.tools, None if it could not be fetched, nothing is saved so it is thread-safe"""
         try:
-            http = urllib3.PoolManager()
-            req = http.request('GET', f'https://bio.tools/api/{self.biotoolsID}?format=json')
-            entry = json.loads(req.data.decode('utf-8'))
-        except (JSONDecodeError, MaxRetryError) as e:
+            return http_client.get(f'https://bio.tools/api/{self.biotoolsID}?format=json').json()
+        except (JSONDecodeError, requests.RequestException) as e:
             logger.error(f"Error with {self.biotoolsID}: {e}")
             return None
+
+    def check_json_from_biotool(self, entry):
+        """The entry, or None when bio.tools answered with an error, which is then kept in the name of the tool"""
+        if entry is None:
+            return None
         if entry.get('detail', None) is not None:
             logger.error(f"Error with {self.biotoolsID}: {entry['detail']}")
             self.name = f'{self.biotoolsID} {entry["detail"]}'
@@ -142,8 +147,8 @@ class Tool(models.Model):
             return None
         return entry
 
-    def update_information_from_json(self, tool: dict):
-        # insert in DB tool table here
+    def set_information_from_json(self, tool: dict):
+        """Set the fields of the tool from its entry in bio.tools, without saving it nor its relations"""
         self.name = tool['name']
         self.description = tool['description']
         self.homepage = tool['homepage']
@@ -180,6 +185,66 @@ class Tool(models.Model):
         # relation = tool['relation']
         self.last_update = tool['lastUpdate']
 
+    @staticmethod
+    def get_pubmed_ids_from_json(tool: dict):
+        """The PMIDs and PMCIDs of the primary publications of the entry in bio.tools without DOI"""
+        ids = []
+        for publication in tool['publication']:
+            if 'Primary' in publication['type'] and publication['doi'] is None:
+                ids += [publication[key] for key in ('pmid', 'pmcid') if publication[key] is not None]
+        return ids
+
+    @staticmethod
+    def get_primary_dois_from_json(tool: dict, dois: dict = None):
+        """
+        The DOIs of the primary publications of the entry in bio.tools, resolved from their PMID or PMCID if needed
+
+        :param dois: the DOIs of the PMIDs and PMCIDs already resolved, cf pubmed.get_dois()
+        """
+        dois = dict(dois or {})
+        missing = [i for i in Tool.get_pubmed_ids_from_json(tool) if str(i).strip() not in dois]
+        if missing:
+            dois.update(pubmed.get_dois(missing))
+        primary_dois = []
+        for publication in tool['publication']:
+            if 'Primary' in publication['type']:
+                doi = publication['doi']
+                for key in ('pmid', 'pmcid'):
+                    if doi is None and publication[key] is not None:
+                        doi = dois.get(str(publication[key]).strip())
+
+                if doi != None:
+                    primary_dois.append(doi)
+        return primary_dois
+
+    @staticmethod
+    def get_topic_uris_from_json(tool: dict):
+        uris = []
+        for topic in tool['topic']:
+            if topic['uri'] == "http://edamontology.org/topic_3557":
+                # cf comments in https://bioportal.bioontology.org/ontologies/EDAM?p=classes&conceptid=topic_3957
+                # how could we do this not in the code ?
+                topic['uri'] = "http://edamontology.org/topic_3957"
+            uris.append(topic['uri'])
+        return uris
+
+    @staticmethod
+    def get_credit_fields_from_json(credit: dict):
+        return dict(
+            name=credit['name'],
+            email=credit['email'],
+            url=credit['url'],
+            orcidid=credit['orcidid'],
+            gridid=credit['gridid'],
+            typeEntity=credit['typeEntity'],
+            note=credit['note'],
+        )
+
+    def update_information_from_json(self, tool: dict, dois: dict = None):
+        """Update the tool from its entry in bio.tools, dois being the DOIs of the PMIDs and PMCIDs already resolved"""
+        # insert in DB tool table here
+        self.set_information_from_json(tool)
+
         self.save()
 
         for destination_field, names in [
@@ -192,44 +257,20 @@ class Tool(models.Model):
                 destination_field.add(instance)
 
         # entry for publications DOI
-        for publication in tool['publication']:
-            if 'Primary' in publication['type']:
-                doi = None
-
-                if publication['doi'] != None:
-                    doi = publication['doi']
-                if publication['doi'] == None and publication['pmid'] != None:
-                    doi = Doi.get_doi_from_pmid(publication['pmid'])
-                    # print('*Get DOI from PMID: ' + str(doi))
-                if publication['doi'] == None and publication['pmcid'] != None:
-                    doi = Doi.get_doi_from_pmid(publication['pmcid'])
-
-                if doi != None:
-                    doi_entry, created = Doi.objects.get_or_create(doi=doi)
-                    doi_entry.save()
-                    self.primary_publication.add(doi_entry.id)
+        for doi in self.get_primary_dois_from_json(tool, dois):
+            doi_entry, created = Doi.objects.get_or_create(doi=doi)
+            doi_entry.save()
+            self.primary_publication.add(doi_entry.id)
 
         # insert or get DB topic entry table here
-        for topic in tool['topic']:
-            if topic['uri'] == "http://edamontology.org/topic_3557":
-                # cf comments in https://bioportal.bioontology.org/ontologies/EDAM?p=classes&conceptid=topic_3957
-                # how could we do this not in the code ?
-                topic['uri'] = "http://edamontology.org/topic_3957"
-            topic_entry, created = Topic.objects.get_or_create(uri=topic['uri'])
+        for uri in self.get_topic_uris_from_json(tool):
+            topic_entry, created = Topic.objects.get_or_create(uri=uri)
             topic_entry.save()
             self.scientific_topics.add(topic_entry.id)
 
         # entry for toolCredit
         for credit in tool['credit']:
-            toolCredit_entry, created = ToolCredit.objects.get_or_create(
-                name=credit['name'],
-                email=credit['email'],
-                url=credit['url'],
-                orcidid=credit['orcidid'],
-                gridid=credit['gridid'],
-                typeEntity=credit['typeEntity'],
-                note=credit['note'],
-            )
+            toolCredit_entry, created = ToolCredit.objects.get_or_create(**self.get_credit_fields_from_json(credit))
             toolCredit_entry.save()
             self.tool_credit.add(toolCredit_entry.id)
 
@@ -240,10 +281,20 @@ class Tool(models.Model):
                 toolCredit_entry.type_role.add(typeRole_entry.id)
 
 
+@receiver(pre_save, sender=Tool)
+def name_after_biotools_id(sender, instance, **kwargs):
+    # the name is fetched from bio.tools once the tool is created, until then it is its biotoolsID
+    if instance.pk is None and not instance.name and instance.biotoolsID:
+        instance.name = instance.biotoolsID
+
+
 @receiver(post_save, sender=Tool)
 def update_information_from_biotool(sender, instance, created, **kwargs):
     if created and instance.biotoolsID is not None and instance.biotoolsID != "":
         if not hasattr(instance, 'json_from_biotool'):
-            instance.json_from_biotool = instance.fetch_json_from_biotool()
-        if instance.json_from_biotool:
+            # fetched from bio.tools once committed
+            from ifbcat_api import tasks
+
+            tasks.schedule_enrichment(tasks.enrich_tools_task, instance.biotoolsID)
+        elif instance.json_from_biotool:
             instance.update_information_from_json(instance.json_from_biotool)
@@ -5,7 +5,7 @@ from django.contrib.auth.models import BaseUserManager
 from django.contrib.auth.models import PermissionsMixin
 from django.core.mail import EmailMultiAlternatives
 from django.db import models
-from django.db.models.signals import post_save, pre_save
+from django.db.models.signals import post_save, pre_save, m2m_changed
 from django.dispatch import receiver
 from django.template.defaultfilters import linebreaksbr
 from django.utils.html import strip_tags
@@ -16,7 +16,18 @@ from ifbcat_api.model.misc import Topic
 from ifbcat_api.validators import validate_orcid, validate_email
 
 
-class UserProfileManager(BaseUserManager):
+class UserProfileQuerySet(models.QuerySet):
+    def update(self, **kwargs):
+        """Update the users, forgetting the cached ones as no post_save signal is sent, e.g. once deactivated"""
+        from ifbcat_api import authentication
+
+        user_ids = list(self.values_list('pk', flat=True))
+        rows = super().update(**kwargs)
+        authentication.forget_cached_users(user_ids)
+        return rows
+
+
+class UserProfileManager(BaseUserManager.from_queryset(UserProfileQuerySet)):
     """Manager for custom user profiles model
     For more on user models with authentication see https://github.com/django/django/blob/stable/3.0.x/django/contrib/auth/models.py#L131-L158
     """
@@ -202,3 +213,16 @@ def post_save_user_profile(instance, **kwargs):
         )
         email.attach_alternative(message, "text/html")
         email.send(fail_silently=False)
+
+
+@receiver(m2m_changed, sender=UserProfile.groups.through)
+def m2m_changed_user_profile_groups(instance, action, reverse, pk_set, **kwargs):
+    if not action.startswith("post_"):
+        return
+    from ifbcat_api import business_logic
+
+    if not reverse:
+        business_logic.forget_group_names(instance)
+    else:
+        # the instance is the group, the users being in pk_set, or all of its users when cleared
+        business_logic.forget_group_names_of_users(None if action == "post_clear" else pk_set)
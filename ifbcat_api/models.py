@@ -28,6 +28,8 @@ from .model.community import *
 from .model.resource import *
 from .model.trainingMaterial import *
 from .model.team import *
+from .model.teamDirectory import *
+from .model.registryOrganisation import *
 from .model.computingFacility import *
 from .model.project import *
 from .model.training import *
@@ -1,8 +1,12 @@
 # Imports
+import functools
+import operator
+
 from django.contrib.auth import get_user_model
-from django.db.models import ManyToManyField, ManyToOneRel, ManyToManyRel
+from django.db.models import ManyToOneRel, ManyToManyRel, Q, Exists, OuterRef, ExpressionWrapper, BooleanField
 from rest_framework import permissions
 
+
 # Custom permission class for updating user profiles
 class UpdateOwnProfile(permissions.BasePermission):
     """Allow users to edit their own profile (but not others)."""
@@ -20,6 +24,9 @@ class UpdateOwnProfile(permissions.BasePermission):
         # i.e. will return True if they're trying to update their own profile.
         return obj.id == request.user.id
 
+    def get_object_permission_q(self, request, view, model):
+        return Q(id=request.user.id) if request.user.is_authenticated else False
+
 
 # Custom permissions class for updating object
 class ReadWriteBySomething(permissions.BasePermission):
@@ -39,23 +46,28 @@ class ReadWriteBySomething(permissions.BasePermission):
         if self.target:
             self.targets = [self.target]
 
+    def get_targets_q(self, user):
+        """Q matching the instances where user is one of the targets, whether they are FK, M2M or spanning (a__b)"""
+        return functools.reduce(operator.or_, [Q(**{target: user}) for target in self.targets])
+
     def has_object_permission(self, request, view, obj):
-        for target in self.targets:
-            # check if __ is in the target, if so we use the queryset to filter and check if the object is
-            # still accessible
-            # we get the target attribute
-            target_attr = getattr(obj, target, None)
-            if '__' in target:
-                if obj._meta.model.objects.filter(**{target: request.user, "id": obj.id}).exists():
-                    return True
-            # if it is a ManyToMany we test if the user on of them
-            elif isinstance(obj._meta.get_field(target), ManyToManyField):
-                if target_attr.filter(id=request.user.id).exists():
-                    return True
-            # otherwise we test is the user is the target
-            elif target_attr is not None and target_attr.id == request.user.id:
-                return True
-        return False
+        if obj is None or not request.user.is_authenticated:
+            return False
+        from ifbcat_api import business_logic
+
+        # all targets are checked at once, and the answer is kept for the rest of the request as the permission
+        # is evaluated again and again for each method (GET, PUT, POST, DELETE) by the admin
+        memo = business_logic.get_request_cache(request, "ReadWriteBySomething")
+        key = (obj._meta.label, obj.pk, request.user.pk, tuple(self.targets))
+        try:
+            return memo[key]
+        except KeyError:
+            pass
+        memo[key] = obj._meta.model._default_manager.filter(self.get_targets_q(request.user), pk=obj.pk).exists()
+        return memo[key]
+
+    def get_object_permission_q(self, request, view, model):
+        return self.get_targets_q(request.user) if request.user.is_authenticated else False
 
 
 # Custom permissions class for updating object
@@ -70,6 +82,9 @@ class ReadOnly(permissions.BasePermission):
         """Check the user is trying to update their own object."""
         return request.method in permissions.SAFE_METHODS
 
+    def get_object_permission_q(self, request, view, model):
+        return request.method in permissions.SAFE_METHODS
+
 
 class ReadWriteByUser(ReadWriteBySomething):
     target = 'user'
@@ -197,6 +212,9 @@ class ReadWriteBySuperuser(permissions.BasePermission):
     def has_object_permission(self, request, view, obj):
         return request.user.is_superuser
 
+    def get_object_permission_q(self, request, view, model):
+        return request.user.is_superuser
+
 
 class ReadWriteBySuperEditor(permissions.BasePermission):
     def has_permission(self, request, view):
@@ -209,6 +227,11 @@ class ReadWriteBySuperEditor(permissions.BasePermission):
 
         return business_logic.is_super_editor(request.user)
 
+    def get_object_permission_q(self, request, view, model):
+        from ifbcat_api import business_logic
+
+        return business_logic.is_super_editor(request.user)
+
 
 class ReadWriteByCurator(permissions.BasePermission):
     def has_permission(self, request, view):
@@ -221,6 +244,11 @@ class ReadWriteByCurator(permissions.BasePermission):
 
         return business_logic.is_curator(request.user)
 
+    def get_object_permission_q(self, request, view, model):
+        from ifbcat_api import business_logic
+
+        return business_logic.is_curator(request.user)
+
 
 class ReadWriteByUserManager(permissions.BasePermission):
     def has_permission(self, request, view):
@@ -235,6 +263,16 @@ class ReadWriteByUserManager(permissions.BasePermission):
             isinstance(obj, get_user_model()) and business_logic.can_edit_user(request.user, obj)
         )
 
+    def get_object_permission_q(self, request, view, model):
+        from ifbcat_api import business_logic
+
+        if business_logic.is_user_manager(request.user):
+            return True
+        if model != get_user_model() or not request.user.is_authenticated:
+            return False
+        # mirrors can_edit_user, knowing that the user is not a user manager
+        return True if request.user.is_superuser else Q(pk=request.user.pk)
+
 
 class UserCanAddNew(permissions.BasePermission):
     def has_permission(self, request, view):
@@ -243,6 +281,85 @@ class UserCanAddNew(permissions.BasePermission):
     def has_object_permission(self, request, view, obj):
         return obj is None
 
+    def get_object_permission_q(self, request, view, model):
+        return False
+
+
+# tables rebuilt from the others or from an external dump, whose rows are not references to an instance nor data of
+# the catalog, by their label so the historical models of the migrations are recognized too
+DERIVED_MODELS = ('ifbcat_api.TopicClosure', 'ifbcat_api.RegistryOrganisation')
+
+
+def get_referencing_querysets(model):
+    """
+    Querysets of the rows referencing an instance of model, one per reverse FK or M2M, the referenced instance being
+    OuterRef('pk'), the ones of DERIVED_MODELS being ignored
+    """
+    for model_field in model._meta.get_fields():
+        if not isinstance(model_field, (ManyToManyRel, ManyToOneRel)):
+            continue
+        if model_field.related_model._meta.label in DERIVED_MODELS:
+            continue
+        if isinstance(model_field, ManyToManyRel):
+            yield model_field.through._default_manager.filter(
+                **{model_field.field.m2m_reverse_field_name(): OuterRef('pk')}
+            )
+        elif isinstance(model_field, ManyToOneRel):
+            yield model_field.related_model._default_manager.filter(
+                **{model_field.field.attname: OuterRef(model_field.field_name)}
+            )
+
+
+def has_usage_count(model):
+    """Tell whether the model maintains its number of references in a column (cf ifbcat_api.counters)"""
+    return any(f.name == "usage_count" for f in model._meta.concrete_fields)
+
+
+def get_is_used_q(model):
+    """Q matching the instances of model referenced by at least one other instance, through any reverse FK or M2M"""
+    if has_usage_count(model):
+        return Q(usage_count__gt=0)
+    exists = [Q(Exists(referencing)) for referencing in get_referencing_querysets(model)]
+    if len(exists) == 0:
+        return Q(pk__in=[])
+    return functools.reduce(operator.or_, exists)
+
+
+def annotate_is_used(queryset):
+    """Annotate is_used on all the instances of the queryset at once, is_used(obj) then does not issue any query"""
+    return queryset.annotate(
+        is_used=ExpressionWrapper(get_is_used_q(queryset.model), output_field=BooleanField()),
+    )
+
+
+def is_used(obj, request=None):
+    """Tell whether obj is referenced by another instance, in a single query stopping at the first hit"""
+    annotated = getattr(obj, "is_used", None)
+    if annotated is not None:
+        return annotated
+    if has_usage_count(obj._meta.model):
+        return obj.usage_count > 0
+    if request is None:
+        return obj._meta.model._default_manager.filter(get_is_used_q(obj._meta.model), pk=obj.pk).exists()
+    from ifbcat_api import business_logic
+
+    memo = business_logic.get_request_cache(request, "is_used")
+    key = (obj._meta.label, obj.pk)
+    if key not in memo:
+        memo[key] = is_used(obj)
+    return memo[key]
+
+
+def get_basic_permission_classes(permission_classes):
+    """Get the set of classes the permission classes are made of, unwrapping those composed with &, | and ~"""
+    found = set()
+    for perm in permission_classes:
+        if hasattr(perm, "op1_class"):
+            found |= get_basic_permission_classes([perm.op1_class, getattr(perm, "op2_class", None)])
+        elif perm is not None:
+            found.add(perm)
+    return found
+
 
 class UserCanEditAndDeleteIfNotUsed(permissions.BasePermission):
     allowed_methods = ("PUT", "POST", "DELETE")
@@ -253,12 +370,12 @@ class UserCanEditAndDeleteIfNotUsed(permissions.BasePermission):
     def has_object_permission(self, request, view, obj):
         if request.method not in self.allowed_methods:
             return False
-        for model_field in obj._meta.get_fields():
-            if isinstance(model_field, ManyToManyRel) or isinstance(model_field, ManyToOneRel):
-                attr_name = model_field.related_name or (model_field.name + "_set")
-                if getattr(obj, attr_name).count() > 0:
-                    return False
-        return True
+        return not is_used(obj, request)
+
+    def get_object_permission_q(self, request, view, model):
+        if request.method not in self.allowed_methods:
+            return False
+        return ~get_is_used_q(model)
 
 
 class UserCanDeleteIfNotUsed(UserCanEditAndDeleteIfNotUsed):
@@ -278,6 +395,11 @@ class UserCanEditIfNotStaff(permissions.BasePermission):
             return False
         return True
 
+    def get_object_permission_q(self, request, view, model):
+        if request.method not in self.allowed_methods:
+            return False
+        return Q(is_staff=False, is_superuser=False)
+
 
 class UserCanDeleteIfNotStaffAndNotUsed(permissions.BasePermission):
     allowed_methods = ("DELETE",)
@@ -290,12 +412,12 @@ class UserCanDeleteIfNotStaffAndNotUsed(permissions.BasePermission):
             return False
         if obj is not None and (obj.is_staff or obj.is_superuser):
             return False
-        for model_field in obj._meta.get_fields():
-            if isinstance(model_field, ManyToManyRel) or isinstance(model_field, ManyToOneRel):
-                attr_name = model_field.related_name or (model_field.name + "_set")
-                if hasattr(obj, attr_name) and getattr(obj, attr_name).count() > 0:
-                    return False
-        return True
+        return not is_used(obj, request)
+
+    def get_object_permission_q(self, request, view, model):
+        if request.method not in self.allowed_methods:
+            return False
+        return Q(is_staff=False, is_superuser=False) & ~get_is_used_q(model)
 
 
 class IsFromAdmin(permissions.BasePermission):
@@ -309,6 +431,11 @@ class IsFromAdmin(permissions.BasePermission):
 
         return business_logic.is_from_admin(request)
 
+    def get_object_permission_q(self, request, view, model):
+        from ifbcat_api import business_logic
+
+        return business_logic.is_from_admin(request)
+
 
 class SuperuserCanDelete(permissions.BasePermission):
     def has_permission(self, request, view):
@@ -316,3 +443,64 @@ class SuperuserCanDelete(permissions.BasePermission):
 
     def has_object_permission(self, request, view, obj):
         return request.user.is_superuser and request.method == "DELETE"
+
+    def get_object_permission_q(self, request, view, model):
+        return request.user.is_superuser and request.method == "DELETE"
+
+
+###############################################################################
+# Object permissions for all instances at once
+###############################################################################
+class NotTranslatableToQ(Exception):
+    pass
+
+
+def q_or(a, b):
+    """OR between two results of get_object_permission_q, each being either a bool or a Q"""
+    if a is True or b is True:
+        return True
+    if a is False:
+        return b
+    if b is False:
+        return a
+    return a | b
+
+
+def q_and(a, b):
+    """AND between two results of get_object_permission_q, each being either a bool or a Q"""
+    if a is False or b is False:
+        return False
+    if a is True:
+        return b
+    if b is True:
+        return a
+    return a & b
+
+
+def get_object_permission_q(perm, request, view, model):
+    """
+    Translate has_object_permission of a permission, possibly composed with &, | and ~, for all instances of a model.
+
+    :param perm: an instance of the permission
+    :return: True or False when the answer is the same for all instances, a Q matching the granted instances otherwise
+    :raise NotTranslatableToQ: when one of the permission involved does not implement get_object_permission_q
+    """
+    # similar to rest_framework/permissions.py: OR, AND and NOT
+    if isinstance(perm, permissions.OR):
+        return q_or(
+            perm.op1.has_permission(request, view) and get_object_permission_q(perm.op1, request, view, model),
+            perm.op2.has_permission(request, view) and get_object_permission_q(perm.op2, request, view, model),
+        )
+    if isinstance(perm, permissions.AND):
+        return q_and(
+            get_object_permission_q(perm.op1, request, view, model),
+            get_object_permission_q(perm.op2, request, view, model),
+        )
+    if isinstance(perm, permissions.NOT):
+        q = get_object_permission_q(perm.op1, request, view, model)
+        return (not q) if isinstance(q, bool) else ~q
+    if hasattr(perm, "get_object_permission_q"):
+        return perm.get_object_permission_q(request, view, model)
+    if type(perm).has_object_permission is permissions.BasePermission.has_object_permission:
+        return True
+    raise NotTranslatableToQ(type(perm).__name__)
@@ -0,0 +1,106 @@
+"""
+Resolution of the PubMed (PMID) and PubMed Central (PMCID) identifiers of publications to their DOI, in batches: the
+PMIDs with the E-utilities efetch of NCBI, the PMCIDs with its ID converter, PUBMED_BATCH_SIZE identifiers per request.
+The DOIs resolved, and the identifiers without any, are kept in the http cache.
+"""
+
+import io
+import logging
+import os
+
+from Bio import Entrez
+from django.conf import settings
+
+from ifbcat_api import http_cache, http_client
+
+logger = logging.getLogger(__name__)
+
+EFETCH_URL = 'https://eutils.ncbi.nlm.nih.gov/entrez/eutils/efetch.fcgi'
+IDCONV_URL = 'https://www.ncbi.nlm.nih.gov/pmc/utils/idconv/v1.0/'
+NAMESPACE = 'pubmed_doi'
+
+
+def is_pmcid(identifier):
+    return identifier.upper().startswith('PMC')
+
+
+def get_params(**params):
+    params['tool'] = 'ifbcat'
+    if settings.NCBI_API_KEY:
+        params['api_key'] = settings.NCBI_API_KEY
+    return params
+
+
+def fetch_pmids(pmids):
+    """The DOI of the PMIDs known by PubMed"""
+    # POST, as the ids would not fit in the url
+    response = http_client.get_client().post(
+        EFETCH_URL, data=get_params(db='pubmed', id=','.join(pmids), retmode='xml')
+    )
+    response.raise_for_status()
+    dois = dict()
+    for article in Entrez.read(io.BytesIO(response.content)).get('PubmedArticle', []):
+        pmid = str(article['MedlineCitation']['PMID'])
+        for article_id in article['PubmedData']['ArticleIdList']:
+            if article_id.attributes.get('IdType') == 'doi':
+                dois[pmid] = str(article_id)
+                break
+    return dois
+
+
+def fetch_pmcids(pmcids):
+    """The DOI of the PMCIDs known by PubMed Central"""
+    response = http_client.get(IDCONV_URL, params=get_params(ids=','.join(pmcids), format='json'))
+    response.raise_for_status()
+    return {
+        record['pmcid'].upper(): record['doi']
+        for record in response.json().get('records', [])
+        if record.get('pmcid') and record.get('doi')
+    }
+
+
+def get_cached(identifier):
+    """The entry of the identifier in the cache, or in the files of the previous cache, None if missing or expired"""
+    entry = http_cache.lookup(NAMESPACE, identifier)
+    if entry is None:
+        entry = http_cache.read_legacy_file(os.path.join('get_doi_from_pmid', f'{identifier}.json'))
+        if entry is not None:
+            http_cache.store(NAMESPACE, identifier, entry, event='legacy')
+            return entry
+    if entry is not None and entry.is_fresh:
+        http_cache.hit(NAMESPACE, identifier)
+        return entry
+    return None
+
+
+def get_dois(identifiers):
+    """
+    The DOI of each PMID or PMCID, None if it has none, from the cache and then from NCBI, by batches
+
+    :param identifiers: the PMIDs and PMCIDs, the ones empty being ignored
+    :return: the DOIs by identifier, as a string
+    """
+    identifiers = list(dict.fromkeys(str(identifier).strip() for identifier in identifiers if identifier))
+    cached = http_cache.get_connection() is not None
+    dois, missing = dict(), []
+    for identifier in identifiers:
+        entry = get_cached(identifier) if cached else None
+        if entry is None:
+            missing.append(identifier)
+        else:
+            dois[identifier] = entry.value
+
+    size = settings.PUBMED_BATCH_SIZE
+    for fetch, batch_identifiers in (
+        (fetch_pmids, [identifier for identifier in missing if not is_pmcid(identifier)]),
+        (fetch_pmcids, [identifier for identifier in missing if is_pmcid(identifier)]),
+    ):
+        for i in range(0, len(batch_identifiers), size):
+            batch = batch_identifiers[i : i + size]
+            resolved = fetch(batch)
+            for identifier in batch:
+                dois[identifier] = resolved.get(identifier.upper() if is_pmcid(identifier) else identifier)
+                if cached:
+                    http_cache.store(NAMESPACE, identifier, http_cache.Entry(dois[identifier]))
+            logger.debug(f"{len(resolved)} DOIs of {len(batch)} identifiers resolved with {fetch.__name__}")
+    return dois
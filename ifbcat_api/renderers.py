@@ -20,11 +20,18 @@ from django.urls import reverse
 from rdflib import ConjunctiveGraph, URIRef, Namespace, Literal, BNode
 from rdflib.namespace import RDF, XSD
 from rest_framework import renderers
-from rest_framework.relations import Hyperlink
+from rest_framework.relations import (
+    Hyperlink,
+    HyperlinkedRelatedField,
+    ManyRelatedField,
+    RelatedField,
+    SlugRelatedField,
+)
 from rest_framework.serializers import ListSerializer
 
-
 # Proof of concept on tools before using it on training
+from ifbcat_api import vocabularies
+from ifbcat_api.filters import get_search_url
 from ifbcat_api.serializers import JsonLDSerializerMixin, DynamicMappingException
 
 
@@ -236,3 +243,70 @@ def get_klass_types(rdf_mapping, model, instance_id):
                 "you must provide a type in _type or many types in _types, always as String"
             )
             raise e
+
+
+class LightBrowsableAPIRenderer(renderers.BrowsableAPIRenderer):
+    """
+    BrowsableAPIRenderer not loading the querysets of the related fields: they are rendered as inputs autocompleted
+    with the list endpoint of the related model. Forms are also not rendered at all for anonymous users.
+    """
+
+    def show_form_for_method(self, view, method, request, obj):
+        if not request.user.is_authenticated:
+            return False
+        return super().show_form_for_method(view, method, request, obj)
+
+    def render_form_for_serializer(self, serializer):
+        for field in getattr(serializer, "fields", dict()).values():
+            style = get_autocomplete_style(field)
+            if style is not None:
+                field.style.update(style)
+            else:
+                use_vocabulary_choices(field)
+        return super().render_form_for_serializer(serializer)
+
+
+def use_vocabulary_choices(field):
+    """Read the choices of the related field from the cached vocabulary when it is a controlled vocabulary"""
+    relation = field.child_relation if isinstance(field, ManyRelatedField) else field
+    if not isinstance(relation, RelatedField) or relation.read_only or relation.queryset is None:
+        return
+    vocabulary = vocabularies.get_vocabulary(relation.get_queryset(), 'pk')
+    if vocabulary is None:
+        return
+
+    def get_choices(cutoff=None):
+        instances = vocabulary.instances if cutoff is None else vocabulary.instances[:cutoff]
+        return {relation.to_representation(i): relation.display_value(i) for i in instances}
+
+    # only for the form, as RelatedField.get_choices() would query the instances
+    relation.get_choices = get_choices
+
+
+def get_autocomplete_style(field):
+    """
+    Get the style rendering a related field with an autocompleted input, None when it cannot be, e.g. as the list
+    endpoint of the related model does not search, the field then being rendered with a select.
+
+    :param field: the field of the serializer
+    :return: the style to add to the one of the field
+    """
+    multiple = isinstance(field, ManyRelatedField)
+    relation = field.child_relation if multiple else field
+    if not isinstance(relation, RelatedField) or relation.read_only or relation.queryset is None:
+        return None
+    url = get_search_url(relation.queryset.model)
+    if url is None:
+        return None
+    if isinstance(relation, HyperlinkedRelatedField):
+        value_key = "url"
+    elif isinstance(relation, SlugRelatedField):
+        value_key = relation.slug_field
+    else:
+        value_key = "id"
+    return dict(
+        template="rest_framework/horizontal/autocomplete.html",
+        autocomplete_url=url,
+        autocomplete_value_key=value_key,
+        autocomplete_multiple=multiple,
+    )
@@ -0,0 +1,154 @@
+"""
+Cache of the expensive responses (the lists of the -cnp endpoints and the sitemaps) serving a stale response while it is
+computed again, so the requests arriving when it expires or is invalidated do not all compute it at once.
+
+An entry is fresh during max_age seconds, unless the catalog is written in between. Once it is stale, the first request
+takes a lock in the cache and computes it again, while the others get the stale entry, for at most max_stale seconds
+after it became stale. Past that, or when there is no entry yet, they wait for the one computing it instead.
+
+The lock and the time of the last write are only seen by all the processes (the web workers, the huey consumer, ...)
+through a cache shared by them, so the responses are only cached with one, cf CACHES. Otherwise, they are computed for
+each request.
+"""
+
+import functools
+import hashlib
+import logging
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.http import HttpResponse
+
+from ifbcat_api.misc import connect_to_catalog, is_cache_shared
+
+logger = logging.getLogger(__name__)
+
+__INVALIDATED_AT_KEY = "response-cache-invalidated-at"
+
+# seconds between two checks of a waiting request for the entry computed by another one
+WAIT_INTERVAL = 0.1
+
+
+def get_invalidated_at():
+    """Time of the last write to the catalog, the entries computed before are stale"""
+    invalidated_at = cache.get(__INVALIDATED_AT_KEY)
+    if invalidated_at is None:
+        # unknown, e.g.: the cache was cleared, consider the entries stale from now
+        cache.add(__INVALIDATED_AT_KEY, time.time(), None)
+        invalidated_at = cache.get(__INVALIDATED_AT_KEY, 0)
+    return invalidated_at
+
+
+def invalidate_responses():
+    cache.set(__INVALIDATED_AT_KEY, time.time(), None)
+
+
+def invalidate_responses_on_write(sender, update_fields=None, **kwargs):
+    if update_fields is not None and set(update_fields) <= {'last_login'}:
+        # a user logging in does not change the catalog
+        return
+    # once committed, so an entry computed meanwhile is not considered fresh while missing the write
+    if not is_written_in_transaction():
+        transaction.on_commit(invalidate_responses)
+
+
+def is_written_in_transaction():
+    return any(func is invalidate_responses for _, func, _ in transaction.get_connection().run_on_commit)
+
+
+def connect_receivers():
+    connect_to_catalog(invalidate_responses_on_write, post_save, post_delete, m2m_changed)
+
+
+def compute(key, func, max_age, max_stale):
+    created_at = time.time()
+    value = func()
+    cache.set(key, (created_at, value), max_age + max_stale)
+    return value
+
+
+def get_or_compute(key, func, max_age=None, max_stale=None):
+    """
+    The value of key in the cache, computed with func when it is not fresh anymore by exactly one of the concurrent
+    callers, the others getting the stale value. The transactions which wrote the catalog always compute it, and so do
+    the processes without a cache shared with the others.
+
+    :param max_age: seconds during which the value is fresh, RESPONSE_CACHE_MAX_AGE by default
+    :param max_stale: seconds during which a stale value can be provided, RESPONSE_CACHE_MAX_STALE by default
+    """
+    max_age = settings.RESPONSE_CACHE_MAX_AGE if max_age is None else max_age
+    max_stale = settings.RESPONSE_CACHE_MAX_STALE if max_stale is None else max_stale
+    if is_written_in_transaction():
+        # the cache does not hold the writes of the current transaction yet
+        return func()
+    if not is_cache_shared():
+        # neither the lock nor the writes of the other processes would be seen
+        return func()
+    now = time.time()
+    entry = cache.get(key)
+    servable = False
+    if entry is not None:
+        created_at, value = entry
+        stale_since = created_at + max_age
+        invalidated_at = get_invalidated_at()
+        if invalidated_at > created_at:
+            stale_since = min(stale_since, invalidated_at)
+        if now < stale_since:
+            return value
+        servable = now - stale_since < max_stale
+
+    lock_key = f"{key}-lock"
+    if cache.add(lock_key, True, settings.RESPONSE_CACHE_LOCK_TIMEOUT):
+        try:
+            return compute(key, func, max_age, max_stale)
+        finally:
+            cache.delete(lock_key)
+    if servable:
+        return value
+
+    # another caller is computing it, wait for it as long as it holds the lock
+    while time.time() < now + settings.RESPONSE_CACHE_LOCK_TIMEOUT:
+        time.sleep(WAIT_INTERVAL)
+        new_entry = cache.get(key)
+        if new_entry is not None and (entry is None or new_entry[0] > entry[0]):
+            return new_entry[1]
+        if cache.get(lock_key) is None:
+            # it failed
+            break
+    logger.warning(f"Computing {key} without the lock, the caller holding it did not provide it in time")
+    return compute(key, func, max_age, max_stale)
+
+
+def get_request_key(request, prefix):
+    return f"{prefix}-{hashlib.md5(request.build_absolute_uri().encode()).hexdigest()}"
+
+
+def cache_response(max_age=None, max_stale=None):
+    """Decorator caching the GET responses of a view with get_or_compute, by absolute uri"""
+
+    def decorator(view_func):
+        @functools.wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view_func(request, *args, **kwargs)
+
+            def func():
+                response = view_func(request, *args, **kwargs)
+                if hasattr(response, 'render'):
+                    response.render()
+                return response.content, response.status_code, dict(response.items())
+
+            content, status, headers = get_or_compute(
+                get_request_key(request, f"response-cache-{view_func.__name__}"),
+                func,
+                max_age=max_age,
+                max_stale=max_stale,
+            )
+            return HttpResponse(content, status=status, headers=headers)
+
+        return wrapper
+
+    return decorator
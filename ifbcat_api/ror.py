@@ -0,0 +1,189 @@
+"""
+Local index of the Research Organization Registry (ROR), so the organisations are imported, validated and matched by
+name without requesting the registry, nor grid.ac which it replaced.
+
+The load_ror command loads a ROR data dump (https://doi.org/10.5281/zenodo.6347574, the zip or the JSON file it
+contains, in the schema v1 or v2) in RegistryOrganisation, where the organisations are found in bulk by ROR id, GRID id
+or normalized name. Whether it is loaded is kept in the cache until it is loaded again, as it is checked on each
+organisation validated.
+"""
+
+import json
+import logging
+import os
+import re
+import unicodedata
+import zipfile
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+
+from ifbcat_api.misc import is_cache_shared
+
+logger = logging.getLogger(__name__)
+
+ROR_PREFIX = 'https://ror.org/'
+GRID_PREFIX = 'grid.'
+
+# organisations written at once
+BATCH_SIZE = 5000
+
+__LOADED_KEY = "ror-loaded"
+
+
+def normalize_name(name):
+    """
+    The name lower cased, without accents, punctuation nor repeated spaces, e.g. "Université Paris-Saclay" and
+    "universite paris  saclay" are the same
+    """
+    name = unicodedata.normalize('NFKD', name or '')
+    name = ''.join(c for c in name if not unicodedata.combining(c))
+    return ' '.join(re.sub(r'[\W_]+', ' ', name.lower()).split())
+
+
+def parse_record_v1(record):
+    grid_ids = record.get('external_ids', {}).get('GRID', {}).get('all') or []
+    addresses = record.get('addresses') or [{}]
+    return dict(
+        ror_id=record['id'].replace(ROR_PREFIX, ''),
+        grid_ids=[grid_ids] if isinstance(grid_ids, str) else grid_ids,
+        name=record['name'],
+        acronyms=record.get('acronyms') or [],
+        other_names=(record.get('aliases') or []) + [label['label'] for label in record.get('labels') or []],
+        homepage=(record.get('links') or [''])[0],
+        city=addresses[0].get('city') or '',
+        country=(record.get('country') or {}).get('country_name') or '',
+        status=record.get('status') or '',
+    )
+
+
+def parse_record_v2(record):
+    names = record.get('names') or []
+    grid_ids = [i for e in record.get('external_ids') or [] if e['type'] == 'grid' for i in e.get('all') or []]
+    location = ((record.get('locations') or [{}])[0]).get('geonames_details') or {}
+    return dict(
+        ror_id=record['id'].replace(ROR_PREFIX, ''),
+        grid_ids=grid_ids,
+        name=next((n['value'] for n in names if 'ror_display' in n['types']), names[0]['value'] if names else ''),
+        acronyms=[n['value'] for n in names if 'acronym' in n['types']],
+        other_names=[n['value'] for n in names if 'acronym' not in n['types']],
+        homepage=next((link['value'] for link in record.get('links') or [] if link['type'] == 'website'), ''),
+        city=location.get('name') or '',
+        country=location.get('country_name') or '',
+        status=record.get('status') or '',
+    )
+
+
+def parse_record(record):
+    """The fields of the organisation from its record in the dump, in the schema v1 or v2"""
+    fields = parse_record_v2(record) if 'names' in record else parse_record_v1(record)
+    fields['grid_ids'] = [grid_id.lower() for grid_id in fields['grid_ids']]
+    other_names = fields.pop('other_names')
+    fields['names'] = list(
+        dict.fromkeys(normalize_name(n) for n in [fields['name']] + fields['acronyms'] + other_names if n)
+    )
+    return fields
+
+
+def read_dump(path):
+    """The records of the ROR data dump in path, a zip file or the JSON file it contains"""
+    if os.path.splitext(path)[1].lower() != '.zip':
+        with open(path) as f:
+            return json.load(f)
+    with zipfile.ZipFile(path) as archive:
+        names = [name for name in archive.namelist() if name.endswith('.json')]
+        if not names:
+            raise ValueError(f"No JSON file in the ROR data dump {path}")
+        # the dumps giving both schemas name the one of the schema v2 *_schema_v2.json
+        name = next((name for name in names if 'schema_v2' in name), names[0])
+        with archive.open(name) as f:
+            return json.load(f)
+
+
+def load(records):
+    """Replace the organisations of the registry with the ones of records, and return their number"""
+    from ifbcat_api.models import RegistryOrganisation
+
+    organisations = [RegistryOrganisation(**parse_record(record)) for record in records]
+    with transaction.atomic():
+        RegistryOrganisation.objects.all().delete()
+        RegistryOrganisation.objects.bulk_create(organisations, batch_size=BATCH_SIZE)
+        forget_loaded()
+        transaction.on_commit(forget_loaded, robust=True)
+    return len(organisations)
+
+
+def is_grid_id(orgid):
+    return orgid.lower().startswith(GRID_PREFIX)
+
+
+def get_key(orgid):
+    """The ROR id without its prefix, or the GRID id, lower cased"""
+    return orgid.strip().replace(ROR_PREFIX, '').lower()
+
+
+def get_organisations(orgids):
+    """
+    The organisations of the registry having the ROR or GRID ids
+
+    :return: the organisations by id, the ones missing in the registry being absent
+    """
+    from ifbcat_api.models import RegistryOrganisation
+
+    orgids = [orgid for orgid in orgids if orgid and orgid.strip()]
+    if not orgids:
+        return dict()
+    keys = {orgid: get_key(orgid) for orgid in orgids}
+    ror_ids = [key for key in keys.values() if not is_grid_id(key)]
+    grid_ids = [key for key in keys.values() if is_grid_id(key)]
+    by_id = dict()
+    for organisation in RegistryOrganisation.objects.filter(Q(ror_id__in=ror_ids) | Q(grid_ids__overlap=grid_ids)):
+        by_id[organisation.ror_id] = organisation
+        for grid_id in organisation.grid_ids:
+            by_id[grid_id] = organisation
+    return {orgid: by_id[key] for orgid, key in keys.items() if key in by_id}
+
+
+def get_organisation(orgid):
+    """The organisation of the registry having the ROR or GRID id, None if missing"""
+    return get_organisations([orgid]).get(orgid)
+
+
+def match_names(names):
+    """
+    The organisations of the registry whose name, an alias, an acronym or a label is one of names, once normalized
+
+    :return: the organisations matching each name, the active ones first
+    """
+    from ifbcat_api.models import RegistryOrganisation
+
+    normalized = {name: normalize_name(name) for name in names if name}
+    organisations = RegistryOrganisation.objects.filter(names__overlap=list(set(normalized.values())))
+    by_name = dict()
+    for organisation in organisations.order_by('ror_id'):
+        for name in organisation.names:
+            by_name.setdefault(name, []).append(organisation)
+    return {
+        name: sorted(by_name.get(n, []), key=lambda organisation: organisation.status != 'active')
+        for name, n in normalized.items()
+    }
+
+
+def is_loaded():
+    """
+    Whether the registry is loaded, seen by the other processes after VOCABULARIES_LOCAL_MAX_AGE seconds without a
+    cache shared by the processes
+    """
+    from ifbcat_api.models import RegistryOrganisation
+
+    loaded = cache.get(__LOADED_KEY)
+    if loaded is None:
+        loaded = RegistryOrganisation.objects.exists()
+        cache.set(__LOADED_KEY, loaded, None if is_cache_shared() else settings.VOCABULARIES_LOCAL_MAX_AGE)
+    return loaded
+
+
+def forget_loaded():
+    cache.delete(__LOADED_KEY)
@@ -0,0 +1,48 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.schemas.openapi import SchemaGenerator
+
+from ifbcat_api.filters import get_used_values_version
+from ifbcat_api.misc import get_code_version
+
+
+def _get_user_key(request):
+    user = getattr(request, "user", None)
+    if user is None or not user.is_authenticated:
+        return "anonymous"
+    return str(user.pk)
+
+
+class CachedSchemaGenerator(SchemaGenerator):
+    """
+    SchemaGenerator keeping the schema in the cache, per user as the methods and fields listed depend on its
+    permissions. The choices of the filters being listed in the schema, it is generated again as soon as the values
+    used change (cf get_used_values_version), and once another version of the code is deployed.
+    """
+
+    def get_schema(self, request=None, public=False):
+        cache_key = f"openapi-schema-{get_code_version()}-{get_used_values_version()}-{public}-{_get_user_key(request)}"
+        schema = cache.get(cache_key)
+        if schema is None:
+            schema = super().get_schema(request=request, public=public)
+            if schema is not None:
+                cache.set(cache_key, schema, settings.OPENAPI_SCHEMA_CACHE_TTL)
+        return schema
+
+
+def get_schema_etag(request, *args, **kwargs):
+    """ETag of the schema, it changes with the code deployed, the values used, the user and the representation asked"""
+    return hashlib.sha256(
+        "\n".join(
+            [
+                get_code_version(),
+                get_used_values_version(),
+                _get_user_key(request),
+                request.META.get("HTTP_AUTHORIZATION", ""),
+                request.GET.get("format", ""),
+                request.META.get("HTTP_ACCEPT", ""),
+            ]
+        ).encode()
+    ).hexdigest()
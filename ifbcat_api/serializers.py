@@ -7,7 +7,7 @@ from django.utils.encoding import smart_str
 from rest_framework import serializers
 from rest_framework.exceptions import ValidationError
 
-from ifbcat_api import models, inlineSerializers
+from ifbcat_api import models, inlineSerializers, vocabularies
 
 from rest_framework.fields import empty
 
@@ -16,6 +16,11 @@ class CreatableSlugRelatedField(serializers.SlugRelatedField):
     """Custom SlugRelatedField that creates the new object when one doesn't exist."""
 
     def to_internal_value(self, data):
+        vocabulary = vocabularies.get_vocabulary(self.get_queryset(), self.slug_field)
+        if vocabulary is not None:
+            instance = vocabulary.get(self.slug_field, data)
+            if instance is not None:
+                return instance
         try:
             return self.get_queryset().get(**{self.slug_field: data})
         except ObjectDoesNotExist:
@@ -246,23 +251,34 @@ class EventPrerequisiteSerializer(serializers.ModelSerializer):
 
 
 class VerboseSlugRelatedField(serializers.SlugRelatedField):
+    """SlugRelatedField listing the possible slugs when the one provided does not exist"""
+
     def to_internal_value(self, data):
+        vocabulary = vocabularies.get_vocabulary(self.get_queryset(), self.slug_field)
+        if vocabulary is not None and isinstance(data, (str, int)):
+            instance = vocabulary.get(self.slug_field, data)
+            if instance is None:
+                self.fail_with_choices(data, vocabulary.get_slugs())
+            return instance
         try:
             return self.get_queryset().get(**{self.slug_field: data})
         except ObjectDoesNotExist:
-            try:
-                self.fail('does_not_exist', slug_name=self.slug_field, value=smart_str(data))
-            except ValidationError as e:
-                detail = str(e)
-                try:
-                    detail = e.detail.pop()
-                except IndexError:
-                    pass
-                detail += " Choices are :" + ", ".join(self.get_queryset().values_list(self.slug_field, flat=True))
-                raise ValidationError(detail=detail)
+            self.fail_with_choices(data, self.get_queryset().values_list(self.slug_field, flat=True))
         except (TypeError, ValueError):
             self.fail('invalid')
 
+    def fail_with_choices(self, data, choices):
+        try:
+            self.fail('does_not_exist', slug_name=self.slug_field, value=smart_str(data))
+        except ValidationError as e:
+            detail = str(e)
+            try:
+                detail = e.detail.pop()
+            except IndexError:
+                pass
+            detail += " Choices are :" + ", ".join(choices)
+            raise ValidationError(detail=detail)
+
 
 # Model serializer for events.
 class EventSerializer(JsonLDDynamicSerializerMixin, serializers.HyperlinkedModelSerializer):
@@ -958,6 +974,41 @@ class TeamSerializer(JsonLDSerializerMixin, serializers.HyperlinkedModelSerializ
     )
 
 
+class LookupHyperlinkedField(serializers.HyperlinkedRelatedField):
+    """Hyperlink built from the lookup value of the instance, without fetching it"""
+
+    def get_url(self, obj, view_name, request, format):
+        return self.reverse(view_name, kwargs={self.lookup_url_kwarg: obj}, request=request, format=format)
+
+
+class LookupInlineField(LookupHyperlinkedField):
+    """Same representation as the inline serializers, built from the id and the name of the instance"""
+
+    def to_representation(self, value):
+        return dict(id=value['id'], name=value['name'], url=super().to_representation(value['name']))
+
+
+# Serializer for the team directory, same representation as TeamSerializer
+class TeamDirectorySerializer(serializers.ModelSerializer):
+    communities = LookupHyperlinkedField(many=True, read_only=True, view_name='community-detail', lookup_field='name')
+    projects = LookupHyperlinkedField(many=True, read_only=True, view_name='project-detail', lookup_field='name')
+    affiliatedWith = LookupInlineField(many=True, read_only=True, view_name='organisation-detail', lookup_field='name')
+    fundedBy = LookupInlineField(many=True, read_only=True, view_name='organisation-detail', lookup_field='name')
+    platforms = LookupInlineField(many=True, read_only=True, view_name='elixirplatform-detail', lookup_field='name')
+    services = LookupHyperlinkedField(many=True, read_only=True, view_name='service-detail')
+    leaders = LookupHyperlinkedField(many=True, read_only=True, view_name='userprofile-detail')
+    deputies = LookupHyperlinkedField(many=True, read_only=True, view_name='userprofile-detail')
+    scientificLeaders = LookupHyperlinkedField(many=True, read_only=True, view_name='userprofile-detail')
+    technicalLeaders = LookupHyperlinkedField(many=True, read_only=True, view_name='userprofile-detail')
+    members = LookupHyperlinkedField(many=True, read_only=True, view_name='userprofile-detail')
+    maintainers = LookupHyperlinkedField(many=True, read_only=True, view_name='userprofile-detail')
+    is_active = serializers.BooleanField()
+
+    class Meta:
+        model = models.TeamDirectory
+        fields = TeamSerializer.Meta.fields
+
+
 # Model serializer for service
 class ServiceSerializer(serializers.HyperlinkedModelSerializer):
     class Meta:
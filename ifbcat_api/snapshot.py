@@ -0,0 +1,259 @@
+"""
+Optional in-process snapshot of the public catalog, serving the anonymous GET requests of the main viewsets without
+any database access. For each viewset it holds the representation of all the instances an anonymous user can list,
+indexed by pk and by lookup value, and the adjacency of the relations the filters of the viewset are about.
+
+A snapshot is tied to the catalog version, a key of the cache changed as soon as an instance of the catalog is saved
+or deleted, and again once the transaction writing it is committed, so a snapshot built in between from the data not
+committed yet is not kept. It is also built again after CATALOG_SNAPSHOT_MAX_AGE seconds, as some representations
+depend on the current date (status of the events, activity of the teams). When the version changes or the snapshot is
+too old, it is built again in a background thread, and until it is ready the requests are answered with the ORM, as are
+all the requests the snapshot cannot answer (search, ordering, filters other than on a relation, browsable api, ...).
+
+There is a snapshot per host of ALLOWED_HOSTS, the urls of the representations being absolute, the requests to the
+other hosts (when ALLOWED_HOSTS has wildcards) are answered with the ORM.
+
+It is enabled with CATALOG_SNAPSHOT_ENABLED, and only used with a cache shared by the processes, otherwise the writes of
+the other processes (the other web workers, the huey consumer, ...) would not change the version seen by this one.
+"""
+
+import copy
+import json
+import logging
+import threading
+import time
+import uuid
+from types import MappingProxyType
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.http import QueryDict
+from django_filters import ModelChoiceFilter, ModelMultipleChoiceFilter
+from django_filters.rest_framework import DjangoFilterBackend
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.response import Response
+
+from ifbcat_api.misc import connect_to_catalog, is_cache_shared
+
+logger = logging.getLogger(__name__)
+
+__VERSION_KEY = "catalog-snapshot-version"
+
+# query parameters that do not change the instances listed
+NEUTRAL_PARAMETERS = {'format', 'limit', 'offset'}
+
+
+def get_catalog_version():
+    version = cache.get(__VERSION_KEY)
+    if version is None:
+        version = uuid.uuid4().hex
+        cache.add(__VERSION_KEY, version, None)
+    return version
+
+
+def forget_catalog_version():
+    cache.delete(__VERSION_KEY)
+
+
+def is_written_in_transaction():
+    return any(func is forget_catalog_version for _, func, _ in transaction.get_connection().run_on_commit)
+
+
+def forget_catalog_version_on_write(sender, update_fields=None, **kwargs):
+    if update_fields is not None and set(update_fields) <= {'last_login'}:
+        # a user logging in does not change the catalog
+        return
+    forget_catalog_version()
+    # again once committed, a snapshot may have been built meanwhile under the new version without the write
+    if not is_written_in_transaction():
+        transaction.on_commit(forget_catalog_version)
+
+
+def connect_receivers():
+    connect_to_catalog(forget_catalog_version_on_write, post_save, post_delete, m2m_changed)
+
+
+class CatalogSnapshot:
+    """Immutable representation of the instances of a viewset, for one catalog version"""
+
+    def __init__(self, version, items, lookups, adjacency):
+        self.version = version
+        self.built_at = time.monotonic()
+        self.items = tuple(items)
+        self.by_pk = MappingProxyType({item['pk']: i for i, item in enumerate(self.items)})
+        self.by_lookup = MappingProxyType({lookup: i for i, lookup in enumerate(lookups)})
+        self.adjacency = MappingProxyType(
+            {
+                name: MappingProxyType({value: frozenset(pks) for value, pks in values.items()})
+                for name, values in adjacency.items()
+            }
+        )
+
+    def is_fresh(self, version):
+        return self.version == version and time.monotonic() - self.built_at < settings.CATALOG_SNAPSHOT_MAX_AGE
+
+    def get(self, lookup):
+        index = self.by_lookup.get(lookup)
+        return None if index is None else self.items[index]['data']
+
+    def filter(self, params):
+        """
+        Representation of the instances matching all the filters of params, any of the values provided for each of
+        them, or None if a value is not in the snapshot, as it can be invalid.
+        """
+        pks = None
+        for name, values in params.items():
+            matching = set()
+            for value in values:
+                if value not in self.adjacency[name]:
+                    return None
+                matching |= self.adjacency[name][value]
+            pks = matching if pks is None else pks & matching
+        if pks is None:
+            return [item['data'] for item in self.items]
+        return [item['data'] for item in self.items if item['pk'] in pks]
+
+
+def get_relation_filters(view):
+    """The filters of the view on a relation of the model, with the field of the related model they compare"""
+    for backend in view.filter_backends:
+        if issubclass(backend, DjangoFilterBackend):
+            filterset_class = backend().get_filterset_class(view, view.get_queryset())
+            break
+    else:
+        filterset_class = None
+    filters = dict()
+    for name, f in getattr(filterset_class, 'base_filters', dict()).items():
+        if not isinstance(f, (ModelChoiceFilter, ModelMultipleChoiceFilter)):
+            continue
+        if f.method is not None or f.lookup_expr != 'exact' or getattr(f, 'conjoined', False):
+            continue
+        filters[name] = (f.field_name, f.extra.get('to_field_name') or 'pk')
+    return filters
+
+
+class CatalogSnapshots:
+    """The snapshots of the process, by viewset and by url prefix, and their builds in progress"""
+
+    def __init__(self):
+        self.snapshots = dict()
+        self.building = set()
+        self.lock = threading.Lock()
+
+    def get(self, view, request):
+        host = request.get_host()
+        if host not in settings.ALLOWED_HOSTS:
+            # matched by a wildcard, there would be no bound to the number of snapshots
+            return None
+        key = (view.get_snapshot_name(), request.scheme, host, request.query_params.get('format'))
+        version = get_catalog_version()
+        snapshot = self.snapshots.get(key)
+        if snapshot is not None and snapshot.is_fresh(version):
+            return snapshot
+        with self.lock:
+            if (key, version) in self.building:
+                return None
+            self.building.add((key, version))
+        build_request = get_build_request(request)
+        if settings.CATALOG_SNAPSHOT_IN_BACKGROUND:
+            threading.Thread(target=self.build, args=(key, version, type(view), build_request), daemon=True).start()
+            return None
+        return self.build(key, version, type(view), build_request)
+
+    def build(self, key, version, view_class, request):
+        try:
+            snapshot = build_snapshot(view_class, request, version)
+            self.snapshots[key] = snapshot
+            return snapshot
+        except Exception:
+            logger.exception(f"Could not build the catalog snapshot of {view_class.__name__}")
+        finally:
+            with self.lock:
+                self.building.discard((key, version))
+            if settings.CATALOG_SNAPSHOT_IN_BACKGROUND:
+                connection.close()
+
+
+def get_build_request(request):
+    """Anonymous GET request with the same url prefix and format than request, to build the representation"""
+    build_request = copy.copy(request._request)
+    build_request.method = 'GET'
+    build_request.GET = QueryDict(mutable=True)
+    if 'format' in request.query_params:
+        build_request.GET['format'] = request.query_params['format']
+    build_request.user = AnonymousUser()
+    return build_request
+
+
+def build_snapshot(view_class, build_request, version):
+    view = view_class(action='list', format_kwarg=None, args=(), kwargs={})
+    view.request = Request(build_request)
+    view.request.user = build_request.user
+    queryset = view.filter_queryset(view.get_queryset())
+    instances = list(queryset)
+    data = json.loads(JSONRenderer().render(view.get_serializer(instances, many=True).data))
+    items = [dict(pk=instance.pk, data=d) for instance, d in zip(instances, data)]
+    lookups = [str(getattr(instance, view.lookup_field)) for instance in instances]
+    pks = [instance.pk for instance in instances]
+    adjacency = dict()
+    for name, (field_name, to_field_name) in get_relation_filters(view).items():
+        values = adjacency.setdefault(name, dict())
+        for pk, value in (
+            queryset.model._default_manager.filter(pk__in=pks)
+            .filter(**{f'{field_name}__isnull': False})
+            .values_list('pk', f'{field_name}__{to_field_name}')
+        ):
+            values.setdefault(str(value), set()).add(pk)
+    return CatalogSnapshot(version, items, lookups, adjacency)
+
+
+snapshots = CatalogSnapshots()
+
+
+class CatalogSnapshotMixin:
+    """
+    Serve the anonymous list and retrieve requests rendered in JSON from the catalog snapshot when it can answer them
+    """
+
+    def get_snapshot_name(self):
+        return type(self).__name__
+
+    def get_snapshot(self, request):
+        if not settings.CATALOG_SNAPSHOT_ENABLED or request.method != 'GET' or request.user.is_authenticated:
+            return None
+        if not is_cache_shared():
+            return None
+        if type(request.accepted_renderer) is not JSONRenderer:
+            return None
+        return snapshots.get(self, request)
+
+    def get_snapshot_list_response(self, request):
+        snapshot = self.get_snapshot(request)
+        if snapshot is None:
+            return None
+        params = {k: request.query_params.getlist(k) for k in request.query_params if k not in NEUTRAL_PARAMETERS}
+        if not set(params) <= set(snapshot.adjacency):
+            return None
+        data = snapshot.filter(params)
+        if data is None:
+            return None
+        page = self.paginate_queryset(data)
+        if page is not None:
+            return self.get_paginated_response(page)
+        return Response(data)
+
+    def list(self, request, *args, **kwargs):
+        return self.get_snapshot_list_response(request) or super().list(request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        if hasattr(self, 'lookup_fields') or set(kwargs) != {self.lookup_url_kwarg or self.lookup_field}:
+            return super().retrieve(request, *args, **kwargs)
+        snapshot = self.get_snapshot(request)
+        data = None if snapshot is None else snapshot.get(kwargs[self.lookup_url_kwarg or self.lookup_field])
+        if data is None:
+            return super().retrieve(request, *args, **kwargs)
+        return Response(data)
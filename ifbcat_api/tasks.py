@@ -1,22 +1,316 @@
+import collections
+import contextlib
+import datetime
+import hashlib
 import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait
 
 import huey.contrib.djhuey
+import requests
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from tqdm import tqdm
 
-from ifbcat_api import models
+from ifbcat_api import http_client, misc, models, pubmed, warm_caches
+from ifbcat_api.misc import BibliographicalEntryNotFound
 
 logger = logging.getLogger(__name__)
 
+# seconds during which an identifier whose enrichment is queued is not queued again
+ENRICHMENT_LOCK_TIMEOUT = 600
+
+# seconds during which a refresh of the team directory queued is not queued again, in case the consumer is down
+TEAM_DIRECTORY_LOCK_TIMEOUT = 3600
+__TEAM_DIRECTORY_REFRESH_KEY = "team-directory-refresh-queued"
+
+# DOIs refreshed written at once
+DOI_REFRESH_BATCH_SIZE = 500
+DOI_FIELDS = ['title', 'journal_name', 'authors_list', 'biblio_year', 'refreshed_at']
+
 
 @huey.contrib.djhuey.periodic_task(huey.crontab(minute='0', hour='6', day='1'))
 def update_tools_periodic_task():
-    update_tools()
+    report = update_tools(progress=False)
+    http_client.log_metrics()
+    logger.info(", ".join(f"{len(biotools_ids)} tools {outcome}" for outcome, biotools_ids in report.items()))
+    if report['failed']:
+        logger.warning(f"Could not update the tools {', '.join(report['failed'])}")
+
+
+def read_checkpoint(checkpoint):
+    """The biotoolsIDs of the tools done by an interrupted update, if it progressed recently enough to be resumed"""
+    try:
+        if time.time() - os.path.getmtime(checkpoint) > settings.UPDATE_TOOLS_CHECKPOINT_MAX_AGE:
+            return set()
+        with open(checkpoint) as f:
+            return {line.strip() for line in f if line.strip()}
+    except OSError:
+        return set()
+
+
+def is_unchanged(tool, entry):
+    """Whether the entry of tool did not change in bio.tools since the tool was updated"""
+    return tool.last_update is not None and parse_datetime(entry.get('lastUpdate') or '') == tool.last_update
+
+
+def update_tool(tool, entry, force=False, dois=None):
+    """
+    Update tool with its entry in bio.tools, and return whether it was updated, unchanged or failed
+
+    :param dois: the DOIs of the PMIDs and PMCIDs already resolved
+    """
+    with transaction.atomic():
+        entry = tool.check_json_from_biotool(entry)
+        if entry is None:
+            return 'failed'
+        if not force and is_unchanged(tool, entry):
+            return 'unchanged'
+        tool.update_information_from_json(entry, dois)
+    return 'updated'
+
+
+def update_tools(force=False, workers=None, checkpoint=None, progress=True):
+    """
+    Update the tools from bio.tools: their entries are fetched by a pool of threads sharing the http client, and saved
+    one by one as they arrive. The PMIDs and PMCIDs of the entries fetched are resolved together. A tool failing is
+    reported and the others are still updated. The tools done are appended to the checkpoint, so an interrupted update
+    is resumed where it stopped.
+
+    :param force: also update the tools whose entry did not change in bio.tools since their last update
+    :param workers: number of entries fetched at once, UPDATE_TOOLS_WORKERS by default
+    :param checkpoint: file of the tools done, UPDATE_TOOLS_CHECKPOINT by default, no checkpoint if empty
+    :return: the biotoolsIDs of the tools updated, unchanged, failed and resumed, i.e. done by the interrupted update
+    """
+    workers = workers or settings.UPDATE_TOOLS_WORKERS
+    checkpoint = settings.UPDATE_TOOLS_CHECKPOINT if checkpoint is None else checkpoint
+    done = read_checkpoint(checkpoint) if checkpoint else set()
+    report = dict(updated=[], unchanged=[], failed=[], resumed=[])
+    tools = []
+    for tool in models.Tool.objects.exclude(biotoolsID='').order_by('pk'):
+        if tool.biotoolsID in done:
+            report['resumed'].append(tool.biotoolsID)
+        else:
+            tools.append(tool)
 
+    dois, resolved = dict(), set()
 
-def update_tools():
-    for tool in tqdm(models.Tool.objects.exclude(biotoolsID='')):
+    def resolve_dois(current):
+        """
+        Resolve at once the PMIDs and PMCIDs of the entries fetched, and to update, which are not resolved yet: the one
+        of current, the tool being saved and its future, and the ones still in fetching
+        """
+        ids = []
+        for tool, future in [current, *fetching]:
+            if tool.pk in resolved or not future.done() or future.exception() is not None:
+                continue
+            resolved.add(tool.pk)
+            entry = future.result()
+            if isinstance(entry, dict) and 'publication' in entry and (force or not is_unchanged(tool, entry)):
+                ids += [i for i in models.Tool.get_pubmed_ids_from_json(entry) if str(i).strip() not in dois]
         try:
-            tool.update_information_from_biotool()
-        except Exception as e:
-            logger.error(f'Failed with tool {tool}')
-            break
+            dois.update(pubmed.get_dois(ids))
+        except Exception:
+            # resolved again tool by tool
+            logger.exception("Could not resolve the DOIs of the publications")
+
+    def save(tool, future):
+        if tool.pk not in resolved:
+            # with the entries fetched meanwhile
+            wait([future])
+            resolve_dois((tool, future))
+        try:
+            outcome = update_tool(tool, future.result(), force=force, dois=dois)
+        except Exception:
+            logger.exception(f"Could not update tool {tool.biotoolsID} from bio.tools")
+            outcome = 'failed'
+        report[outcome].append(tool.biotoolsID)
+        if done_file and outcome != 'failed':
+            done_file.write(f"{tool.biotoolsID}\n")
+            done_file.flush()
+        progress_bar.update()
+
+    with contextlib.ExitStack() as stack:
+        done_file = stack.enter_context(open(checkpoint, 'a' if done else 'w')) if checkpoint else None
+        executor = stack.enter_context(ThreadPoolExecutor(max_workers=workers))
+        progress_bar = stack.enter_context(tqdm(total=len(tools), disable=not progress))
+        # at most two entries per worker are waiting to be saved
+        fetching = collections.deque()
+        for tool in tools:
+            fetching.append((tool, executor.submit(tool.request_json_from_biotool)))
+            if len(fetching) >= 2 * workers:
+                save(*fetching.popleft())
+        while fetching:
+            save(*fetching.popleft())
+    if checkpoint:
+        os.remove(checkpoint)
+    return report
+
+
+@huey.contrib.djhuey.periodic_task(huey.crontab(minute='0', hour='5', day_of_week='0'))
+def refresh_dois_periodic_task():
+    report = refresh_dois(progress=False)
+    http_client.log_metrics()
+    logger.info(", ".join(f"{len(dois)} DOIs {outcome.replace('_', ' ')}" for outcome, dois in report.items()))
+
+
+def get_stale_dois(max_age=None):
+    """The DOIs never refreshed, or refreshed more than max_age seconds ago, DOI_REFRESH_MAX_AGE by default"""
+    max_age = settings.DOI_REFRESH_MAX_AGE if max_age is None else max_age
+    return models.Doi.objects.filter(
+        Q(refreshed_at__isnull=True) | Q(refreshed_at__lt=timezone.now() - datetime.timedelta(seconds=max_age))
+    )
+
+
+def refresh_dois(dois=None, workers=None, progress=True):
+    """
+    Refresh the metadata of the DOIs from doi.org: they are fetched and parsed by a pool of threads sharing the http
+    client, regardless of the HTTP cache which is updated, and written back by batches with bulk_update. The DOIs not
+    found are not fetched again until stale.
+
+    :param dois: the DOIs to refresh, the stale ones by default, cf get_stale_dois()
+    :param workers: number of DOIs fetched at once, DOI_REFRESH_WORKERS by default
+    :return: the DOIs refreshed, not found and failed
+    """
+    dois = list(get_stale_dois() if dois is None else dois)
+    workers = workers or settings.DOI_REFRESH_WORKERS
+    report = dict(refreshed=[], not_found=[], failed=[])
+    written = []
+
+    def write():
+        with transaction.atomic():
+            models.Doi.objects.bulk_update(written, DOI_FIELDS)
+            misc.send_post_save(models.Doi, written, created=False, update_fields=DOI_FIELDS)
+        written.clear()
+
+    with ThreadPoolExecutor(max_workers=workers) as executor, tqdm(total=len(dois), disable=not progress) as bar:
+        futures = {executor.submit(misc.get_doi_info.refresh, str(doi.doi)): doi for doi in dois}
+        for future in as_completed(futures):
+            doi = futures[future]
+            bar.update()
+            try:
+                doi.set_info(future.result())
+                report['refreshed'].append(doi.doi)
+            except BibliographicalEntryNotFound:
+                doi.refreshed_at = timezone.now()
+                report['not_found'].append(doi.doi)
+            except requests.RequestException as e:
+                logger.warning(f"Error while fetching {doi.doi}: {e}")
+                report['failed'].append(doi.doi)
+                continue
+            except Exception:
+                logger.exception(f"Could not refresh doi {doi.doi}")
+                report['failed'].append(doi.doi)
+                continue
+            written.append(doi)
+            if len(written) >= DOI_REFRESH_BATCH_SIZE:
+                write()
+    write()
+    return report
+
+
+@huey.contrib.djhuey.task()
+def warm_caches_task():
+    for url, status, duration in warm_caches.warm_caches():
+        logger.info(f"Warmed {url} in {duration:.3f}s ({status})")
+
+
+@huey.contrib.djhuey.on_startup()
+def warm_caches_on_startup():
+    if not settings.WARM_CACHES_ON_STARTUP:
+        return
+    if not misc.is_cache_shared():
+        # the caches of the consumer would be filled, not the ones of the web workers
+        logger.info("Caches not warmed on startup, the cache is not shared with the web workers")
+        return
+    warm_caches_task()
+
+
+def queue_team_directory_refresh():
+    """Refresh the team directory in TEAM_DIRECTORY_REFRESH_DELAY seconds, unless a refresh is already queued"""
+    if cache.add(__TEAM_DIRECTORY_REFRESH_KEY, True, TEAM_DIRECTORY_LOCK_TIMEOUT):
+        refresh_team_directory_task.schedule(delay=settings.TEAM_DIRECTORY_REFRESH_DELAY)
+
+
+@huey.contrib.djhuey.db_task()
+def refresh_team_directory_task():
+    # the writes committed from now on are not in the refresh, they queue another one
+    cache.delete(__TEAM_DIRECTORY_REFRESH_KEY)
+    models.refresh_team_directory()
+
+
+def get_enrichment_key(task, identifier):
+    return f"enrichment-{task.func.__name__}-{hashlib.md5(str(identifier).encode()).hexdigest()}"
+
+
+class PendingEnrichment:
+    """The identifiers written by the current transaction, enriched by a single task once it is committed"""
+
+    def __init__(self, task):
+        self.task = task
+        self.identifiers = dict()
+
+    def __call__(self):
+        """Queue the task for the identifiers which are not already queued, and return them"""
+        identifiers = [
+            identifier
+            for identifier in self.identifiers
+            if cache.add(get_enrichment_key(self.task, identifier), True, ENRICHMENT_LOCK_TIMEOUT)
+        ]
+        if identifiers:
+            self.task(identifiers)
+        return identifiers
+
+
+def schedule_enrichment(task, identifier):
+    """Enrich the instance identified with task once the current transaction is committed, with the others written"""
+    for _, func, _ in transaction.get_connection().run_on_commit:
+        if isinstance(func, PendingEnrichment) and func.task is task:
+            func.identifiers[identifier] = None
+            return
+    pending = PendingEnrichment(task)
+    pending.identifiers[identifier] = None
+    transaction.on_commit(pending, robust=True)
+
+
+def release_enrichment(task, identifiers):
+    cache.delete_many([get_enrichment_key(task, identifier) for identifier in identifiers])
+
+
+@huey.contrib.djhuey.db_task()
+def enrich_dois_task(dois):
+    try:
+        refresh_dois(models.Doi.objects.filter(Q(title__isnull=True) | Q(title=''), doi__in=dois), progress=False)
+    finally:
+        release_enrichment(enrich_dois_task, dois)
+
+
+@huey.contrib.djhuey.db_task()
+def enrich_topics_task(uris):
+    try:
+        for topic in models.Topic.objects.filter(uri__in=uris, label=''):
+            try:
+                topic.update_information_from_edam()
+            except Exception:
+                logger.exception(f"Could not update topic {topic.uri} from EDAM")
+    finally:
+        release_enrichment(enrich_topics_task, uris)
+
+
+@huey.contrib.djhuey.db_task()
+def enrich_tools_task(biotools_ids):
+    try:
+        for tool in models.Tool.objects.filter(biotoolsID__in=biotools_ids):
+            try:
+                entry = tool.fetch_json_from_biotool()
+                if entry:
+                    tool.update_information_from_json(entry)
+            except Exception:
+                logger.exception(f"Could not update tool {tool.biotoolsID} from bio.tools")
+    finally:
+        release_enrichment(enrich_tools_task, biotools_ids)
@@ -0,0 +1,78 @@
+import tempfile
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, RequestFactory, override_settings
+from rest_framework import exceptions
+from rest_framework.authtoken.models import Token
+
+from ifbcat_api import authentication
+
+
+class CachedAuthenticationTestCase(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        # the users and tokens are only cached with a cache shared by the processes
+        settings = override_settings(
+            CACHES={
+                'default': {
+                    'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+                    'LOCATION': directory.name,
+                }
+            }
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.user = get_user_model().objects.create_user(email="a@ifb.fr", firstname="a", lastname="a", password="p")
+        self.token = Token.objects.create(user=self.user)
+
+    def authenticate(self):
+        request = RequestFactory().get('/', HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        return authentication.CachedTokenAuthentication().authenticate(request)
+
+    def test_token_cached(self):
+        self.assertEqual(self.authenticate()[0], self.user)
+        with self.assertNumQueries(0):
+            user, token = self.authenticate()
+        self.assertEqual(user, self.user)
+        self.assertEqual(token.key, self.token.key)
+
+    def test_token_deleted(self):
+        self.authenticate()
+        self.token.delete()
+        self.assertRaises(exceptions.AuthenticationFailed, self.authenticate)
+
+    def test_user_deactivated(self):
+        self.authenticate()
+        self.user.is_active = False
+        self.user.save()
+        self.assertRaises(exceptions.AuthenticationFailed, self.authenticate)
+
+    def test_users_deactivated(self):
+        self.authenticate()
+        get_user_model().objects.filter(pk=self.user.pk).update(is_active=False)
+        self.assertRaises(exceptions.AuthenticationFailed, self.authenticate)
+
+    def test_cache_of_the_process(self):
+        with override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}):
+            self.authenticate()
+            with self.assertNumQueries(2):
+                self.authenticate()
+            self.assertIsNone(cache.get(authentication._get_token_cache_key(self.token.key)))
+            self.assertIsNone(cache.get(authentication._get_user_cache_key(self.user.pk)))
+
+    def test_failed_login(self):
+        with mock.patch.object(get_user_model(), 'set_password', autospec=True) as set_password:
+            self.assertFalse(self.client.login(email="unknown@ifb.fr", password="p"))
+        # the password hasher is run once to mitigate the timing attacks, by the single backend
+        set_password.assert_called_once()
+
+    def test_session(self):
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get('/api/userprofile/').status_code, 200)
+        self.assertIsNotNone(cache.get(authentication._get_user_cache_key(self.user.pk)))
+        self.assertEqual(authentication.CachedModelBackend().get_user(self.user.pk), self.user)
+        self.user.delete()
+        self.assertIsNone(authentication.CachedModelBackend().get_user(self.user.pk))
@@ -0,0 +1,68 @@
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db.models.signals import pre_delete
+from django.test import TestCase
+
+from ifbcat_api import models
+
+
+class CountersTestCase(TestCase):
+    def setUp(self):
+        self.team = models.Team.objects.create(name="team")
+        self.keyword = models.Keyword.objects.create(keyword="keyword")
+        self.topic = models.Topic.objects.create(uri="http://edamontology.org/topic_0091", label="Bioinformatics")
+        self.users = [
+            get_user_model().objects.create(email=f"u{i}@ifb.fr", firstname="u", lastname="u") for i in range(3)
+        ]
+
+    def get_members_count(self):
+        self.team.refresh_from_db()
+        return self.team.members_count
+
+    def get_usage_count(self, o):
+        o.refresh_from_db()
+        return o.usage_count
+
+    def test_members_count(self):
+        self.team.members.add(*self.users)
+        self.team.leaders.add(self.users[0])
+        self.assertEqual(self.get_members_count(), 3)
+        self.team.members.remove(self.users[0])
+        self.assertEqual(self.get_members_count(), 3)
+        self.team.members.clear()
+        self.assertEqual(self.get_members_count(), 1)
+        self.users[1].teamsDeputies.add(self.team)
+        self.assertEqual(self.get_members_count(), 2)
+        self.users[1].teamsDeputies.clear()
+        self.assertEqual(self.get_members_count(), 1)
+        self.users[0].delete()
+        self.assertEqual(self.get_members_count(), 0)
+
+    def test_usage_count(self):
+        event = models.Event.objects.create(name="event")
+        event.keywords.add(self.keyword)
+        event.topics.add(self.topic)
+        self.team.keywords.add(self.keyword)
+        self.assertEqual(self.get_usage_count(self.keyword), 2)
+        self.assertEqual(self.get_usage_count(self.topic), 1)
+        self.keyword.teamsKeywords.remove(self.team)
+        self.assertEqual(self.get_usage_count(self.keyword), 1)
+        event.keywords.clear()
+        self.assertEqual(self.get_usage_count(self.keyword), 0)
+        event.delete()
+        self.assertEqual(self.get_usage_count(self.topic), 0)
+
+    def test_rebuild(self):
+        self.team.members.add(*self.users)
+        self.team.keywords.add(self.keyword)
+        models.Team.objects.update(members_count=0)
+        models.Keyword.objects.update(usage_count=42)
+        call_command('rebuild_counters')
+        self.assertEqual(self.get_members_count(), 3)
+        self.assertEqual(self.get_usage_count(self.keyword), 1)
+
+    def test_connected_to_referencing_models_only(self):
+        self.assertTrue(pre_delete.has_listeners(models.Event))
+        self.assertTrue(pre_delete.has_listeners(get_user_model()))
+        # deleted in bulk, e.g. when the closure is rebuilt
+        self.assertFalse(pre_delete.has_listeners(models.TopicClosure))
@@ -0,0 +1,109 @@
+import io
+import os
+import tempfile
+
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+
+from ifbcat_api import edam, models, tasks
+from ifbcat_api.validators import validate_edam_topic
+
+OWL = """<?xml version="1.0"?>
+<rdf:RDF xmlns="http://edamontology.org/"
+     xmlns:owl="http://www.w3.org/2002/07/owl#"
+     xmlns:rdf="http://www.w3.org/1999/02/22-rdf-syntax-ns#"
+     xmlns:rdfs="http://www.w3.org/2000/01/rdf-schema#"
+     xmlns:oboInOwl="http://www.geneontology.org/formats/oboInOwl#">
+    <owl:Ontology rdf:about="http://edamontology.org">
+        <owl:versionInfo>1.25</owl:versionInfo>
+    </owl:Ontology>
+    <owl:Class rdf:about="http://edamontology.org/topic_0003">
+        <rdfs:label>Topic</rdfs:label>
+        <oboInOwl:hasDefinition>A category denoting a rather broad domain or field of interest.</oboInOwl:hasDefinition>
+    </owl:Class>
+    <owl:Class rdf:about="http://edamontology.org/topic_0091">
+        <rdfs:subClassOf rdf:resource="http://edamontology.org/topic_0003"/>
+        <rdfs:subClassOf>
+            <owl:Restriction>
+                <owl:onProperty rdf:resource="http://edamontology.org/has_topic"/>
+            </owl:Restriction>
+        </rdfs:subClassOf>
+        <rdfs:label>Bioinformatics</rdfs:label>
+        <oboInOwl:hasDefinition>The application of computer science to biology.</oboInOwl:hasDefinition>
+        <oboInOwl:hasExactSynonym>Computational biology</oboInOwl:hasExactSynonym>
+    </owl:Class>
+    <owl:Class rdf:about="http://edamontology.org/operation_0004">
+        <rdfs:label>Operation</rdfs:label>
+    </owl:Class>
+</rdf:RDF>
+"""
+
+TSV = (
+    "Class ID\tPreferred Label\tSynonyms\tDefinitions\tObsolete\tParents\n"
+    "http://edamontology.org/topic_0003\tTopic\t\tA broad domain.\tFALSE\t\n"
+    "http://edamontology.org/topic_0091\tBioinformatics\tComputational biology|Bio-informatics\tThe application."
+    "\tFALSE\thttp://edamontology.org/topic_0003\n"
+    "http://edamontology.org/operation_0004\tOperation\t\t\tFALSE\t\n"
+)
+
+
+class EdamTestCase(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        settings = override_settings(EDAM_INDEX=os.path.join(self.directory, 'edam.json'))
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def write(self, name, content):
+        path = os.path.join(self.directory, name)
+        with open(path, 'w') as f:
+            f.write(content)
+        return path
+
+    def test_read_release(self):
+        terms, version = edam.read_release(self.write('EDAM.owl', OWL))
+        self.assertEqual(version, "1.25")
+        self.assertEqual(sorted(terms), ["http://edamontology.org/topic_0003", "http://edamontology.org/topic_0091"])
+        bioinformatics = terms["http://edamontology.org/topic_0091"]
+        self.assertEqual(bioinformatics.synonyms, ["Computational biology"])
+        self.assertEqual(bioinformatics.parents, ["http://edamontology.org/topic_0003"])
+
+        terms, version = edam.read_release(self.write('EDAM.tsv', TSV))
+        self.assertEqual(version, "EDAM.tsv")
+        bioinformatics = terms["http://edamontology.org/topic_0091"]
+        self.assertEqual(bioinformatics.synonyms, ["Computational biology", "Bio-informatics"])
+        self.assertEqual(bioinformatics.parents, ["http://edamontology.org/topic_0003"])
+
+    def test_load_edam(self):
+        models.Topic.objects.create(uri="http://edamontology.org/topic_0091")
+        models.Topic.objects.create(uri="http://edamontology.org/topic_0622")
+        out = io.StringIO()
+        call_command('load_edam', self.write('EDAM.owl', OWL), stdout=out)
+        self.assertIn("2 topics of EDAM 1.25 indexed", out.getvalue())
+        self.assertIn("1 topics updated, 1 missing in EDAM", out.getvalue())
+        topic = models.Topic.objects.get(uri="http://edamontology.org/topic_0091")
+        self.assertEqual(topic.label, "Bioinformatics")
+        self.assertEqual(topic.synonyms, ["Computational biology"])
+
+        # filled from the index once created, without requesting EBI OLS
+        connection.run_on_commit.clear()
+        topic = models.Topic.objects.create(uri="http://edamontology.org/topic_0003")
+        self.assertEqual(topic.label, "Topic")
+        self.assertFalse(
+            any(getattr(f, 'task', None) is tasks.enrich_topics_task for _, f, _ in connection.run_on_commit)
+        )
+
+        validate_edam_topic("http://edamontology.org/topic_0003")
+        with self.assertRaises(ValidationError):
+            validate_edam_topic("http://edamontology.org/topic_9999")
+        # kept by the topic already linked, e.g. once obsolete
+        models.Topic.objects.create(uri="http://edamontology.org/topic_9999")
+        validate_edam_topic("http://edamontology.org/topic_9999")
+
+    def test_without_index(self):
+        validate_edam_topic("http://edamontology.org/topic_9999")
+        self.assertIsNone(edam.get_term("http://edamontology.org/topic_0003"))
@@ -0,0 +1,60 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+
+from ifbcat_api import models, tasks
+
+
+class EnrichmentTestCase(TestCase):
+    def tearDown(self):
+        cache.clear()
+
+    def get_pending(self, task):
+        pending = [func for _, func, _ in connection.run_on_commit if getattr(func, 'task', None) is task]
+        self.assertLessEqual(len(pending), 1)
+        return pending[0] if pending else None
+
+    def test_queued_once_committed(self):
+        with self.assertNumQueries(4):
+            models.Doi.objects.create(doi="10.1000/first")
+            models.Doi.objects.create(doi="10.1000/second")
+            models.Topic.objects.create(uri="http://edamontology.org/topic_0003")
+            models.Tool.objects.create(name="tool", biotoolsID="tool")
+        # enriched together by a single task of each kind
+        self.assertEqual(
+            list(self.get_pending(tasks.enrich_dois_task).identifiers), ["10.1000/first", "10.1000/second"]
+        )
+        self.assertEqual(
+            list(self.get_pending(tasks.enrich_topics_task).identifiers), ["http://edamontology.org/topic_0003"]
+        )
+        self.assertEqual(list(self.get_pending(tasks.enrich_tools_task).identifiers), ["tool"])
+        self.assertIsNone(models.Doi.objects.get(doi="10.1000/first").title)
+
+    def test_not_queued_when_filled(self):
+        models.Doi.objects.create(doi="10.1000/filled", title="Title")
+        models.Topic.objects.create(uri="http://edamontology.org/topic_0003", label="Topic")
+        self.assertIsNone(self.get_pending(tasks.enrich_dois_task))
+        self.assertIsNone(self.get_pending(tasks.enrich_topics_task))
+
+    def test_deduplicated(self):
+        pending = tasks.PendingEnrichment(tasks.enrich_dois_task)
+        pending.identifiers["10.1000/queued"] = None
+        cache.add(tasks.get_enrichment_key(tasks.enrich_dois_task, "10.1000/queued"), True)
+        self.assertEqual(pending(), [])
+
+    def test_released_by_task(self):
+        models.Doi.objects.create(doi="10.1000/filled", title="Title")
+        key = tasks.get_enrichment_key(tasks.enrich_dois_task, "10.1000/filled")
+        cache.add(key, True)
+        # already filled, so not fetched
+        tasks.enrich_dois_task.call_local(["10.1000/filled"])
+        self.assertIsNone(cache.get(key))
+        self.assertEqual(models.Doi.objects.get(doi="10.1000/filled").title, "Title")
+
+    def test_run_when_queued(self):
+        # immediate while testing, without any consumer nor queue file
+        models.Doi.objects.create(doi="10.1000/filled", title="Title")
+        key = tasks.get_enrichment_key(tasks.enrich_dois_task, "10.1000/filled")
+        cache.add(key, True)
+        tasks.enrich_dois_task(["10.1000/filled"])
+        self.assertIsNone(cache.get(key))
@@ -0,0 +1,62 @@
+import datetime
+
+from django.test import TestCase
+from django.utils import timezone
+
+from ifbcat_api import models, views
+
+
+class EventStatusTestCase(TestCase):
+    def setUp(self):
+        today = timezone.now().date()
+        day = datetime.timedelta(days=1)
+        dates = [None, today - 2 * day, today, today + 2 * day]
+        i = 0
+        for start_date in dates:
+            for end_date in dates:
+                models.Event.objects.create(name=f"realisation-{i}", start_date=start_date, end_date=end_date)
+                i += 1
+        for opening in dates:
+            for closing in dates:
+                models.Event.objects.create(
+                    name=f"registration-{i}", registration_opening=opening, registration_closing=closing
+                )
+                i += 1
+        self.expected = {
+            (None, None): ("ongoing", "unknown"),
+            (today - 2 * day, None): ("past", "open"),
+            (today - 2 * day, today - 2 * day): ("past", "closed"),
+            (today - 2 * day, today + 2 * day): ("ongoing", "open"),
+            (today, today): ("ongoing", "closed"),
+            (today + 2 * day, None): ("future", "future"),
+        }
+
+    def test_filters_match_annotation(self):
+        annotated = models.Event.annotate_registration_realisation_status()
+        for status in ["future", "past", "ongoing"]:
+            self.assertEqual(
+                set(models.Event.objects.filter(models.Event.get_realisation_status_q(status))),
+                set(annotated.filter(realisation_status=status)),
+                status,
+            )
+        for status in ["future", "open", "unknown", "closed"]:
+            self.assertEqual(
+                set(models.Event.objects.filter(models.Event.get_registration_status_q(status))),
+                set(annotated.filter(registration_status=status)),
+                status,
+            )
+        self.assertEqual(annotated.filter(realisation_status="past").count(), 2)
+
+    def test_statuses(self):
+        annotated = models.Event.annotate_registration_realisation_status()
+        for (a, b), (realisation, registration) in self.expected.items():
+            e = annotated.get(name__startswith="realisation", start_date=a, end_date=b)
+            self.assertEqual(e.realisation_status, realisation, (a, b))
+            e = annotated.get(name__startswith="registration", registration_opening=a, registration_closing=b)
+            self.assertEqual(e.registration_status, registration, (a, b))
+
+    def test_event_filter(self):
+        for status, count in [("open", 3), ("future", 4)]:
+            f = views.EventFilter(data={"registration_status": status}, queryset=models.Event.objects.all())
+            self.assertTrue(f.is_valid())
+            self.assertEqual(f.qs.count(), count, status)
@@ -0,0 +1,57 @@
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.test import TestCase, RequestFactory
+from rest_framework.request import Request
+
+from ifbcat_api import filters, models, views
+from ifbcat_api.filters import DjangoFilterAutoSubsetBackend
+
+
+class AutoSubsetFilterSetTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.used = models.Keyword.objects.create(keyword="used")
+        self.unused = models.Keyword.objects.create(keyword="unused")
+        self.event = models.Event.objects.create(name="event")
+        self.event.keywords.add(self.used)
+
+    def get_request(self, **params):
+        request = RequestFactory().get('/', params)
+        request.user = AnonymousUser()
+        return Request(request)
+
+    def render(self):
+        view = views.EventViewSet(request=self.get_request(), format_kwarg=None, action="list")
+        return DjangoFilterAutoSubsetBackend().to_html(view.request, view.get_queryset(), view)
+
+    def test_no_query_when_filtering(self):
+        with self.assertNumQueries(0):
+            filterset = views.EventFilter(data=self.get_request().query_params, queryset=models.Event.objects.all())
+            self.assertTrue(filterset.is_valid())
+
+    def test_only_used_values_rendered(self):
+        html = self.render()
+        self.assertIn(">used<", html)
+        self.assertNotIn(">unused<", html)
+
+    def test_used_values_cached(self):
+        self.render()
+        filterset = views.EventFilter(data=self.get_request().query_params, queryset=models.Event.objects.all())
+        with self.assertNumQueries(0):
+            filterset.restrict_to_used_values()
+
+    def test_forgotten_on_change(self):
+        self.render()
+        self.event.keywords.add(self.unused)
+        self.assertIn(">unused<", self.render())
+
+    def test_kept_on_login(self):
+        version = filters.get_used_values_version()
+        user = models.UserProfile.objects.create(email="user@example.org", firstname="A", lastname="B")
+        self.assertNotEqual(filters.get_used_values_version(), version)
+        version = filters.get_used_values_version()
+        user.save(update_fields=['last_login'])
+        self.assertEqual(filters.get_used_values_version(), version)
+        # nor when writing the tables derived from the catalog
+        models.RegistryOrganisation.objects.create(ror_id="0495fxg12", name="Institut Pasteur")
+        self.assertEqual(filters.get_used_values_version(), version)
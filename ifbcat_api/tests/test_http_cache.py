@@ -0,0 +1,163 @@
+import io
+import json
+import os
+import sqlite3
+import tempfile
+from unittest import mock
+
+import requests
+from django.core.management import call_command
+from django.test import SimpleTestCase, override_settings
+
+from ifbcat_api import http_cache, http_client
+
+
+def get_response(status_code=200, data=None, headers=None):
+    response = mock.Mock(status_code=status_code, headers=headers or {})
+    response.json.return_value = data
+    return response
+
+
+class HttpCacheTestCase(SimpleTestCase):
+    url = 'https://example.org/api/entry'
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        settings = override_settings(HTTP_CACHE_DIR=self.directory, HTTP_CACHE_TTL=60, HTTP_CACHE_MAX_SIZE=1000)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def get_json(self, *responses, **kwargs):
+        with mock.patch.object(http_client, 'get', side_effect=responses) as get:
+            value = http_cache.get_json(self.url, namespace='test', **kwargs)
+        return value, get
+
+    def test_cached(self):
+        self.assertEqual(self.get_json(get_response(data={"a": 1}))[0], {"a": 1})
+        value, get = self.get_json()
+        self.assertEqual(value, {"a": 1})
+        get.assert_not_called()
+        self.assertEqual(http_cache.get_stats()['test'], dict(miss=1, hit=1, entries=1, size=8))
+
+    def test_errors_not_cached(self):
+        self.assertEqual(self.get_json(get_response(404, {"detail": "Not found."}))[0], {"detail": "Not found."})
+        self.assertEqual(self.get_json(get_response(data={"a": 1}))[0], {"a": 1})
+
+    def test_revalidated(self):
+        self.get_json(get_response(data={"a": 1}, headers={'ETag': '"v1"'}), ttl=0)
+        value, get = self.get_json(get_response(304))
+        self.assertEqual(value, {"a": 1})
+        self.assertEqual(get.call_args.kwargs['headers'], {'If-None-Match': '"v1"'})
+        # fresh again
+        self.assertEqual(self.get_json()[0], {"a": 1})
+
+    def test_expired_served_when_unreachable(self):
+        self.get_json(get_response(data={"a": 1}), ttl=0)
+        self.assertEqual(self.get_json(requests.ConnectionError())[0], {"a": 1})
+        self.assertEqual(self.get_json(get_response(data={"a": 2}))[0], {"a": 2})
+
+    def test_least_recently_used_evicted(self):
+        for i in range(3):
+            self.url = f'https://example.org/api/{i}'
+            self.get_json(get_response(data="x" * 300))
+        self.url = 'https://example.org/api/0'
+        self.get_json()
+        self.url = 'https://example.org/api/3'
+        self.get_json(get_response(data="x" * 300))
+        self.assertEqual(http_cache.get_stats()['test']['eviction'], 2)
+        self.assertLessEqual(http_cache.get_stats()['test']['size'], 1000)
+        self.url = 'https://example.org/api/0'
+        self.get_json()[1].assert_not_called()
+        self.url = 'https://example.org/api/1'
+        self.get_json(get_response(data="x"))[1].assert_called_once()
+
+    def get_total_size(self):
+        connection = http_cache.get_connection()
+        (total,) = connection.execute('SELECT size FROM total').fetchone()
+        (size,) = connection.execute('SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()
+        self.assertEqual(total, size)
+        return total
+
+    def test_total_size(self):
+        self.get_json(get_response(data="x" * 100), ttl=0)
+        self.assertEqual(self.get_total_size(), 102)
+        # replaced
+        self.get_json(get_response(data="x" * 10))
+        self.assertEqual(self.get_total_size(), 12)
+        self.url = 'https://example.org/api/other'
+        self.get_json(get_response(data="x"), ttl=0)
+        self.assertEqual(self.get_total_size(), 15)
+        self.assertEqual(http_cache.purge_expired(), 1)
+        self.assertEqual(self.get_total_size(), 12)
+        http_cache.clear()
+        self.assertEqual(self.get_total_size(), 0)
+
+    def test_total_size_of_previous_database(self):
+        previous = sqlite3.connect(http_cache.get_path())
+        previous.executescript(
+            'CREATE TABLE entries (namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, etag TEXT, '
+            'last_modified TEXT, expires_at REAL NOT NULL, accessed_at REAL NOT NULL, size INTEGER NOT NULL, '
+            'PRIMARY KEY (namespace, key));'
+            "INSERT INTO entries VALUES ('test', 'key', '\"x\"', NULL, NULL, 0, 0, 3);"
+        )
+        previous.close()
+        self.assertEqual(self.get_total_size(), 3)
+        # once only
+        http_cache.get_connection().executescript(http_cache.SCHEMA)
+        self.assertEqual(self.get_total_size(), 3)
+
+    def test_hits_in_batches(self):
+        self.get_json(get_response(data={"a": 1}))
+        connection = http_cache.get_connection()
+        (accessed_at,) = connection.execute('SELECT accessed_at FROM entries').fetchone()
+        changes = connection.total_changes
+        with mock.patch.object(http_cache, 'PENDING_HITS_MAX', 3):
+            self.get_json()
+            self.get_json()
+            # nothing written
+            self.assertEqual(connection.total_changes, changes)
+            self.assertEqual(connection.execute('SELECT accessed_at FROM entries').fetchone(), (accessed_at,))
+            self.get_json()
+        self.assertGreater(connection.execute('SELECT accessed_at FROM entries').fetchone()[0], accessed_at)
+        self.assertEqual(http_cache.get_stats()['test']['hit'], 3)
+        # the pending ones are written with the other writes
+        self.get_json()
+        self.assertEqual(http_cache.get_stats()['test']['hit'], 4)
+
+    def test_legacy_file(self):
+        os.makedirs(os.path.join(self.directory, 'legacy'))
+        with open(os.path.join(self.directory, 'legacy', 'entry.json'), 'w') as f:
+            json.dump({"a": 1}, f)
+        with open(os.path.join(self.directory, 'legacy', 'truncated.json'), 'w') as f:
+            f.write('{"a":')
+        self.assertEqual(self.get_json(legacy_path=os.path.join('legacy', 'entry.json'))[0], {"a": 1})
+        self.url = 'https://example.org/api/truncated'
+        value, _ = self.get_json(get_response(data={"a": 2}), legacy_path=os.path.join('legacy', 'truncated.json'))
+        self.assertEqual(value, {"a": 2})
+
+    def test_memoize(self):
+        calls = []
+
+        @http_cache.memoize()
+        def square(x):
+            calls.append(x)
+            return x * x
+
+        self.assertEqual([square(2), square(2), square(3)], [4, 4, 9])
+        self.assertEqual(calls, [2, 3])
+        # called again, and cached
+        self.assertEqual(square.refresh(2), 4)
+        self.assertEqual(calls, [2, 3, 2])
+        self.assertEqual(square(2), 4)
+        self.assertEqual(calls, [2, 3, 2])
+        self.assertEqual(http_cache.get_stats()['square']['refresh'], 1)
+
+    def test_command(self):
+        self.get_json(get_response(data={"a": 1}))
+        out = io.StringIO()
+        call_command('http_cache', stdout=out)
+        self.assertIn("test: 1 entries, 1 miss, 8 size", out.getvalue())
+        call_command('http_cache', clear=True, stdout=io.StringIO())
+        self.assertEqual(http_cache.get_stats(), dict())
@@ -0,0 +1,57 @@
+import threading
+import time
+from unittest import mock
+
+import requests
+from django.test import SimpleTestCase, override_settings
+
+from ifbcat_api import http_client
+
+
+class HttpClientTestCase(SimpleTestCase):
+    def test_host_settings(self):
+        self.assertEqual(http_client.get_host_settings('bio.tools')[0], 'bio.tools')
+        self.assertEqual(http_client.get_host_settings('dx.doi.org')[0], 'doi.org')
+        self.assertEqual(http_client.get_host_settings('example.org'), ('example.org', dict(concurrency=8)))
+
+    def test_rate(self):
+        limit = http_client.HostLimit(concurrency=5, rate=50)
+        start = time.monotonic()
+        for _ in range(5):
+            with limit.acquire():
+                pass
+        self.assertGreaterEqual(time.monotonic() - start, 4 / 50)
+
+    def test_concurrency(self):
+        limit = http_client.HostLimit(concurrency=2)
+        running, max_running = [], []
+        lock = threading.Lock()
+
+        def run():
+            with limit.acquire():
+                with lock:
+                    running.append(None)
+                    max_running.append(len(running))
+                time.sleep(0.01)
+                with lock:
+                    running.pop()
+
+        threads = [threading.Thread(target=run) for _ in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(max(max_running), 2)
+
+    @override_settings(HTTP_CLIENT_TIMEOUT=5)
+    def test_metrics(self):
+        host = 'metrics.example.org'
+        responses = [mock.Mock(status_code=200), mock.Mock(status_code=503), requests.ConnectionError()]
+        with mock.patch.object(requests.Session, 'request', side_effect=responses) as request:
+            http_client.get(f'https://{host}/a')
+            http_client.get(f'https://{host}/b')
+            with self.assertRaises(requests.ConnectionError):
+                http_client.get(f'https://{host}/c')
+        self.assertEqual(request.call_args.kwargs['timeout'], 5)
+        metrics = http_client.get_metrics()[host]
+        self.assertEqual((metrics['requests'], metrics['errors']), (3, 2))
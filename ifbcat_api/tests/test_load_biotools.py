@@ -0,0 +1,110 @@
+import os
+import tempfile
+from unittest import mock
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from ifbcat_api import edam, models, tasks
+from ifbcat_api.management.commands.load_biotools import Command
+
+
+def get_entry(biotools_id, name=None):
+    return dict(
+        name=name or f"{biotools_id} tool",
+        description="",
+        homepage="https://example.org",
+        biotoolsID=biotools_id,
+        biotoolsCURIE=f"biotools:{biotools_id}",
+        link=[],
+        license="MIT",
+        documentation=[],
+        maturity="Mature",
+        cost="Free of charge",
+        lastUpdate="2024-06-01T12:00:00Z",
+        toolType=["Command-line tool", "Library"],
+        operatingSystem=["Linux"],
+        collectionID=["collection"],
+        publication=[dict(type=["Primary"], doi="10.1000/shared", pmid=None, pmcid=None)],
+        topic=[dict(uri="http://edamontology.org/topic_0003"), dict(uri="http://edamontology.org/topic_3557")],
+        credit=[
+            dict(
+                name="Credited",
+                email=None,
+                url=None,
+                orcidid=None,
+                gridid=None,
+                typeEntity="Person",
+                note=None,
+                typeRole=["Developer"],
+            )
+        ],
+    )
+
+
+class LoadBiotoolsTestCase(TestCase):
+    def setUp(self):
+        self.pages = [
+            dict(count=22, next="?page=2", list=[get_entry(f"first{i}") for i in range(10)]),
+            dict(count=22, next="?page=3", list=[get_entry(f"second{i}") for i in range(10)]),
+            dict(count=22, next=None, list=[get_entry("existing"), get_entry("named", name="Named")]),
+        ]
+        models.Tool.objects.create(name="existing", biotoolsID="existing")
+        models.Tool.objects.create(name="named")
+
+    def get_from_biotools(self, collection_id, page):
+        return self.pages[page - 1]
+
+    def load_biotools(self, **options):
+        with mock.patch.object(Command, 'get_from_biotools', side_effect=self.get_from_biotools):
+            with CaptureQueriesContext(connection) as context:
+                call_command('load_biotools', **options)
+        return context.captured_queries
+
+    def test_load_biotools(self):
+        queries = self.load_biotools()
+        # a handful of queries per page, not per tool
+        self.assertLess(len(queries), 60)
+        self.assertEqual(models.Tool.objects.count(), 22)
+        tool = models.Tool.objects.get(biotoolsID="second3")
+        self.assertEqual(tool.name, "second3 tool")
+        self.assertEqual(sorted(tool.tool_type.values_list('name', flat=True)), ["Command-line tool", "Library"])
+        self.assertEqual(list(tool.operating_system.values_list('name', flat=True)), ["Linux"])
+        self.assertEqual(list(tool.collection.values_list('name', flat=True)), ["collection"])
+        self.assertEqual(list(tool.primary_publication.values_list('doi', flat=True)), ["10.1000/shared"])
+        self.assertEqual(
+            sorted(tool.scientific_topics.values_list('uri', flat=True)),
+            ["http://edamontology.org/topic_0003", "http://edamontology.org/topic_3957"],
+        )
+        self.assertEqual(list(tool.tool_credit.values_list('type_role__name', flat=True)), ["Developer"])
+        self.assertEqual(models.ToolCredit.objects.count(), 1)
+        self.assertEqual(models.Topic.objects.get(uri="http://edamontology.org/topic_0003").usage_count, 21)
+        # the existing tool is left as is, the one with the same name gets its biotoolsID
+        self.assertEqual(models.Tool.objects.get(biotoolsID="existing").name, "existing")
+        self.assertEqual(models.Tool.objects.get(biotoolsID="named").name, "Named")
+
+    def test_limit(self):
+        self.load_biotools(limit=15)
+        self.assertEqual(models.Tool.objects.exclude(name__in=["existing", "named"]).count(), 15)
+
+    def test_topics_from_edam_index(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        with override_settings(EDAM_INDEX=os.path.join(directory.name, 'edam.json')):
+            uri = "http://edamontology.org/topic_0003"
+            edam.write_index({uri: edam.Term(uri, "Topic", "Topic definition", ["Subject"], [], False)}, '1.25')
+            connection.run_on_commit.clear()
+            self.load_biotools()
+            topic = models.Topic.objects.get(uri=uri)
+            self.assertEqual(
+                (topic.label, topic.description, topic.synonyms), ("Topic", "Topic definition", ["Subject"])
+            )
+            # not requested from EBI OLS
+            self.assertFalse(
+                any(
+                    getattr(f, 'task', None) is tasks.enrich_topics_task and uri in f.identifiers
+                    for _, f, _ in connection.run_on_commit
+                )
+            )
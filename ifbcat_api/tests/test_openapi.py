@@ -1,11 +1,53 @@
 import logging
+from unittest import mock
 
+from django.core.cache import cache
 from django.test import TestCase
 from django.urls import reverse
 
+from ifbcat_api import misc, models, schemas
+
 logger = logging.getLogger(__name__)
 
 
 class TestOpenapiWorks(TestCase):
     def test_it(self):
         self.client.get(reverse('openapi-schema') + "?format=openapi-json")
+
+
+class TestOpenapiCached(TestCase):
+    url = reverse('openapi-schema') + "?format=openapi-json"
+
+    def setUp(self):
+        cache.clear()
+
+    def test_cached(self):
+        response = self.client.get(self.url)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(self.url).content, response.content)
+
+    def test_etag(self):
+        etag = self.client.get(self.url)["ETag"]
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        models.Keyword.objects.create(keyword="new")
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_code_deployed(self):
+        etag = self.client.get(self.url)["ETag"]
+        with mock.patch.object(schemas, 'get_code_version', return_value="deployed"):
+            # generated again rather than read from the cache
+            with mock.patch.object(schemas.SchemaGenerator, 'get_schema', return_value={}) as get_schema:
+                response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        get_schema.assert_called_once()
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_code_version(self):
+        misc.get_code_version.cache_clear()
+        self.addCleanup(misc.get_code_version.cache_clear)
+        self.assertEqual(len(misc.get_code_version()), 64)
+        with self.settings(CODE_VERSION="v1"):
+            misc.get_code_version.cache_clear()
+            self.assertEqual(misc.get_code_version(), "v1")
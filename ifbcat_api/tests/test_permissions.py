@@ -0,0 +1,165 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser, Group
+from django.test import TestCase, RequestFactory
+
+from ifbcat_api import models, permissions, business_logic
+
+
+class ReadWriteBySomethingTestCase(TestCase):
+    def setUp(self):
+        self.leader = get_user_model().objects.create(email="leader@ifb.fr", firstname="l", lastname="l")
+        self.other = get_user_model().objects.create(email="other@ifb.fr", firstname="o", lastname="o")
+        self.team = models.Team.objects.create(name="team")
+        self.team.technicalLeaders.add(self.leader)
+        self.service = models.Service.objects.create(
+            team=self.team,
+            domain=models.ServiceDomain.objects.create(name="d"),
+            analysis=models.KindOfAnalysis.objects.create(name="a"),
+            category=models.ServiceCategory.objects.create(name="c"),
+        )
+
+    def get_request(self, user):
+        request = RequestFactory().put('/')
+        request.user = user
+        return request
+
+    def test_leader_in_one_query(self):
+        request = self.get_request(self.leader)
+        with self.assertNumQueries(1):
+            self.assertTrue(permissions.ReadWriteByLeader().has_object_permission(request, None, self.team))
+        with self.assertNumQueries(0):
+            self.assertTrue(permissions.ReadWriteByLeader().has_object_permission(request, None, self.team))
+        with self.assertNumQueries(1):
+            self.assertTrue(permissions.ReadWriteByTeamLeaders().has_object_permission(request, None, self.service))
+
+    def test_not_leader(self):
+        request = self.get_request(self.other)
+        self.assertFalse(permissions.ReadWriteByLeader().has_object_permission(request, None, self.team))
+        self.assertFalse(permissions.ReadWriteByDeputies().has_object_permission(request, None, self.team))
+        self.assertFalse(permissions.ReadWriteByTeamLeaders().has_object_permission(request, None, self.service))
+
+    def test_anonymous(self):
+        request = self.get_request(AnonymousUser())
+        with self.assertNumQueries(0):
+            self.assertFalse(permissions.ReadWriteByLeader().has_object_permission(request, None, self.team))
+
+
+class GroupMembershipTestCase(TestCase):
+    def setUp(self):
+        business_logic.init_business_logic()
+        self.user = get_user_model().objects.create(email="staff@ifb.fr", firstname="s", lastname="s", is_staff=True)
+
+    def test_groups_fetched_once(self):
+        with self.assertNumQueries(1):
+            self.assertFalse(business_logic.is_curator(self.user))
+            self.assertFalse(business_logic.is_user_manager(self.user))
+            self.assertFalse(business_logic.has_no_restriction_on_catalog_models(self.user))
+
+    def test_invalidated_on_groups_changed(self):
+        self.assertFalse(business_logic.is_user_manager(self.user))
+        business_logic.set_user_manager(self.user, True)
+        self.assertTrue(business_logic.is_user_manager(self.user))
+        self.user.groups.clear()
+        self.assertFalse(business_logic.is_user_manager(self.user))
+
+    def test_invalidated_on_users_of_group_changed(self):
+        group = Group.objects.get(name=business_logic.get_user_manager_group_name())
+        self.assertFalse(business_logic.is_user_manager(self.user))
+        group.user_set.add(self.user.pk)
+        self.assertTrue(business_logic.is_user_manager(self.user))
+        group.user_set.remove(self.user.pk)
+        self.assertFalse(business_logic.is_user_manager(self.user))
+        group.user_set.add(self.user.pk)
+        self.assertTrue(business_logic.is_user_manager(self.user))
+        group.user_set.clear()
+        self.assertFalse(business_logic.is_user_manager(self.user))
+
+    def test_anonymous(self):
+        with self.assertNumQueries(0):
+            self.assertFalse(business_logic.is_user_manager(AnonymousUser()))
+
+
+class IsUsedTestCase(TestCase):
+    def setUp(self):
+        self.used = models.Keyword.objects.create(keyword="used")
+        self.unused = models.Keyword.objects.create(keyword="unused")
+        self.team = models.Team.objects.create(name="team")
+        self.team.keywords.add(self.used)
+        self.used.refresh_from_db()
+
+    def test_read_from_usage_count(self):
+        with self.assertNumQueries(0):
+            self.assertTrue(permissions.is_used(self.used))
+            self.assertFalse(permissions.is_used(self.unused))
+
+    def test_permission(self):
+        request = RequestFactory().delete('/')
+        perm = permissions.UserCanEditAndDeleteIfNotUsed()
+        self.assertFalse(perm.has_object_permission(request, None, self.used))
+        self.assertTrue(perm.has_object_permission(request, None, self.unused))
+        with self.assertNumQueries(0):
+            self.assertFalse(perm.has_object_permission(request, None, self.used))
+
+    def test_annotate(self):
+        with self.assertNumQueries(1):
+            flags = {k.keyword: permissions.is_used(k) for k in permissions.annotate_is_used(models.Keyword.objects)}
+        self.assertEqual(flags, {"used": True, "unused": False})
+
+    def test_user_with_fk(self):
+        user = get_user_model().objects.create(email="u@ifb.fr", firstname="u", lastname="u")
+        with self.assertNumQueries(1):
+            self.assertFalse(permissions.is_used(user))
+        self.team.maintainers.add(user)
+        self.assertTrue(permissions.is_used(user))
+
+    def test_basic_permission_classes(self):
+        basic = permissions.get_basic_permission_classes(models.Keyword.get_permission_classes())
+        self.assertIn(permissions.UserCanEditAndDeleteIfNotUsed, basic)
+        self.assertIn(permissions.ReadOnly, basic)
+
+
+class AnnotatePermissionsTestCase(TestCase):
+    def setUp(self):
+        business_logic.init_business_logic()
+        self.leader = get_user_model().objects.create(email="leader@ifb.fr", firstname="l", lastname="l", is_staff=True)
+        self.curator = get_user_model().objects.create(email="cur@ifb.fr", firstname="c", lastname="c", is_staff=True)
+        self.curator.groups.add(Group.objects.get(name__startswith="Curator"))
+        self.superuser = get_user_model().objects.create(
+            email="su@ifb.fr", firstname="s", lastname="s", is_superuser=True
+        )
+        for i in range(3):
+            team = models.Team.objects.create(name=f"team{i}")
+            team.maintainers.add(self.curator)
+            if i > 0:
+                team.technicalLeaders.add(self.leader)
+                team.leaders.add(self.leader)
+        used = models.Keyword.objects.create(keyword="used")
+        models.Keyword.objects.create(keyword="unused")
+        models.Team.objects.get(name="team0").keywords.add(used)
+
+    def assertSameAsPerObject(self, model, user):
+        request = RequestFactory().get('/')
+        request.user = user
+        with business_logic.RequestUpgrade(request=request, from_admin=True):
+            annotated = list(business_logic.annotate_permissions(model.objects.all(), request))
+            for obj in annotated:
+                for name in ["view", "change", "delete"]:
+                    self.assertEqual(
+                        getattr(obj, f"can_{name}"),
+                        getattr(business_logic, f"has_{name}_permission")(model=model, request=request, obj=obj),
+                        f"can_{name} of {obj} for {user}",
+                    )
+
+    def test_same_as_per_object(self):
+        for user in [self.leader, self.curator, self.superuser, AnonymousUser()]:
+            for model in [models.Team, models.Keyword, get_user_model()]:
+                self.assertSameAsPerObject(model, user)
+
+    def test_single_query(self):
+        request = RequestFactory().get('/')
+        request.user = self.leader
+        with self.assertNumQueries(2):
+            # one for the groups of the user, one for the teams and their permissions
+            teams = list(business_logic.annotate_permissions(models.Team.objects.order_by("name"), request))
+        self.assertEqual([t.can_change for t in teams], [False, True, True])
+        self.assertEqual(len(teams), 3)
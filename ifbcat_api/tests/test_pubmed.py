@@ -0,0 +1,84 @@
+import tempfile
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+
+from ifbcat_api import http_client, pubmed
+from ifbcat_api.model.tool.tool import Tool
+
+HEADER = (
+    '<?xml version="1.0" ?>\n<!DOCTYPE PubmedArticleSet PUBLIC "-//NLM//DTD PubMedArticle, 1st January 2024//EN" '
+    '"https://dtd.nlm.nih.gov/ncbi/pubmed/out/pubmed_240101.dtd">\n'
+)
+ARTICLE = (
+    '<PubmedArticle><MedlineCitation Status="MEDLINE" Owner="NLM"><PMID Version="1">{pmid}</PMID></MedlineCitation>'
+    '<PubmedData><ArticleIdList><ArticleId IdType="pubmed">{pmid}</ArticleId>'
+    '<ArticleId IdType="doi">10.1000/{pmid}</ArticleId></ArticleIdList></PubmedData></PubmedArticle>'
+)
+
+
+def get_efetch_response(url, data):
+    # the PMIDs of 3 digits have no DOI
+    articles = "".join(ARTICLE.format(pmid=pmid) for pmid in data['id'].split(',') if len(pmid) != 3)
+    return mock.Mock(status_code=200, content=f'{HEADER}<PubmedArticleSet>{articles}</PubmedArticleSet>'.encode())
+
+
+def get_idconv_response(url, params):
+    response = mock.Mock(status_code=200)
+    response.json.return_value = dict(
+        records=[dict(pmcid=pmcid, pmid='1', doi=f'10.1000/{pmcid}') for pmcid in params['ids'].split(',')]
+    )
+    return response
+
+
+@override_settings(PUBMED_BATCH_SIZE=2, NCBI_API_KEY='')
+class PubmedTestCase(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings = override_settings(HTTP_CACHE_DIR=directory.name)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        client = mock.Mock(post=mock.Mock(side_effect=get_efetch_response))
+        for patch in (
+            mock.patch.object(http_client, 'get_client', return_value=client),
+            mock.patch.object(http_client, 'get', side_effect=get_idconv_response),
+        ):
+            self.addCleanup(patch.stop)
+            patch.start()
+        self.post, self.get = client.post, http_client.get
+
+    def test_batches(self):
+        self.assertEqual(
+            pubmed.get_dois(['1000', 2000, '123', 'PMC1', '', None, '1000']),
+            {'1000': '10.1000/1000', '2000': '10.1000/2000', '123': None, 'PMC1': '10.1000/PMC1'},
+        )
+        self.assertEqual([c.kwargs['data']['id'] for c in self.post.call_args_list], ['1000,2000', '123'])
+        self.assertEqual(self.get.call_args.kwargs['params']['ids'], 'PMC1')
+
+    def test_cached(self):
+        pubmed.get_dois(['1000', '123'])
+        self.post.reset_mock()
+        self.assertEqual(
+            pubmed.get_dois(['1000', '123', '4000']), {'1000': '10.1000/1000', '123': None, '4000': '10.1000/4000'}
+        )
+        self.assertEqual([c.kwargs['data']['id'] for c in self.post.call_args_list], ['4000'])
+
+    def test_primary_dois_of_tool(self):
+        entry = dict(
+            publication=[
+                dict(type=["Primary"], doi="10.1000/given", pmid="5000", pmcid=None),
+                dict(type=["Primary"], doi=None, pmid="6000", pmcid="PMC2"),
+                dict(type=["Primary"], doi=None, pmid="123", pmcid="PMC3"),
+                dict(type=["Other"], doi=None, pmid="7000", pmcid=None),
+            ]
+        )
+        self.assertEqual(Tool.get_pubmed_ids_from_json(entry), ["6000", "PMC2", "123", "PMC3"])
+        self.assertEqual(Tool.get_primary_dois_from_json(entry), ["10.1000/given", "10.1000/6000", "10.1000/PMC3"])
+        # already resolved
+        self.post.reset_mock()
+        self.get.reset_mock()
+        dois = {"6000": "10.1000/resolved", "PMC2": None, "123": None, "PMC3": None}
+        self.assertEqual(Tool.get_primary_dois_from_json(entry, dois), ["10.1000/given", "10.1000/resolved"])
+        self.post.assert_not_called()
+        self.get.assert_not_called()
@@ -0,0 +1,91 @@
+import io
+import tempfile
+from unittest import mock
+
+import requests
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from ifbcat_api import http_client, misc, models, tasks
+
+
+def get_doi_info(doi):
+    if doi.endswith("missing"):
+        raise misc.BibliographicalEntryNotFound(doi, 404, None)
+    if doi.endswith("unreachable"):
+        raise requests.ConnectionError("unreachable")
+    return dict(title=f"Title of {doi}", journal_name="Journal", authors_list="Doe J", biblio_year=2020)
+
+
+class RefreshDoisTestCase(TestCase):
+    def setUp(self):
+        for doi in ["10.1000/first", "10.1000/missing", "10.1000/unreachable"]:
+            models.Doi.objects.create(doi=doi)
+        self.recent = models.Doi.objects.create(doi="10.1000/recent", title="Recent", refreshed_at=timezone.now())
+        self.refresh = misc.get_doi_info.refresh
+        patch = mock.patch.object(misc.get_doi_info, 'refresh', side_effect=get_doi_info)
+        self.get_doi_info = patch.start()
+        self.addCleanup(patch.stop)
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_refresh_stale(self):
+        report = tasks.refresh_dois(workers=2, progress=False)
+        self.assertEqual(
+            {outcome: sorted(dois) for outcome, dois in report.items()},
+            dict(refreshed=["10.1000/first"], not_found=["10.1000/missing"], failed=["10.1000/unreachable"]),
+        )
+        first = models.Doi.objects.get(doi="10.1000/first")
+        self.assertEqual((first.title, first.biblio_year), ("Title of 10.1000/first", 2020))
+        self.assertIsNotNone(first.refreshed_at)
+        # not fetched again until stale, unlike the ones which failed
+        self.assertEqual(
+            sorted(tasks.get_stale_dois().values_list('doi', flat=True)),
+            ["10.1000/unreachable"],
+        )
+        self.assertEqual(tasks.get_stale_dois(max_age=0).count(), 4)
+
+    def test_written_in_batches(self):
+        for i in range(5):
+            models.Doi.objects.create(doi=f"10.1000/batch-{i}")
+        sizes = []
+        bulk_update = models.Doi.objects.bulk_update
+
+        def record_bulk_update(objs, fields):
+            sizes.append(len(objs))
+            return bulk_update(objs, fields)
+
+        with mock.patch.object(tasks, 'DOI_REFRESH_BATCH_SIZE', 2):
+            with mock.patch.object(models.Doi.objects, 'bulk_update', record_bulk_update):
+                report = tasks.refresh_dois(workers=4, progress=False)
+        self.assertEqual(len(report['refreshed']), 6)
+        # with the one not found
+        self.assertEqual(sorted(sizes), [1, 2, 2, 2])
+
+    def test_command(self):
+        out = io.StringIO()
+        call_command('refresh_dois', all=True, stdout=out)
+        self.assertIn("2 DOIs refreshed", out.getvalue())
+        self.assertIn("1 DOIs not found", out.getvalue())
+        self.assertIn("Could not refresh the DOIs 10.1000/unreachable", out.getvalue())
+        self.recent.refresh_from_db()
+        self.assertEqual(self.recent.title, "Title of 10.1000/recent")
+
+    def test_not_from_http_cache(self):
+        self.get_doi_info.side_effect = self.refresh
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        response = mock.Mock(status_code=200)
+        with override_settings(HTTP_CACHE_DIR=directory.name), mock.patch.object(http_client, 'get') as get:
+            get.return_value = response
+            response.json.return_value = dict(title="Cached", issued={"date-parts": [[2020]]})
+            self.assertEqual(misc.get_doi_info("10.1000/first")["title"], "Cached")
+            response.json.return_value = dict(title="Corrected", issued={"date-parts": [[2020]]})
+            tasks.refresh_dois(models.Doi.objects.filter(doi="10.1000/first"), progress=False)
+            self.assertEqual(models.Doi.objects.get(doi="10.1000/first").title, "Corrected")
+            # and cached in turn
+            self.assertEqual(misc.get_doi_info("10.1000/first")["title"], "Corrected")
+            self.assertEqual(get.call_count, 2)
@@ -0,0 +1,62 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from ifbcat_api import models
+
+
+class LightBrowsableAPIRendererTestCase(TestCase):
+    def setUp(self):
+        for i in range(50):
+            models.Keyword.objects.create(keyword=f"keyword-{i}")
+        self.superuser = get_user_model().objects.create_superuser(
+            email="su@ifb.fr", firstname="s", lastname="s", password="p"
+        )
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response, len(context.captured_queries)
+
+    def test_autocomplete(self):
+        self.client.force_login(self.superuser)
+        response, _ = self.count_queries('/api/event/?format=api')
+        self.assertContains(response, 'data-name="keywords"')
+        self.assertNotContains(response, '>keyword-1<')
+
+    def assert_same_cost_as_json(self, url):
+        # the session, the vocabularies and the used values of the filters are then in the cache
+        self.count_queries(f'{url}?format=json')
+        self.count_queries(f'{url}?format=api')
+        _, in_json = self.count_queries(f'{url}?format=json')
+        _, in_html = self.count_queries(f'{url}?format=api')
+        self.assertEqual(in_html, in_json)
+
+    def test_same_cost_as_json(self):
+        event = models.Event.objects.create(name="event")
+        event.keywords.add(models.Keyword.objects.first())
+        for url in ('/api/event/', '/api/training/', '/api/keyword/'):
+            with self.subTest(url=url, user="anonymous"):
+                self.assert_same_cost_as_json(url)
+        self.client.force_login(self.superuser)
+        for url in ('/api/event/', '/api/training/', '/api/keyword/'):
+            with self.subTest(url=url, user="superuser"):
+                self.assert_same_cost_as_json(url)
+
+    def test_select_without_search(self):
+        models.EventCost.objects.create(cost="Free for the students")
+        self.client.force_login(self.superuser)
+        response, _ = self.count_queries('/api/event/?format=api')
+        # the endpoint of the costs does not search them
+        self.assertNotContains(response, 'data-name="costs"')
+        self.assertContains(response, '>Free for the students<')
+
+    def test_filter_autocomplete(self):
+        response, _ = self.count_queries('/api/event/?format=api')
+        self.assertContains(response, 'data-name="topics__descendant_of" data-url="/api/topic/"')
+
+    def test_no_form_for_anonymous(self):
+        response, _ = self.count_queries('/api/keyword/?format=api')
+        self.assertNotContains(response, 'id="post-object-form"')
@@ -0,0 +1,112 @@
+import tempfile
+import time
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.cache.backends.filebased import FileBasedCache
+from django.db import connection
+from django.test import TestCase, override_settings
+
+from ifbcat_api import models, response_cache
+
+
+@override_settings(RESPONSE_CACHE_MAX_AGE=60, RESPONSE_CACHE_MAX_STALE=60, RESPONSE_CACHE_LOCK_TIMEOUT=1)
+class ResponseCacheTestCase(TestCase):
+    url = '/api/keyword-cnp/?format=json'
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings = override_settings(
+            CACHES={
+                'default': {
+                    'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+                    'LOCATION': directory.name,
+                }
+            }
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+        # the same cache, as seen by another process, e.g. the huey consumer
+        self.other_process_cache = FileBasedCache(directory.name, {})
+        models.Keyword.objects.create(keyword="first")
+        self.commit()
+
+    def commit(self):
+        """Run the callbacks registered so far as if the transaction was committed, the test case never commits"""
+        callbacks = [func for _, func, _ in connection.run_on_commit]
+        connection.run_on_commit.clear()
+        for func in callbacks:
+            func()
+
+    def get_keywords(self):
+        return [k["keyword"] for k in self.client.get(self.url).json()]
+
+    def get_lock_key(self):
+        request = self.client.get(self.url).wsgi_request
+        return f"{response_cache.get_request_key(request, 'response-cache-KeywordViewSetCNP')}-lock"
+
+    def test_fresh(self):
+        self.assertEqual(self.get_keywords(), ["first"])
+        with self.assertNumQueries(0):
+            self.assertEqual(self.get_keywords(), ["first"])
+
+    def test_computed_by_the_writing_transaction(self):
+        self.get_keywords()
+        models.Keyword.objects.create(keyword="second")
+        self.assertEqual(sorted(self.get_keywords()), ["first", "second"])
+
+    def test_stale_while_computed_by_another_request(self):
+        self.get_keywords()
+        lock_key = self.get_lock_key()
+        time.sleep(0.01)
+        models.Keyword.objects.create(keyword="second")
+        self.commit()
+        cache.add(lock_key, True, 60)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.get_keywords(), ["first"])
+        cache.delete(lock_key)
+        self.assertEqual(sorted(self.get_keywords()), ["first", "second"])
+
+    @override_settings(RESPONSE_CACHE_MAX_STALE=0)
+    def test_too_stale(self):
+        self.get_keywords()
+        lock_key = self.get_lock_key()
+        time.sleep(0.01)
+        models.Keyword.objects.create(keyword="second")
+        self.commit()
+        # the request holding the lock does not provide the value in time
+        cache.add(lock_key, True, 60)
+        self.assertEqual(sorted(self.get_keywords()), ["first", "second"])
+
+    def test_sitemap(self):
+        first = self.client.get('/sitemap.xml')
+        self.assertEqual(first.status_code, 200)
+        with self.assertNumQueries(0):
+            second = self.client.get('/sitemap.xml')
+        self.assertEqual(first.content, second.content)
+        self.assertEqual(first['Content-Type'], second['Content-Type'])
+
+    def test_invalidated_by_another_process(self):
+        self.get_keywords()
+        time.sleep(0.01)
+        models.Keyword.objects.filter(keyword="first").update(keyword="updated")
+        with mock.patch.object(response_cache, 'cache', self.other_process_cache):
+            response_cache.invalidate_responses()
+        self.assertEqual(self.get_keywords(), ["updated"])
+
+    def test_locked_by_another_process(self):
+        self.get_keywords()
+        lock_key = self.get_lock_key()
+        time.sleep(0.01)
+        models.Keyword.objects.create(keyword="second")
+        self.commit()
+        self.assertTrue(self.other_process_cache.add(lock_key, True, 60))
+        with self.assertNumQueries(0):
+            self.assertEqual(self.get_keywords(), ["first"])
+
+    def test_cache_of_the_process(self):
+        with self.settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}):
+            self.get_keywords()
+            with self.assertNumQueries(1):
+                self.get_keywords()
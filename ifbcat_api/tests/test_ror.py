@@ -0,0 +1,123 @@
+import io
+import json
+import os
+import tempfile
+import zipfile
+
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.test import TestCase
+
+from ifbcat_api import models, ror
+from ifbcat_api.validators import validate_grid_or_ror_id
+
+RECORD_V1 = {
+    "id": "https://ror.org/0495fxg12",
+    "name": "Institut Pasteur",
+    "acronyms": ["IP"],
+    "aliases": ["Pasteur Institute"],
+    "labels": [{"label": "Institut Pasteur Paris", "iso639": "fr"}],
+    "links": ["https://www.pasteur.fr"],
+    "addresses": [{"city": "Paris"}],
+    "country": {"country_name": "France", "country_code": "FR"},
+    "external_ids": {"GRID": {"preferred": "grid.428999.7", "all": "grid.428999.7"}},
+    "status": "active",
+}
+RECORD_V2 = {
+    "id": "https://ror.org/03xjwb503",
+    "names": [
+        {"value": "Université Paris-Saclay", "types": ["ror_display", "label"], "lang": "fr"},
+        {"value": "UPSaclay", "types": ["acronym"], "lang": None},
+    ],
+    "links": [
+        {"type": "wikipedia", "value": "https://fr.wikipedia.org"},
+        {"type": "website", "value": "https://www.universite-paris-saclay.fr"},
+    ],
+    "locations": [{"geonames_details": {"name": "Gif-sur-Yvette", "country_name": "France"}}],
+    "external_ids": [{"type": "grid", "all": ["grid.460789.4"], "preferred": "grid.460789.4"}],
+    "status": "active",
+}
+
+
+class RorTestCase(TestCase):
+    def setUp(self):
+        # whether the registry is loaded is kept in it
+        cache.clear()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.dump = os.path.join(directory.name, 'v1.50-2024-07-29-ror-data.zip')
+        with zipfile.ZipFile(self.dump, 'w') as archive:
+            archive.writestr('v1.50-2024-07-29-ror-data.json', json.dumps([RECORD_V1]))
+            archive.writestr('v1.50-2024-07-29-ror-data_schema_v2.json', json.dumps([RECORD_V2, RECORD_V1]))
+
+    def tearDown(self):
+        cache.clear()
+
+    def load(self):
+        out = io.StringIO()
+        call_command('load_ror', self.dump, stdout=out)
+        self.assertIn("2 organisations", out.getvalue())
+
+    def test_parse_record(self):
+        self.assertEqual(
+            ror.parse_record(RECORD_V1),
+            dict(
+                ror_id="0495fxg12",
+                grid_ids=["grid.428999.7"],
+                name="Institut Pasteur",
+                acronyms=["IP"],
+                names=["institut pasteur", "ip", "pasteur institute", "institut pasteur paris"],
+                homepage="https://www.pasteur.fr",
+                city="Paris",
+                country="France",
+                status="active",
+            ),
+        )
+        fields = ror.parse_record(RECORD_V2)
+        self.assertEqual((fields['name'], fields['acronyms']), ("Université Paris-Saclay", ["UPSaclay"]))
+        self.assertEqual(fields['names'], ["universite paris saclay", "upsaclay"])
+        self.assertEqual(fields['homepage'], "https://www.universite-paris-saclay.fr")
+
+    def test_lookups(self):
+        self.load()
+        # loaded again, replacing the previous ones
+        self.load()
+        with self.assertNumQueries(1):
+            found = ror.get_organisations(["grid.428999.7", "03xjwb503", "https://ror.org/0495fxg12", "grid.1.1", ""])
+        self.assertEqual(
+            {orgid: organisation.ror_id for orgid, organisation in found.items()},
+            {"grid.428999.7": "0495fxg12", "03xjwb503": "03xjwb503", "https://ror.org/0495fxg12": "0495fxg12"},
+        )
+        with self.assertNumQueries(1):
+            matches = ror.match_names(["Université  Paris Saclay", "pasteur institute", "Unknown"])
+        self.assertEqual(
+            {name: [organisation.ror_id for organisation in found] for name, found in matches.items()},
+            {"Université  Paris Saclay": ["03xjwb503"], "pasteur institute": ["0495fxg12"], "Unknown": []},
+        )
+
+    def test_validation(self):
+        # not checked while the registry is not loaded
+        validate_grid_or_ror_id("grid.5842.b")
+        self.load()
+        validate_grid_or_ror_id("grid.428999.7")
+        validate_grid_or_ror_id("03xjwb503")
+        with self.assertRaises(ValidationError):
+            validate_grid_or_ror_id("grid.5842.b")
+        # kept by the organisations already having it
+        models.Organisation.objects.create(name="Other", orgid="grid.5842.b")
+        validate_grid_or_ror_id("grid.5842.b")
+        # the registry being known to be loaded
+        with self.assertNumQueries(1):
+            validate_grid_or_ror_id("03xjwb503")
+
+    def test_load_organisations(self):
+        self.load()
+        mapping = os.path.join(os.path.dirname(self.dump), 'mapping.csv')
+        with open(mapping, 'w') as f:
+            f.write("drupal_name,ifbcat_name,orgid\nIP,IP,grid.428999.7\nUPS,Paris-Saclay University,\nUPS,UPSaclay,\n")
+        call_command('load_organisations_from_gridid', file=mapping)
+        self.assertEqual(
+            list(models.Organisation.objects.order_by('name').values_list('name', 'orgid', 'city')),
+            [("IP", "grid.428999.7", "Paris"), ("UPSaclay", "03xjwb503", "Gif-sur-Yvette")],
+        )
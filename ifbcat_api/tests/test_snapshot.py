@@ -0,0 +1,100 @@
+import datetime
+import tempfile
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from ifbcat_api import models, snapshot
+
+
+@override_settings(CATALOG_SNAPSHOT_ENABLED=True, CATALOG_SNAPSHOT_IN_BACKGROUND=False, CATALOG_SNAPSHOT_MAX_AGE=60)
+class CatalogSnapshotTestCase(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        # shared by the processes
+        settings = override_settings(
+            CACHES={
+                'default': {
+                    'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+                    'LOCATION': directory.name,
+                }
+            }
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.keywords = [models.Keyword.objects.create(keyword=f"keyword-{i}") for i in range(3)]
+        for i in range(5):
+            event = models.Event.objects.create(name=f"event-{i}", start_date=datetime.date(2020, 1, 1 + i))
+            event.keywords.add(self.keywords[i % 3])
+        self.event = event
+
+    def get(self, url):
+        with self.settings(CATALOG_SNAPSHOT_ENABLED=False):
+            expected = self.client.get(url).json()
+        self.client.get(url)
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+        self.assertEqual(response.json(), expected)
+        return expected
+
+    def test_list(self):
+        self.assertEqual(self.get('/api/event/?format=json')["count"], 5)
+        self.assertEqual(len(self.get('/api/event/?format=json&limit=2&offset=2')["results"]), 2)
+        self.assertEqual(len(self.get('/api/event-cnp/?format=json')), 5)
+
+    def test_filter(self):
+        pk = self.keywords[0].pk
+        self.assertEqual(self.get(f'/api/event/?format=json&keywords={pk}')["count"], 2)
+        self.assertEqual(self.get(f'/api/event/?format=json&keywords={pk}&keywords={self.keywords[1].pk}')["count"], 4)
+
+    def test_retrieve(self):
+        self.assertEqual(self.get(f'/api/event/{self.event.pk}/?format=json')["name"], "event-4")
+
+    def test_fallback(self):
+        self.client.get('/api/event/?format=json')
+        self.assertEqual(self.client.get('/api/event/?format=json&search=event-1').json()["count"], 1)
+        self.assertEqual(self.client.get('/api/event/?format=json&keywords=0').status_code, 400)
+
+    def test_changes(self):
+        self.get('/api/event/?format=json')
+        models.Event.objects.create(name="new")
+        self.assertEqual(self.client.get('/api/event/?format=json').json()["count"], 6)
+
+    def test_built_again_once_committed(self):
+        self.get('/api/event/?format=json')
+        models.Event.objects.create(name="new")
+        # built by a concurrent request before the write is committed
+        with mock.patch.object(snapshot, 'get_build_request', side_effect=snapshot.get_build_request) as build:
+            self.client.get('/api/event/?format=json')
+            self.assertEqual(build.call_count, 1)
+            for _, func, _ in connection.run_on_commit:
+                func()
+            self.client.get('/api/event/?format=json')
+            self.assertEqual(build.call_count, 2)
+
+    def test_max_age(self):
+        self.get('/api/event/?format=json')
+        with mock.patch.object(snapshot.time, 'monotonic', return_value=snapshot.time.monotonic() + 61):
+            self.assertGreater(self.count_queries('/api/event/?format=json'), 0)
+
+    def count_queries(self, url, **extra):
+        with CaptureQueriesContext(connection) as context:
+            self.client.get(url, **extra)
+        return len(context.captured_queries)
+
+    def test_hosts_allowed_only(self):
+        self.get('/api/event/?format=json')
+        with self.settings(ALLOWED_HOSTS=['.ifb.fr', 'testserver']):
+            self.count_queries('/api/event/?format=json', HTTP_HOST='catalogue.ifb.fr')
+            self.assertGreater(self.count_queries('/api/event/?format=json', HTTP_HOST='catalogue.ifb.fr'), 0)
+            self.assertEqual(self.count_queries('/api/event/?format=json'), 0)
+
+    def test_cache_of_the_process(self):
+        self.get('/api/event/?format=json')
+        with self.settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}):
+            self.client.get('/api/event/?format=json')
+            self.assertGreater(self.count_queries('/api/event/?format=json'), 0)
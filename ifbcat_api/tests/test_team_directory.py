@@ -0,0 +1,100 @@
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+
+from ifbcat_api import models, tasks
+
+
+class TeamDirectoryTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        with self.captureOnCommitCallbacks():
+            user = get_user_model().objects.create(email="lead@ifb.fr", firstname="L", lastname="L")
+            organisation = models.Organisation.objects.create(name="Org", description="d", homepage="https://a.fr")
+            platform = models.ElixirPlatform.objects.create(name="Plat", description="d", homepage="https://a.fr")
+            service = dict(
+                domain=models.ServiceDomain.objects.create(name="domain"),
+                analysis=models.KindOfAnalysis.objects.create(name="analysis"),
+                category=models.ServiceCategory.objects.create(name="category"),
+            )
+            for i in range(3):
+                team = models.Team.objects.create(name=f"team-{i}", description="d")
+                team.leaders.add(user)
+                team.fundedBy.add(organisation)
+                team.platforms.add(platform)
+                team.keywords.add(models.Keyword.objects.create(keyword=f"keyword-{i}"))
+                models.Service.objects.create(team=team, **service)
+            self.team = team
+        models.refresh_team_directory()
+
+    def test_same_as_team_serializer(self):
+        from_directory = self.client.get('/api/team-cnp/?format=json').json()
+        from_team = self.client.get('/api/team/?format=json&limit=100').json()["results"]
+        self.assertEqual(len(from_directory), 3)
+        self.assertEqual(
+            sorted(from_directory, key=lambda t: t["id"]),
+            sorted(from_team, key=lambda t: t["id"]),
+        )
+
+    def commit(self):
+        with mock.patch.object(tasks.refresh_team_directory_task, 'schedule') as schedule:
+            # as committing, which runs the callbacks and starts another list of them
+            callbacks, connection.run_on_commit = connection.run_on_commit, []
+            for _, func, _ in callbacks:
+                if func is tasks.queue_team_directory_refresh:
+                    func()
+        return schedule
+
+    def count_pending(self):
+        return len([func for _, func, _ in connection.run_on_commit if func is tasks.queue_team_directory_refresh])
+
+    def test_refreshed_after_writes(self):
+        self.team.keywords.add(models.Keyword.objects.create(keyword="new"))
+        self.team.description = "new description"
+        self.team.save()
+        # queued once for all the writes of the transaction, and of the next ones until refreshed
+        self.assertEqual(self.count_pending(), 1)
+        self.commit().assert_called_once_with(delay=settings.TEAM_DIRECTORY_REFRESH_DELAY)
+        self.team.save()
+        self.commit().assert_not_called()
+        tasks.refresh_team_directory_task.call_local()
+        directory = models.TeamDirectory.objects.get(pk=self.team.pk)
+        self.assertEqual(directory.description, "new description")
+        self.assertIn("new", directory.keywords)
+        self.team.save()
+        self.commit().assert_called_once()
+
+    def test_not_refreshed_after_other_writes(self):
+        self.commit()
+        keyword = models.Keyword.objects.create(keyword="other")
+        doi = models.Doi.objects.create(doi="10.1000/other")
+        doi.title = "Title"
+        doi.save()
+        doi.save(update_fields=['title'])
+        models.Tool.objects.create(name="tool", biotoolsID="tool").save()
+        self.assertEqual(self.count_pending(), 0)
+        # shown in the directory
+        keyword.keyword = "renamed"
+        keyword.save()
+        self.assertEqual(self.count_pending(), 1)
+
+    def test_filters_apply(self):
+        response = self.client.get('/api/team-cnp/?format=json&search=team-1').json()
+        self.assertEqual([t["name"] for t in response], ["team-1"])
+
+    def test_vanilla_front(self):
+        response = self.client.get('/platform/')
+        self.assertContains(response, "team-2")
+
+    def test_admin(self):
+        self.client.force_login(
+            get_user_model().objects.create_superuser(email="su@ifb.fr", firstname="s", lastname="s", password="p")
+        )
+        response = self.client.get('/admin/ifbcat_api/teamdirectory/?is_active=True')
+        self.assertContains(response, "team-2")
+        self.assertContains(response, "Plat")
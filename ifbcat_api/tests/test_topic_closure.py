@@ -0,0 +1,145 @@
+import os
+import tempfile
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+
+from ifbcat_api import counters, edam, models, snapshot
+from ifbcat_api.model.misc import PendingTopicClosure
+
+TOPIC = 'http://edamontology.org/topic_0003'
+BIOINFORMATICS = 'http://edamontology.org/topic_0091'
+SEQUENCE_ANALYSIS = 'http://edamontology.org/topic_0080'
+GENOMICS = 'http://edamontology.org/topic_0622'
+GENETICS = 'http://edamontology.org/topic_3053'
+
+
+class TopicClosureTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings = override_settings(EDAM_INDEX=os.path.join(directory.name, 'edam.json'))
+        settings.enable()
+        self.addCleanup(settings.disable)
+        terms = [
+            edam.Term(TOPIC, "Topic", "", [], [], False),
+            edam.Term(BIOINFORMATICS, "Bioinformatics", "", [], [TOPIC], False),
+            edam.Term(SEQUENCE_ANALYSIS, "Sequence analysis", "", [], [BIOINFORMATICS], False),
+            edam.Term(GENOMICS, "Genomics", "", [], [SEQUENCE_ANALYSIS, GENETICS], False),
+            edam.Term(GENETICS, "Genetics", "", [], [TOPIC], False),
+        ]
+        edam.write_index({term.uri: term for term in terms}, '1.25')
+        # Sequence analysis is not in the database
+        self.topics = {uri: models.Topic.objects.create(uri=uri) for uri in (TOPIC, BIOINFORMATICS, GENOMICS, GENETICS)}
+        # as once committed, the list of the callbacks being replaced
+        connection.run_on_commit = []
+        edam.update_closure()
+
+    def tearDown(self):
+        cache.clear()
+
+    def get_ancestors(self, uri):
+        return dict(
+            models.TopicClosure.objects.filter(descendant=self.topics[uri]).values_list('ancestor__uri', 'depth')
+        )
+
+    def test_closure(self):
+        self.assertEqual(self.get_ancestors(TOPIC), {TOPIC: 0})
+        self.assertEqual(self.get_ancestors(BIOINFORMATICS), {BIOINFORMATICS: 0, TOPIC: 1})
+        # through the topic missing in the database, at the depth of the shortest path
+        self.assertEqual(self.get_ancestors(GENOMICS), {GENOMICS: 0, GENETICS: 1, BIOINFORMATICS: 2, TOPIC: 2})
+
+    def test_update_once_committed(self):
+        models.Topic.objects.create(uri='http://edamontology.org/topic_3168')
+        models.Topic.objects.create(uri='http://edamontology.org/topic_3169')
+        pending = [func for _, func, _ in connection.run_on_commit if isinstance(func, PendingTopicClosure)]
+        self.assertEqual(len(pending), 1)
+        self.assertEqual(pending[0].uris, {'http://edamontology.org/topic_3168', 'http://edamontology.org/topic_3169'})
+
+    def get_closure(self):
+        return set(models.TopicClosure.objects.values_list('ancestor__uri', 'descendant__uri', 'depth'))
+
+    def test_added_to_closure(self):
+        self.topics[SEQUENCE_ANALYSIS] = models.Topic.objects.create(uri=SEQUENCE_ANALYSIS)
+        # as once committed, the list of the callbacks being replaced
+        connection.run_on_commit = []
+        # the pks of the topics, then a single insert within a savepoint
+        with self.assertNumQueries(4):
+            edam.add_to_closure([SEQUENCE_ANALYSIS])
+        self.assertEqual(self.get_ancestors(SEQUENCE_ANALYSIS), {SEQUENCE_ANALYSIS: 0, BIOINFORMATICS: 1, TOPIC: 2})
+        self.assertEqual(self.get_ancestors(GENOMICS)[SEQUENCE_ANALYSIS], 1)
+        closure = self.get_closure()
+        edam.update_closure()
+        self.assertEqual(closure, self.get_closure())
+
+    def test_closure_not_counted(self):
+        models.Event.objects.create(name="event").topics.add(self.topics[GENOMICS])
+        edam.update_closure()
+        counters.rebuild_counters()
+        self.assertEqual(
+            {uri: topic.usage_count for uri, topic in models.Topic.objects.in_bulk(field_name='uri').items()},
+            {TOPIC: 0, BIOINFORMATICS: 0, GENOMICS: 1, GENETICS: 0},
+        )
+
+    def test_deleted_in_bulk(self):
+        with self.assertNumQueries(1):
+            models.TopicClosure.objects.all().delete()
+        models.RegistryOrganisation.objects.create(ror_id="0495fxg12", name="Institut Pasteur")
+        with self.assertNumQueries(1):
+            models.RegistryOrganisation.objects.all().delete()
+
+    def test_snapshot_forgotten(self):
+        version = snapshot.get_catalog_version()
+        edam.update_closure()
+        self.assertNotEqual(snapshot.get_catalog_version(), version)
+
+    def get_names(self, url):
+        response = self.client.get(url).json()
+        return sorted(item['name'] for item in response.get('results', response))
+
+    def test_filters(self):
+        event = models.Event.objects.create(name="event")
+        event.topics.add(self.topics[GENOMICS], self.topics[GENETICS])
+        models.Event.objects.create(name="other").topics.add(self.topics[TOPIC])
+        models.Team.objects.create(name="team").expertise.add(self.topics[GENOMICS])
+        models.Tool.objects.create(name="tool", biotoolsID="tool").scientific_topics.add(self.topics[GENOMICS])
+        pks = {uri: topic.pk for uri, topic in self.topics.items()}
+        # once, despite two of its topics being subtopics
+        self.assertEqual(
+            self.get_names(f'/api/event/?format=json&topics__descendant_of={pks[TOPIC]}'), ["event", "other"]
+        )
+        self.assertEqual(self.get_names(f'/api/event/?format=json&topics__descendant_of={pks[GENETICS]}'), ["event"])
+        self.assertEqual(
+            self.get_names(f'/api/event/?format=json&topics__descendant_of={pks[BIOINFORMATICS]}'), ["event"]
+        )
+        self.assertEqual(self.get_names(f'/api/team/?format=json&expertise__descendant_of={pks[TOPIC]}'), ["team"])
+        self.assertEqual(
+            self.get_names(f'/api/tool/?format=json&scientific_topics__descendant_of={pks[BIOINFORMATICS]}'), ["tool"]
+        )
+        self.assertEqual(
+            self.get_names(f'/api/tool/?format=json&scientific_topics__descendant_of={pks[GENOMICS]}'), ["tool"]
+        )
+
+    @override_settings(CATALOG_SNAPSHOT_ENABLED=True, CATALOG_SNAPSHOT_IN_BACKGROUND=False)
+    def test_filter_of_snapshot(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        # the snapshot requires a cache shared by the processes
+        settings = override_settings(
+            CACHES={
+                'default': {
+                    'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+                    'LOCATION': directory.name,
+                }
+            }
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+        event = models.Event.objects.create(name="event")
+        event.topics.add(self.topics[GENOMICS], self.topics[GENETICS])
+        url = f'/api/event/?format=json&topics__descendant_of={self.topics[TOPIC].pk}'
+        self.client.get(url)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(url).json()['count'], 1)
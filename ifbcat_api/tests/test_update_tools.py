@@ -0,0 +1,116 @@
+import os
+import tempfile
+from unittest import mock
+
+from django.test import TestCase
+
+from ifbcat_api import models, tasks
+
+
+def get_entry(biotools_id, last_update):
+    return dict(
+        name=f"{biotools_id} tool",
+        description="",
+        homepage="https://example.org",
+        biotoolsID=biotools_id,
+        biotoolsCURIE=f"biotools:{biotools_id}",
+        link=[],
+        license="MIT",
+        documentation=[],
+        maturity="Mature",
+        cost="Free of charge",
+        lastUpdate=last_update,
+        toolType=[],
+        operatingSystem=[],
+        collectionID=[],
+        publication=[],
+        topic=[],
+        credit=[],
+    )
+
+
+class UpdateToolsTestCase(TestCase):
+    def setUp(self):
+        for biotools_id in ["updated", "unchanged", "failing", "missing", "resumed"]:
+            models.Tool.objects.create(biotoolsID=biotools_id, last_update="2020-01-01T00:00:00Z")
+        self.directory = tempfile.TemporaryDirectory()
+        self.checkpoint = os.path.join(self.directory.name, 'checkpoint')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def request_json_from_biotool(self, tool):
+        self.requested.append(tool.biotoolsID)
+        if tool.biotoolsID == "failing":
+            raise ValueError("unexpected")
+        if tool.biotoolsID == "missing":
+            return dict(detail="Not found.")
+        if tool.biotoolsID == "unchanged":
+            return get_entry(tool.biotoolsID, "2020-01-01T00:00:00Z")
+        return get_entry(tool.biotoolsID, "2024-06-01T12:00:00.123456Z")
+
+    def update_tools(self, **kwargs):
+        self.requested = []
+        request = lambda tool: self.request_json_from_biotool(tool)
+        with mock.patch.object(models.Tool, 'request_json_from_biotool', request):
+            return tasks.update_tools(checkpoint=self.checkpoint, progress=False, workers=2, **kwargs)
+
+    def test_update_tools(self):
+        with open(self.checkpoint, 'w') as f:
+            f.write("resumed\n")
+        report = self.update_tools()
+        self.assertEqual(
+            report,
+            dict(updated=["updated"], unchanged=["unchanged"], failed=["failing", "missing"], resumed=["resumed"]),
+        )
+        self.assertNotIn("resumed", self.requested)
+        self.assertEqual(models.Tool.objects.get(biotoolsID="updated").name, "updated tool")
+        self.assertEqual(models.Tool.objects.get(biotoolsID="unchanged").name, "unchanged")
+        self.assertEqual(models.Tool.objects.get(biotoolsID="missing").name, "missing Not found.")
+        # done, so the next update starts over
+        self.assertFalse(os.path.exists(self.checkpoint))
+
+    def test_force(self):
+        report = self.update_tools(force=True)
+        self.assertEqual(report['updated'], ["updated", "unchanged", "resumed"])
+        self.assertEqual(report['resumed'], [])
+
+    def test_interrupted(self):
+        with mock.patch.object(tasks, 'update_tool', side_effect=['updated', KeyboardInterrupt]):
+            with self.assertRaises(KeyboardInterrupt):
+                self.update_tools()
+        self.assertEqual(tasks.read_checkpoint(self.checkpoint), {"updated"})
+        with self.settings(UPDATE_TOOLS_CHECKPOINT_MAX_AGE=-1):
+            self.assertEqual(tasks.read_checkpoint(self.checkpoint), set())
+
+    def test_publications_resolved_together(self):
+        resolved = []
+
+        def get_dois(ids):
+            resolved.append(list(ids))
+            return {i: f"10.1000/{i}" for i in resolved[-1]}
+
+        def request_json_from_biotool(tool):
+            entry = get_entry(tool.biotoolsID, "2024-06-01T12:00:00.123456Z")
+            entry['publication'] = [dict(type=["Primary"], doi=None, pmid=f"{tool.pk}", pmcid=None)]
+            return entry
+
+        get_primary_dois_from_json = models.Tool.get_primary_dois_from_json
+
+        def get_primary_dois_resolved(entry, dois=None):
+            # not resolved again tool by tool
+            self.assertIn(entry['publication'][0]['pmid'], dois)
+            return get_primary_dois_from_json(entry, dois)
+
+        with mock.patch.object(models.Tool, 'request_json_from_biotool', request_json_from_biotool):
+            with mock.patch.object(tasks.pubmed, 'get_dois', get_dois):
+                with mock.patch.object(
+                    models.Tool, 'get_primary_dois_from_json', staticmethod(get_primary_dois_resolved)
+                ):
+                    report = tasks.update_tools(checkpoint='', progress=False, workers=3)
+        self.assertEqual(len(report['updated']), 5)
+        pks = sorted(str(pk) for pk in models.Tool.objects.values_list('pk', flat=True))
+        # each one once, with the ones fetched meanwhile
+        self.assertEqual(sorted(i for ids in resolved for i in ids), pks)
+        for tool in models.Tool.objects.all():
+            self.assertEqual(list(tool.primary_publication.values_list('doi', flat=True)), [f"10.1000/{tool.pk}"])
@@ -0,0 +1,75 @@
+from django.db import connection
+from django.test import TestCase
+from rest_framework.exceptions import ValidationError
+
+from ifbcat_api import models, serializers, views, vocabularies
+
+
+class VocabulariesTestCase(TestCase):
+    def setUp(self):
+        self.cost = models.EventCost.objects.create(cost="Paid by the lab")
+        self.domain = models.ServiceDomain.objects.create(name="domain")
+        self.commit()
+        self.field = serializers.EventSerializer().fields['costs'].child_relation
+        # build the vocabularies
+        self.field.to_internal_value(self.cost.cost)
+        vocabularies.get_vocabulary(models.ServiceDomain.objects.all(), 'name')
+
+    def commit(self):
+        """Run the callbacks registered so far as if the transaction was committed, the test case never commits"""
+        callbacks = [func for _, func, _ in connection.run_on_commit]
+        connection.run_on_commit.clear()
+        for func in callbacks:
+            func()
+
+    def test_look_up_without_query(self):
+        with self.assertNumQueries(0):
+            cost = self.field.to_internal_value(self.cost.cost)
+            domain = vocabularies.get_vocabulary(models.ServiceDomain.objects.all(), 'name').get('name', "domain")
+        self.assertEqual(cost, self.cost)
+        self.assertEqual(domain, self.domain)
+
+    def test_choices_in_error(self):
+        with self.assertNumQueries(0), self.assertRaises(ValidationError) as context:
+            self.field.to_internal_value("Unknown cost")
+        self.assertIn("Choices are :", str(context.exception.detail))
+        self.assertIn(self.cost.cost, str(context.exception.detail))
+
+    def test_forgotten_once_committed(self):
+        cost = models.EventCost.objects.create(cost="Free for members")
+        # the transaction writing the vocabulary reads it from the database
+        self.assertIsNone(vocabularies.get_vocabulary(models.EventCost.objects.all(), 'cost'))
+        self.assertEqual(self.field.to_internal_value(cost.cost), cost)
+        self.commit()
+        self.assertEqual(self.field.to_internal_value(cost.cost), cost)
+        with self.assertNumQueries(0):
+            self.field.to_internal_value(cost.cost)
+
+    def test_restricted_queryset(self):
+        queryset = models.EventCost.objects.filter(pk=self.cost.pk)
+        self.assertIsNone(vocabularies.get_vocabulary(queryset, 'cost'))
+        self.assertIsNone(vocabularies.get_vocabulary(models.Keyword.objects.all(), 'keyword'))
+
+    def test_filter(self):
+        f = views.EventFilter(data={"costs": [str(self.cost.pk)]}, queryset=models.Event.objects.all())
+        with self.assertNumQueries(0):
+            self.assertTrue(f.is_valid())
+        self.assertEqual(f.form.cleaned_data["costs"], [self.cost])
+        f = views.EventFilter(data={"costs": ["0"]}, queryset=models.Event.objects.all())
+        self.assertFalse(f.is_valid())
+
+    def test_counters_not_kept(self):
+        field = models.Field.objects.create(field="Structural biology")
+        self.commit()
+        vocabulary = vocabularies.get_vocabulary(models.Field.objects.all(), 'field')
+        # as refreshed by the counters, without any signal
+        models.Field.objects.filter(pk=field.pk).update(usage_count=3)
+        self.assertEqual(vocabulary.get('field', "Structural biology").usage_count, 3)
+
+    def test_expires_with_the_cache_of_the_process(self):
+        with self.settings(VOCABULARIES_LOCAL_MAX_AGE=0):
+            vocabularies.forget_vocabularies_version()
+            vocabularies.get_vocabulary(models.EventCost.objects.all(), 'cost')
+            # the writes of the other processes are not seen through the version
+            with self.assertNumQueries(1):
+                vocabularies.get_vocabulary(models.EventCost.objects.all(), 'cost')
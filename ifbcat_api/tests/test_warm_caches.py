@@ -0,0 +1,63 @@
+import io
+import os
+import tempfile
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from ifbcat_api import tasks, warm_caches
+
+
+@override_settings(WARM_CACHES_BASE_URL='http://testserver', WARM_CACHES_ACCESS_LOG='')
+class WarmCachesTestCase(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        # shared with the web workers
+        settings = override_settings(
+            CACHES={
+                'default': {
+                    'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+                    'LOCATION': directory.name,
+                }
+            }
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def test_command(self):
+        out = io.StringIO()
+        call_command('warm_caches', url=['/api/keyword-cnp/?format=json', '/api/not-a-url/'], stdout=out)
+        self.assertIn("200", out.getvalue())
+        self.assertIn("404", out.getvalue())
+        self.assertIn("/api/keyword-cnp/?format=json", out.getvalue())
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get('/api/keyword-cnp/?format=json').status_code, 200)
+
+    def test_top_urls_of_access_log(self):
+        lines = [
+            '1.2.3.4 - - [19/Oct/2026:10:00:00 +0000] "GET /api/tool/ HTTP/1.1" 200 12 "-" "curl"',
+            '1.2.3.4 - - [19/Oct/2026:10:00:01 +0000] "GET /api/team/ HTTP/1.1" 200 12 "-" "curl"',
+            '1.2.3.4 - - [19/Oct/2026:10:00:02 +0000] "GET /api/team/ HTTP/1.1" 200 12 "-" "curl"',
+            '1.2.3.4 - - [19/Oct/2026:10:00:03 +0000] "GET /static/a.css HTTP/1.1" 200 12 "-" "curl"',
+            '1.2.3.4 - - [19/Oct/2026:10:00:03 +0000] "GET /api/event/ HTTP/1.1" 404 12 "-" "curl"',
+            '1.2.3.4 - - [19/Oct/2026:10:00:04 +0000] "POST /api/team/ HTTP/1.1" 200 12 "-" "curl"',
+        ]
+        with tempfile.TemporaryDirectory() as directory:
+            access_log = os.path.join(directory, 'access.log')
+            with open(access_log, 'w') as f:
+                f.write("\n".join(lines))
+            self.assertEqual(warm_caches.read_top_urls(access_log, 1), ['/api/team/'])
+            self.assertEqual(
+                warm_caches.get_hot_urls(urls=['/api/tool/'], access_log=access_log, top=5),
+                ['/api/tool/', '/api/team/'],
+            )
+
+    def test_not_on_startup_without_shared_cache(self):
+        with mock.patch.object(tasks, 'warm_caches_task') as task:
+            tasks.warm_caches_on_startup()
+            self.assertEqual(task.call_count, 1)
+            with self.settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}):
+                tasks.warm_caches_on_startup()
+            self.assertEqual(task.call_count, 1)
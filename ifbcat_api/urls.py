@@ -42,7 +42,7 @@ router.register('lifesciencecommunity', views.LifeScienceCommunityViewSet)
 router.register('kindofanalysis', views.KindOfAnalysisViewSet)
 router.register('source-info', views.SourceInfoViewSet, basename='source_info')
 router.register('team', views.TeamViewSet, basename='team')
-router.register('team-cnp', CachedNoPaginationFactory(views.TeamViewSet), basename='team-cnp')
+router.register('team-cnp', CachedNoPaginationFactory(views.TeamDirectoryViewSet), basename='team-cnp')
 router.register('tool', views.ToolViewSet)
 router.register('tool-cnp', CachedNoPaginationFactory(views.ToolViewSet), basename='tool-cnp')
 router.register('tooltype', views.ToolTypeViewSet)
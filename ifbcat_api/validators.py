@@ -1,10 +1,11 @@
 import re
 
 import requests
+from django.apps import apps as django_apps
 from django.core.exceptions import ValidationError
 from django.utils.deconstruct import deconstructible
 
-from ifbcat_api import misc
+from ifbcat_api import edam, misc, ror
 
 __p_orcid_regexp = '^https?://orcid.org/[0-9]{4}-[0-9]{4}-[0-9]{4}-[0-9]{3}[0-9X]$'
 __p_orcid = re.compile(__p_orcid_regexp, re.IGNORECASE | re.UNICODE)
@@ -41,9 +42,23 @@ def validate_grid_or_ror_id(value):
                 'GRID ID Syntax: %s '
                 'ROR ID Syntax: %s' % (value, __p_grid_regexp, __p_ror_regexp)
             )
+    # the GRID ids missing from the registry are kept by the organisations already having them
+    if ror.is_loaded() and ror.get_organisation(value) is None and not is_orgid_stored(value):
+        raise ValidationError('%s is not in the Research Organization Registry.' % value)
     return value
 
 
+def is_orgid_stored(value):
+    """Whether an organisation or a team already has the GRID or ROR id"""
+    from ifbcat_api.model.misc import WithGridIdOrRORId
+
+    return any(
+        model.objects.filter(orgid=value).exists()
+        for model in django_apps.get_app_config('ifbcat_api').get_models()
+        if issubclass(model, WithGridIdOrRORId)
+    )
+
+
 def validate_edam_topic(value):
     if value is None:
         return value
@@ -51,9 +66,19 @@ def validate_edam_topic(value):
         raise ValidationError(
             'This field can only contain valid EDAM Topic URIs (%s is not). Syntax: %s' % (value, __p_topic_regexp)
         )
+    index = edam.get_index()
+    # the topics already linked are kept, even once obsolete and missing from the index
+    if index is not None and str(value) not in index[1] and not is_topic_stored(value):
+        raise ValidationError('%s is not a topic of EDAM %s.' % (value, index[0]))
     return value
 
 
+def is_topic_stored(value):
+    from ifbcat_api.model.misc import Topic
+
+    return Topic.objects.filter(uri=str(value)).exists()
+
+
 def validate_doi(value):
     if value is None:
         return value
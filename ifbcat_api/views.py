@@ -15,7 +15,6 @@ import rest_framework.parsers
 from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth import get_user_model, get_permission_codename
 from django.contrib.auth.decorators import user_passes_test
-from django.core.cache import cache
 from django.http import HttpResponseRedirect, HttpResponseForbidden
 from django.shortcuts import get_object_or_404, render
 from django.urls import reverse
@@ -35,38 +34,45 @@ from rest_framework.response import Response
 from rest_framework.settings import api_settings
 from rest_framework.views import APIView
 
-from ifbcat_api import models, business_logic, misc
+from ifbcat_api import models, business_logic, misc, response_cache
 from ifbcat_api import serializers
 from ifbcat_api.admin import TrainingAdmin
-from ifbcat_api.filters import AutoSubsetFilterSet
+from ifbcat_api.filters import AutoSubsetFilterSet, TopicDescendantFilter, VocabularyFilterSet
+from ifbcat_api.renderers import JsonLDSchemaRenderer
+from ifbcat_api.snapshot import CatalogSnapshotMixin
 
 
 class CachedNoPaginationMixin:
+    """
+    List all the instances at once, the anonymous requests rendered in JSON being answered from the response cache,
+    which serves the stale list while one request computes it again, cf ifbcat_api/response_cache.py
+    """
+
+    # seconds during which the list is fresh, and can be served stale, the defaults of the settings when None
+    response_cache_max_age = None
+    response_cache_max_stale = None
+
     @property
     def paginator(self):
         return None
 
-    def perform_create(self, serializer):
-        super().perform_create(serializer)
-        cache.clear()
-
-    def perform_update(self, serializer):
-        super().perform_update(serializer)
-        cache.clear()
-
-    def perform_destroy(self, instance):
-        super().perform_destroy(instance)
-        cache.clear()
-
-    # @method_decorator(cache_page(int(60 * 60 * 0.5)))
     @method_decorator(vary_on_cookie)
-    def list(self, *args, **kwargs):
-        return super().list(*args, **kwargs)
+    def list(self, request, *args, **kwargs):
+        if request.user.is_authenticated or type(request.accepted_renderer) is not JSONRenderer:
+            return super().list(request, *args, **kwargs)
+        data = response_cache.get_or_compute(
+            response_cache.get_request_key(request, f"response-cache-{type(self).__name__}"),
+            lambda: super(CachedNoPaginationMixin, self).list(request, *args, **kwargs).data,
+            max_age=self.response_cache_max_age,
+            max_stale=self.response_cache_max_stale,
+        )
+        return Response(data)
 
 
-def CachedNoPaginationFactory(base):
+def CachedNoPaginationFactory(base, max_age=None, max_stale=None):
     class _tmp(CachedNoPaginationMixin, base):
-        pass
+        response_cache_max_age = max_age
+        response_cache_max_stale = max_stale
 
     _tmp.__name__ = base.__name__ + "CNP"
     return _tmp
@@ -279,6 +285,7 @@ class EventFilter(AutoSubsetFilterSet):
             ('unknown', 'unknown'),
             ('closed', 'closed'),
         ),
+        method='filter_registration_status',
     )
     realisation_status = django_filters.ChoiceFilter(
         field_name="realisation_status",
@@ -288,7 +295,9 @@ class EventFilter(AutoSubsetFilterSet):
             ('past', 'past'),
             ('ongoing', 'ongoing'),
         ),
+        method='filter_realisation_status',
     )
+    topics__descendant_of = TopicDescendantFilter(field_name='topics', label="Topic, including its subtopics")
 
     class Meta:
         model = models.Event
@@ -298,6 +307,7 @@ class EventFilter(AutoSubsetFilterSet):
             'max_start',
             'costs',
             'topics',
+            'topics__descendant_of',
             'keywords',
             'prerequisites',
             'elixirPlatforms',
@@ -309,10 +319,17 @@ class EventFilter(AutoSubsetFilterSet):
             'courseMode',
         ]
 
+    def filter_registration_status(self, queryset, name, value):
+        return queryset.filter(models.Event.get_registration_status_q(value))
+
+    def filter_realisation_status(self, queryset, name, value):
+        return queryset.filter(models.Event.get_realisation_status_q(value))
+
 
 class TrainingFilter(AutoSubsetFilterSet):
     # min_start = django_filters.DateFilter(field_name="dates__dateStart", lookup_expr='gte')
     # max_start = django_filters.DateFilter(field_name="dates__dateStart", lookup_expr='lte')
+    topics__descendant_of = TopicDescendantFilter(field_name='topics', label="Topic, including its subtopics")
 
     class Meta:
         model = models.Training
@@ -322,6 +339,7 @@ class TrainingFilter(AutoSubsetFilterSet):
             # 'max_start',
             'costs',
             'topics',
+            'topics__descendant_of',
             'keywords',
             'prerequisites',
             'elixirPlatforms',
@@ -355,7 +373,7 @@ class AbstractEventViewSet(PermissionInClassModelViewSet, viewsets.ModelViewSet)
     )
 
 
-class EventViewSet(AbstractEventViewSet):
+class EventViewSet(CatalogSnapshotMixin, AbstractEventViewSet):
     """Handles creating, reading and updating events."""
 
     # renderer_classes = [BrowsableAPIRenderer, JSONRenderer, JsonLDSchemaTrainingRenderer]
@@ -385,7 +403,7 @@ class EventViewSet(AbstractEventViewSet):
 
 
 # Model ViewSet for training
-class TrainingViewSet(AbstractEventViewSet):
+class TrainingViewSet(CatalogSnapshotMixin, AbstractEventViewSet):
     """Handles creating, reading and updating training events."""
 
     serializer_class = serializers.TrainingSerializer
@@ -471,7 +489,7 @@ class EventSponsorViewSet(PermissionInClassModelViewSet, viewsets.ModelViewSet):
 
 
 # Model ViewSet for organisation
-class OrganisationViewSet(PermissionInClassModelViewSet, viewsets.ModelViewSet):
+class OrganisationViewSet(CatalogSnapshotMixin, PermissionInClassModelViewSet, viewsets.ModelViewSet):
     """Handles creating, reading and updating organisations."""
 
     serializer_class = serializers.OrganisationSerializer
@@ -625,8 +643,25 @@ class ComputingFacilityViewSet(ResourceViewSet):
     )
 
 
+class TrainingMaterialFilter(VocabularyFilterSet):
+    topics__descendant_of = TopicDescendantFilter(field_name='topics', label="Topic, including its subtopics")
+
+    class Meta:
+        model = models.TrainingMaterial
+        fields = ResourceViewSet.filterset_fields + (
+            'topics',
+            'topics__descendant_of',
+            'keywords',
+            'audienceTypes',
+            'audienceRoles',
+            'difficultyLevel',
+            'providedBy',
+            'licence',
+        )
+
+
 # Model ViewSet for training materials
-class TrainingMaterialViewSet(ResourceViewSet):
+class TrainingMaterialViewSet(CatalogSnapshotMixin, ResourceViewSet):
     """Handles creating, reading and updating training materials."""
 
     serializer_class = serializers.TrainingMaterialSerializer
@@ -641,15 +676,7 @@ class TrainingMaterialViewSet(ResourceViewSet):
         'difficultyLevel',
         'providedBy__name',
     )
-    filterset_fields = ResourceViewSet.filterset_fields + (
-        'topics',
-        'keywords',
-        'audienceTypes',
-        'audienceRoles',
-        'difficultyLevel',
-        'providedBy',
-        'licence',
-    )
+    filterset_class = TrainingMaterialFilter
 
 
 class TeamFilter(django_filters.FilterSet):
@@ -657,11 +684,13 @@ class TeamFilter(django_filters.FilterSet):
         field_name="is_active",
         label="Is active",
     )
+    expertise__descendant_of = TopicDescendantFilter(field_name='expertise', label="Expertise, including its subtopics")
 
     class Meta:
         model = models.Team
         fields = (
             'expertise',
+            'expertise__descendant_of',
             'leaders',
             'deputies',
             'scientificLeaders',
@@ -679,7 +708,7 @@ class TeamFilter(django_filters.FilterSet):
 
 
 # Model ViewSet for teams
-class TeamViewSet(PermissionInClassModelViewSet, viewsets.ModelViewSet):
+class TeamViewSet(CatalogSnapshotMixin, PermissionInClassModelViewSet, viewsets.ModelViewSet):
     """Handles creating, reading and updating teams."""
 
     serializer_class = serializers.TeamSerializer
@@ -730,6 +759,34 @@ class TeamViewSet(PermissionInClassModelViewSet, viewsets.ModelViewSet):
         serializer.save(user_profile=self.request.user)
 
 
+class TeamDirectoryViewSet(TeamViewSet):
+    """TeamViewSet listing the teams from the TeamDirectory read model, the search and the filters still apply on Team"""
+
+    def list(self, request, *args, **kwargs):
+        if isinstance(request.accepted_renderer, JsonLDSchemaRenderer):
+            # the JSON-LD mapping is the one of TeamSerializer
+            return super().list(request, *args, **kwargs)
+        response = self.get_snapshot_list_response(request)
+        if response is not None:
+            return response
+        pks = list(dict.fromkeys(self.filter_queryset(self.get_queryset()).values_list('pk', flat=True)))
+        page = self.paginate_queryset(pks)
+        if page is not None:
+            pks = page
+        directory = models.Team.annotate_is_active(models.TeamDirectory.objects.all()).in_bulk(pks)
+        if len(directory) != len(pks):
+            # a team is not in the directory yet, its refresh did not happen
+            return super().list(request, *args, **kwargs)
+        serializer = serializers.TeamDirectorySerializer(
+            [directory[pk] for pk in pks],
+            many=True,
+            context=self.get_serializer_context(),
+        )
+        if page is not None:
+            return self.get_paginated_response(serializer.data)
+        return Response(serializer.data)
+
+
 class ServiceCategoryViewSet(PermissionInClassModelViewSet, viewsets.ModelViewSet):
     queryset = models.ServiceCategory.objects.all()
     serializer_class = misc.inline_serializer_factory(models.ServiceCategory, lookup_field='name')
@@ -792,8 +849,24 @@ class ServiceViewSet(PermissionInClassModelViewSet, viewsets.ModelViewSet):
 #     )
 
 
+class ToolFilter(VocabularyFilterSet):
+    scientific_topics__descendant_of = TopicDescendantFilter(
+        field_name='scientific_topics', label="Scientific topic, including its subtopics"
+    )
+
+    class Meta:
+        model = models.Tool
+        fields = (
+            'tool_type',
+            'scientific_topics',
+            'scientific_topics__descendant_of',
+            'operating_system',
+            'collection',
+        )
+
+
 # Model ViewSet for tools
-class ToolViewSet(MultipleFieldLookupMixin, PermissionInClassModelViewSet, viewsets.ModelViewSet):
+class ToolViewSet(CatalogSnapshotMixin, MultipleFieldLookupMixin, PermissionInClassModelViewSet, viewsets.ModelViewSet):
     pagination_class = pagination.LimitOffsetPagination
     """Handles creating, reading and updating tools."""
 
@@ -805,12 +878,7 @@ class ToolViewSet(MultipleFieldLookupMixin, PermissionInClassModelViewSet, views
         'description',
         'tool_type__name',
     )
-    filterset_fields = (
-        'tool_type',
-        'scientific_topics',
-        'operating_system',
-        'collection',
-    )
+    filterset_class = ToolFilter
 
 
 class OperatingSystemChoicesViewSet(PermissionInClassModelViewSet, viewsets.ModelViewSet):
@@ -0,0 +1,135 @@
+"""
+Per-process cache of the controlled vocabularies: the small tables listing the values a field can take (costs of an
+event, audiences, licences, types of tool, categories of service, ...). They are read to validate each slug written and
+each value filtered on, while they hardly ever change, so each process keeps all their instances indexed by pk and by
+slug.
+
+They are tied to the vocabularies version, a key of the cache changed as soon as one of them is saved or deleted, and
+again once the transaction writing it is committed, so the processes having read the vocabulary in between build it
+again too. A transaction writing a vocabulary does not use the cache until it is committed.
+
+The writes of the other processes (the other web workers, the huey consumer, ...) are only seen through a cache shared
+by the processes. With the local memory of each process, the version is only known by the process, so it expires
+after VOCABULARIES_LOCAL_MAX_AGE seconds for the vocabularies written by the others to be read again.
+
+The counters, e.g. Field.usage_count, are not kept: they are refreshed with QuerySet.update(), without any signal, so
+they are read from the database when accessed.
+"""
+
+import copy
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+
+from ifbcat_api.misc import connect_to_catalog, get_catalog_models, is_cache_shared
+from ifbcat_api.model.serviceIfb import AbstractControlledVocabulary
+
+__VERSION_KEY = "controlled-vocabularies-version"
+
+# the vocabularies not inheriting AbstractControlledVocabulary, with the field holding their slug
+VOCABULARIES = {
+    'ifbcat_api.EventCost': 'cost',
+    'ifbcat_api.AudienceType': 'audienceType',
+    'ifbcat_api.AudienceRole': 'audienceRole',
+    'ifbcat_api.Licence': 'name',
+    'ifbcat_api.Field': 'field',
+    'ifbcat_api.ToolType': 'name',
+    'ifbcat_api.OperatingSystem': 'name',
+}
+
+# the columns maintained by ifbcat_api.counters, deferred in the instances kept
+COUNTER_FIELDS = ('usage_count', 'members_count')
+
+vocabularies = dict()
+
+
+def get_slug_field(model):
+    """The name of the field holding the slug of the vocabulary, or None if model is not a controlled vocabulary"""
+    if issubclass(model, AbstractControlledVocabulary):
+        return 'name'
+    return VOCABULARIES.get(model._meta.label)
+
+
+def get_vocabularies_version():
+    version = cache.get(__VERSION_KEY)
+    if version is None:
+        version = uuid.uuid4().hex
+        cache.add(__VERSION_KEY, version, None if is_cache_shared() else settings.VOCABULARIES_LOCAL_MAX_AGE)
+    return version
+
+
+def forget_vocabularies_version():
+    cache.delete(__VERSION_KEY)
+
+
+def is_written_in_transaction():
+    return any(func is forget_vocabularies_version for _, func, _ in transaction.get_connection().run_on_commit)
+
+
+def forget_vocabularies_on_write(sender, **kwargs):
+    forget_vocabularies_version()
+    if not is_written_in_transaction():
+        transaction.on_commit(forget_vocabularies_version)
+
+
+def connect_receivers():
+    models = [model for model in get_catalog_models() if get_slug_field(model) is not None]
+    connect_to_catalog(forget_vocabularies_on_write, post_save, post_delete, models=models)
+
+
+class Vocabulary:
+    """All the instances of a controlled vocabulary, for one vocabularies version"""
+
+    def __init__(self, version, model, slug_field, instances):
+        self.version = version
+        self.model = model
+        self.slug_field = slug_field
+        self.instances = tuple(instances)
+        self.by_pk = {str(instance.pk): instance for instance in self.instances}
+        self.by_slug = {
+            str(getattr(instance, slug_field)): instance
+            for instance in self.instances
+            if getattr(instance, slug_field) is not None
+        }
+
+    def get(self, field_name, value):
+        """A copy of the instance whose field_name, the slug field or the pk, is value, or None if there is none"""
+        if field_name == self.slug_field:
+            instance = self.by_slug.get(str(value))
+        else:
+            try:
+                instance = self.by_pk.get(str(self.model._meta.pk.to_python(value)))
+            except ValidationError:
+                instance = None
+        return None if instance is None else copy.copy(instance)
+
+    def get_slugs(self):
+        return list(self.by_slug)
+
+
+def get_vocabulary(queryset, field_name):
+    """
+    The vocabulary of the model of queryset, or None when it cannot stand for queryset to look up instances by
+    field_name: the model is not a controlled vocabulary, field_name is neither its slug field nor its pk, queryset is
+    restricted, or the vocabulary is being written by the current transaction.
+    """
+    model = queryset.model
+    slug_field = get_slug_field(model)
+    if slug_field is None or field_name not in (slug_field, 'pk', model._meta.pk.name):
+        return None
+    if queryset.query.has_filters() or is_written_in_transaction():
+        return None
+    version = get_vocabularies_version()
+    vocabulary = vocabularies.get(model._meta.label)
+    if vocabulary is None or vocabulary.version != version:
+        counters = [f.name for f in model._meta.concrete_fields if f.name in COUNTER_FIELDS]
+        instances = model._default_manager.defer(*counters)
+        if not instances.ordered:
+            instances = instances.order_by('pk')
+        vocabulary = Vocabulary(version, model, slug_field, instances)
+        vocabularies[model._meta.label] = vocabulary
+    return vocabulary
@@ -0,0 +1,66 @@
+"""
+Warm the caches by replaying in-process, with the test client, the GET requests of the hot urls: the ones of
+WARM_CACHES_URLS (the -cnp lists, the OpenAPI schema, the sitemaps) and the most requested ones of a recent access log.
+
+The requests are sent to WARM_CACHES_BASE_URL, so the responses are cached for the urls actually requested. As they
+are answered by the process warming the caches, it only benefits the other processes with a cache shared among them,
+cf CACHE_BACKEND, so the caches are not warmed when huey starts without one.
+"""
+
+import collections
+import logging
+import re
+import time
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.test import Client
+
+logger = logging.getLogger(__name__)
+
+# request and status of a line of an access log in the combined format of nginx
+ACCESS_LOG_REQUEST = re.compile(r'"GET (?P<url>/\S*) HTTP/[\d.]+" (?P<status>\d{3}) ')
+
+# prefixes of the urls of the access log not worth warming
+NOT_WARMED_PREFIXES = ('/static/', '/admin/', '/api-auth/')
+
+
+def read_top_urls(access_log, top):
+    """The top most requested urls successfully answered in access_log"""
+    counter = collections.Counter()
+    with open(access_log, errors='replace') as f:
+        for line in f:
+            match = ACCESS_LOG_REQUEST.search(line)
+            if match is None or match.group('status') != '200' or match.group('url').startswith(NOT_WARMED_PREFIXES):
+                continue
+            counter[match.group('url')] += 1
+    return [url for url, _ in counter.most_common(top)]
+
+
+def get_hot_urls(urls=None, access_log=None, top=None):
+    """urls, WARM_CACHES_URLS by default, followed by the top most requested urls of access_log if any"""
+    hot_urls = list(settings.WARM_CACHES_URLS if urls is None else urls)
+    access_log = settings.WARM_CACHES_ACCESS_LOG if access_log is None else access_log
+    top = settings.WARM_CACHES_TOP if top is None else top
+    if access_log and top > 0:
+        try:
+            hot_urls.extend(read_top_urls(access_log, top))
+        except OSError as e:
+            logger.warning(f"Could not read the access log {access_log}: {e}")
+    return list(dict.fromkeys(hot_urls))
+
+
+def warm_caches(urls=None, access_log=None, top=None):
+    """
+    Request the hot urls anonymously
+
+    :return: the url, the status code of its response and the seconds it took, for each hot url
+    """
+    base_url = urlsplit(settings.WARM_CACHES_BASE_URL or f'http://{settings.ALLOWED_HOSTS[0]}')
+    client = Client(HTTP_HOST=base_url.netloc, raise_request_exception=False)
+    report = []
+    for url in get_hot_urls(urls=urls, access_log=access_log, top=top):
+        start = time.perf_counter()
+        response = client.get(url, secure=base_url.scheme == 'https')
+        report.append((url, response.status_code, time.perf_counter() - start))
+    return report
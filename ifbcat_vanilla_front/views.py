@@ -16,7 +16,8 @@ def index(request):
 
 
 class TeamListView(ListView):
-    model = models.Team
+    model = models.TeamDirectory
+    template_name = 'ifbcat_api/team_list.html'
 
     def get_queryset(self):
         return models.Team.annotate_is_active(super().get_queryset()).filter(is_active=True).order_by(Upper('name'))